@@ -1,9 +1,61 @@
+import AggregatorInventory
 import boto3
-from botocore.exceptions import ClientError
+import BedrockRouter
+from botocore.exceptions import ClientError, ParamValidationError
 import logging
+import Organizations
+import os
+import ResourceDetails
+import ResourceFilter
+import time
+import Tracing
 logger = logging.getLogger()
 logger.setLevel("INFO")
 
+# ListBuckets MaxBuckets and ListQueues MaxResults upper bounds
+S3_LIST_PAGE_SIZE = 10000
+SQS_LIST_PAGE_SIZE = 1000
+
+# Account name -> ID of every organization, rebuilt when the merged account index of Organizations is refreshed
+ACCOUNTS_CACHE = {"accounts": {}, "merged": None}
+# Secret values by ARN and the Secrets Manager clients by region, reused by warm invocations for SECRETS_CACHE_TTL_SECONDS
+SECRETS_CACHE = {"clients": {}, "values": {}}
+
+FILE_SYSTEM_PROMPT = """
+                        You are an AWS IAM and Terraform Expert, you’ll need to use the Terraform module and create a pull request with the change describe in the following prompt.
+                        Your boundaries are S3 or SQS permissions only, any other request for permissions will be automatically rejected and you will reply "I'm sorry, I can't do that".
+                        YOU WILL REPLY ONLY WITH THE TERRAFORM CODE.
+                        THE CODE MUST BE ERROR-LESS AND FORMATTED.
+                        DO NOT EXPLAIN YOUR ANSWER.
+                        DO NOT ADD DECORATIONS OR ANY COMMENTS IN THE CODE.
+                        YOU ARE ALLOWED TO CHANGE ONLY THE ENVIRONMENT CODE.
+                        IF CUSTOM IAM POLICY DOCUMENT USED ADD IT TO YOUR RESPONSE AS IS.
+                    """
+
+# The model re-emits only the changed lines, generation time follows the output tokens
+PATCH_SYSTEM_PROMPT = """
+                        You are an AWS IAM and Terraform Expert, you’ll need to use the Terraform module and create a pull request with the change describe in the following prompt.
+                        Your boundaries are S3 or SQS permissions only, any other request for permissions will be automatically rejected and you will reply "I'm sorry, I can't do that".
+                        YOU WILL REPLY ONLY WITH A UNIFIED DIFF OF THE TERRAFORM ENVIRONMENT FILE.
+                        START EVERY HUNK WITH AN @@ -start,count +start,count @@ HEADER AND KEEP 3 UNCHANGED CONTEXT LINES AROUND EVERY CHANGE.
+                        CONTEXT AND REMOVED LINES MUST BE COPIED EXACTLY FROM THE ENVIRONMENT FILE, INDENTATION INCLUDED.
+                        THE PATCHED CODE MUST BE ERROR-LESS AND FORMATTED.
+                        DO NOT EXPLAIN YOUR ANSWER.
+                        DO NOT ADD DECORATIONS OR ANY COMMENTS IN THE CODE.
+                        YOU ARE ALLOWED TO CHANGE ONLY THE ENVIRONMENT CODE.
+                        IF CUSTOM IAM POLICY DOCUMENT USED ADD IT TO YOUR DIFF AS IS.
+                    """
+
+
+def secret_region(secret_arn: str) -> str:
+    """
+    Returns the region of a secret ARN (arn:aws:secretsmanager:region:account:secret:name), SECRETS_MANAGER_REGION
+    for a secret name.
+    """
+    if secret_arn and secret_arn.startswith("arn:"):
+        return secret_arn.split(":")[3]
+    return os.getenv("SECRETS_MANAGER_REGION", "us-west-2")
+
 
 class AWSConnector:
     """
@@ -14,32 +66,42 @@ class AWSConnector:
     Attributes
     ----------
     aws_accounts : dict
-        a dictionary mapping AWS account names to their IDs
+        a dictionary mapping AWS account names to their IDs, of every configured organization
     account_id : str
         the ID of the AWS account
+    organization : Organizations.Organization
+        the organization of the account, None for an unknown account
     account_ou : str
         the name of the organizational unit that the account belongs to
 
     Methods
     -------
-    __list_organizational_units(parent_id: str, client: boto3.client) -> list:
-        Lists the organizational units for a given parent ID
     __find_ou_name_by_account_id() -> str:
-        Finds the name of the organizational unit that the account belongs to
+        Finds the name of the organizational unit that the account belongs to, from the cached organization map
+    map_organizational_units() -> dict:
+        Crawls every organization once and caches the organizational unit of every account
     __get_aws_accounts() -> dict:
-        Gets a dictionary mapping AWS account names to their IDs
+        Gets a dictionary mapping AWS account names to their IDs, cached for AWS_ACCOUNTS_CACHE_TTL_SECONDS
+    suggest_accounts(account_name: str, limit=3) -> list:
+        Returns the account names closest to a misspelled one
     __assume_role() -> dict:
         Assumes the 'security-scanning' role for the account
-    list_s3_buckets() -> list:
-        Lists the S3 buckets in the account
-    list_sqs_queues() -> list:
-        Lists the SQS queues in the account
-    aws_bedrock(prompt: str) -> str:
-        Uses the Bedrock AI model to generate a response to a prompt
+    __aggregator_resources(service_name: str, resource_filter=None, required_names=()) -> list:
+        Lists a service from the org-wide aggregator, None to list the account live
+    list_s3_buckets(resource_filter=None, required_names=()) -> list:
+        Lists the S3 buckets in the account, filtered by a ResourceFilter, from the configured inventory backend
+    list_sqs_queues(resource_filter=None, required_names=()) -> list:
+        Lists the SQS queues in the account, filtered by a ResourceFilter, from the configured inventory backend
+    describe_resources(service_name: str, resource_names: list, max_workers=16, ttl_seconds=300, owner_tag="owner") -> dict:
+        Returns the region, tags, encryption and owner of the listed resources, described concurrently
+    aws_bedrock(prompt: str, tier=None, output="file") -> str:
+        Uses the Bedrock AI model (routed by BedrockRouter) to generate a response to a prompt
     get_secret_from_secrets_mangers(key: str) -> str:
-        Gets a secret from AWS Secrets Manager
+        Gets a secret from AWS Secrets Manager, cached for SECRETS_CACHE_TTL_SECONDS
+    preload_clients(secret_arns=()):
+        Creates the Secrets Manager clients and loads the service models of the other AWS clients
     """
-    def __init__(self, account_name: str):
+    def __init__(self, account_name: str, resolve_ou=True):
         """
         Constructs all the necessary attributes for the AWSConnector.
 
@@ -47,124 +109,180 @@ class AWSConnector:
         ----------
             account_name : str
                 the name of the AWS account
+            resolve_ou : bool, optional
+                find the organizational unit of the account (default is True), the inventory sweep
+                only lists resources and skips it
         """
         self.aws_accounts = self.__get_aws_accounts()
         self.account_id = self.aws_accounts.get(account_name)
-        self.account_ou = self.__find_ou_name_by_account_id()
+        self.organization = None
+        if self.account_id:
+            self.organization = Organizations.get_organization(Organizations.merged_accounts(
+                ttl_seconds=int(os.getenv("AWS_ACCOUNTS_CACHE_TTL_SECONDS", "300"))
+            )[account_name][0])
+        # An unknown account would crawl every organizational unit for nothing
+        self.account_ou = self.__find_ou_name_by_account_id() if self.account_id and resolve_ou else ""
+        self.__assumed_role = {}
 
-    @staticmethod
-    def __list_organizational_units(parent_id, client):
+    @Tracing.traced("aws.find_ou_name_by_account_id")
+    def __find_ou_name_by_account_id(self) -> str:
         """
-        Lists the organizational units for a given parent ID.
-
-        Parameters
-        ----------
-            parent_id : str
-                the ID of the parent
-            client : boto3.client
-                the boto3 client
+        Finds the name of the organizational unit that the account belongs to, in the organization of the account.
 
         Returns
         -------
-            list
-                a list of organizational units
+            str
+                the name of the organizational unit, empty string for an account of the root
         """
-        ous = []
-        paginator = client.get_paginator('list_organizational_units_for_parent')
-        response_iterator = paginator.paginate(ParentId=parent_id)
+        return self.organization.map_organizational_units(
+            ttl_seconds=int(os.getenv("AWS_ACCOUNTS_CACHE_TTL_SECONDS", "300"))
+        ).get(self.account_id, "")
 
-        for response in response_iterator:
-            ous.extend(response['OrganizationalUnits'])
-        return ous
-
-    def __find_ou_name_by_account_id(self) -> str:
+    @staticmethod
+    @Tracing.traced("aws.map_organizational_units")
+    def map_organizational_units() -> dict:
         """
-        Finds the name of the organizational unit that the account belongs to.
+        Crawls every organization once, concurrently, and caches the organizational unit of every account,
+        for AWS_ACCOUNTS_CACHE_TTL_SECONDS like the account map.
 
         Returns
         -------
-            str
-                the name of the organizational unit
+            dict
+                a dictionary mapping AWS account IDs to the name of their organizational unit
         """
-        client = boto3.client('organizations')
-        roots = client.list_roots()
-        root_id = roots['Roots'][0]['Id']
-        queue = [root_id]
-
-        while queue:
-            parent_id = queue.pop(0)
-            ous = self.__list_organizational_units(parent_id, client)
-
-            for ou in ous:
-                queue.append(ou['Id'])
-                ou_accounts_paginator = client.get_paginator('list_accounts_for_parent')
-                ou_accounts_response_iterator = ou_accounts_paginator.paginate(ParentId=ou['Id'])
-                for ou_accounts_response in ou_accounts_response_iterator:
-                    for account in ou_accounts_response['Accounts']:
-                        if account['Id'] == self.account_id:
-                            return ou['Name']
-        return ""
+        account_ous = {}
+        for organization_ous in Organizations.for_each_organization(
+                "map_organizational_units",
+                ttl_seconds=int(os.getenv("AWS_ACCOUNTS_CACHE_TTL_SECONDS", "300"))
+        ).values():
+            account_ous.update(organization_ous)
+        return account_ous
 
     @staticmethod
+    @Tracing.traced("aws.get_aws_accounts")
     def __get_aws_accounts() -> dict:
         """
-        Gets a dictionary mapping AWS account names to their IDs.
+        Gets a dictionary mapping AWS account names to their IDs, from the merged account index of every
+        organization, cached for AWS_ACCOUNTS_CACHE_TTL_SECONDS.
 
         Returns
         -------
             dict
                 a dictionary mapping AWS account names to their IDs
         """
-        client = boto3.client('organizations')
-        response = client.list_accounts(
-            MaxResults=20
-        )
-        accounts = {}
-        while True:
-            aws_accounts = response.get("Accounts")
-            next_token = response.get("NextToken")
-            if aws_accounts:
-                for account in aws_accounts:
-                    if account.get("Status") == "ACTIVE":
-                        accounts[account.get("Name")] = account.get("Id")
-            if next_token:
-                response = client.list_accounts(
-                    MaxResults=20,
-                    NextToken=next_token
-                )
-            else:
-                break
-        return accounts
+        merged = Organizations.merged_accounts(ttl_seconds=int(os.getenv("AWS_ACCOUNTS_CACHE_TTL_SECONDS", "300")))
+        if ACCOUNTS_CACHE["merged"] is not merged:
+            ACCOUNTS_CACHE["accounts"] = {account_name: account_id for account_name, (_, account_id) in merged.items()}
+            ACCOUNTS_CACHE["merged"] = merged
+        return ACCOUNTS_CACHE["accounts"]
+
+    def suggest_accounts(self, account_name: str, limit=3) -> list:
+        """
+        Returns the account names closest to a misspelled one, from the merged account index.
+
+        Parameters
+        ----------
+            account_name : str
+                the misspelled account name
+            limit : int, optional
+                the maximum number of suggestions (default is 3)
+
+        Returns
+        -------
+            list
+                the closest account names, best first
+        """
+        return Organizations.suggest_accounts(account_name, limit=limit)
 
+    @Tracing.traced("aws.assume_role")
     def __assume_role(self) -> dict:
         """
-        Assumes the 'security-scanning' role for the account.
+        Assumes the scanning role of the account organization ('security-scanning' by default), once per connector.
 
         Returns
         -------
             dict
                 the response from the 'AssumeRole' operation
         """
+        if self.__assumed_role:
+            return self.__assumed_role
         client = boto3.client('sts')
         try:
             response = client.assume_role(
-                RoleArn=f'arn:aws:iam::{self.account_id}:role/security-scanning',
+                RoleArn=self.organization.scanning_role_arn(self.account_id),
                 RoleSessionName='security-scanning-session'
             )
         except ClientError as e:
             logger.error(f"ERROR: AWSHandler.__assume_role: {e}")
             return {}
+        self.__assumed_role = response
         return response
 
-    def list_s3_buckets(self) -> list:
+    def __aggregator_resources(self, service_name: str, resource_filter=None, required_names=()):
+        """
+        Lists a service from the org-wide aggregator (AWS_INVENTORY_BACKEND).
+
+        The aggregators index a new resource with a delay of a few minutes, so a required resource missing from
+        their listing is looked up by listing the account live, when its scanning role can be assumed.
+
+        Returns
+        -------
+            list
+                the resource names from the aggregator, None if no aggregator is configured or the account must be
+                listed live
+        """
+        aggregator_inventory = AggregatorInventory.get_aggregator_inventory(self.organization)
+        if aggregator_inventory is None:
+            return None
+        if service_name == "s3":
+            resources = aggregator_inventory.list_s3_buckets(self.account_id, resource_filter)
+        else:
+            resources = aggregator_inventory.list_sqs_queues(self.account_id, resource_filter)
+        missing_names = set(required_names).difference(resources)
+        if not missing_names:
+            return resources
+        if not self.__assume_role():
+            logger.error("AWSHandler.__aggregator_resources: cannot list {} live for {}".format(
+                service_name,
+                ", ".join(sorted(missing_names))
+            ))
+            return resources
+        logger.info("AWSHandler.__aggregator_resources: {} not in the aggregator, listing {} live".format(
+            ", ".join(sorted(missing_names)),
+            service_name
+        ))
+        if resource_filter is not None:
+            resource_filter.reset()
+        return None
+
+    @Tracing.traced("aws.list_s3_buckets")
+    def list_s3_buckets(self, resource_filter=None, required_names=()) -> list:
         """
         Lists the S3 buckets in the account.
 
+        The filter prefix is sent as the ListBuckets Prefix and the pages are read until the filter limit
+        is reached. Without a filter the buckets are listed in one call. With AWS_INVENTORY_BACKEND set to an
+        org-wide aggregator, no role is assumed and the aggregator is queried instead, unless it misses one of
+        the required buckets.
+
+        Parameters
+        ----------
+            resource_filter : ResourceFilter, optional
+                the prefix, glob and limit to apply (default is None, every bucket)
+            required_names : iterable, optional
+                the requested buckets, listed live if the aggregator does not have them yet (default is ())
+
         Returns
         -------
             list
                 a list of S3 bucket names
         """
+        aggregator_resources = self.__aggregator_resources("s3", resource_filter, required_names)
+        if aggregator_resources is not None:
+            return aggregator_resources
+        resource_filter = resource_filter or ResourceFilter.ResourceFilter()
+        if resource_filter.empty:
+            return []
         response = self.__assume_role()
         s3_client = boto3.client(
             's3',
@@ -172,25 +290,56 @@ class AWSConnector:
             aws_secret_access_key=response.get("Credentials").get("SecretAccessKey"),
             aws_session_token=response.get("Credentials").get("SessionToken")
         )
-        try:
-            account_buckets = s3_client.list_buckets()
-        except Exception as e:
-            logger.error("AWSHandler.list_s3_buckets: {}".format(e))
-            return []
-        buckets = []
-        for bucket in account_buckets.get("Buckets"):
-            buckets.append(bucket.get("Name"))
-        return buckets
+        request = {}
+        if resource_filter.active:
+            request["MaxBuckets"] = resource_filter.page_size(S3_LIST_PAGE_SIZE)
+            if resource_filter.api_prefix:
+                request["Prefix"] = resource_filter.api_prefix
+        while True:
+            try:
+                account_buckets = s3_client.list_buckets(**request)
+            except ParamValidationError as e:
+                # Older botocore without ListBuckets pagination, the whole listing is filtered instead
+                logger.error("AWSHandler.list_s3_buckets: {}".format(e))
+                request = {}
+                continue
+            except Exception as e:
+                logger.error("AWSHandler.list_s3_buckets: {}".format(e))
+                return []
+            if resource_filter.add(bucket.get("Name") for bucket in account_buckets.get("Buckets", [])):
+                break
+            if not request or not account_buckets.get("ContinuationToken"):
+                break
+            request["ContinuationToken"] = account_buckets.get("ContinuationToken")
+        return resource_filter.resources
 
-    def list_sqs_queues(self) -> list:
+    @Tracing.traced("aws.list_sqs_queues")
+    def list_sqs_queues(self, resource_filter=None, required_names=()) -> list:
         """
         Lists the SQS queues in the account.
 
+        The filter prefix is sent as the ListQueues QueueNamePrefix and the pages are read until the filter
+        limit is reached. With AWS_INVENTORY_BACKEND set to an org-wide aggregator, no role is assumed and the
+        aggregator is queried instead, unless it misses one of the required queues.
+
+        Parameters
+        ----------
+            resource_filter : ResourceFilter, optional
+                the prefix, glob and limit to apply (default is None, every queue)
+            required_names : iterable, optional
+                the requested queues, listed live if the aggregator does not have them yet (default is ())
+
         Returns
         -------
             list
                 a list of SQS queue names
         """
+        aggregator_resources = self.__aggregator_resources("sqs", resource_filter, required_names)
+        if aggregator_resources is not None:
+            return aggregator_resources
+        resource_filter = resource_filter or ResourceFilter.ResourceFilter()
+        if resource_filter.empty:
+            return []
         response = self.__assume_role()
         sqs_client = boto3.client(
             'sqs',
@@ -198,79 +347,111 @@ class AWSConnector:
             aws_secret_access_key=response.get("Credentials").get("SecretAccessKey"),
             aws_session_token=response.get("Credentials").get("SessionToken")
         )
-        queues = []
-        next_token = None
+        request = {"MaxResults": resource_filter.page_size(SQS_LIST_PAGE_SIZE)}
+        if resource_filter.api_prefix:
+            request["QueueNamePrefix"] = resource_filter.api_prefix
         while True:
             try:
-                if next_token:
-                    account_queues = sqs_client.list_queues(
-                        MaxResults=1000,
-                        NextToken=next_token
-                    )
-                else:
-                    account_queues = sqs_client.list_queues(
-                        MaxResults=1000
-                    )
+                account_queues = sqs_client.list_queues(**request)
             except Exception as e:
                 logger.error("AWSHandler.list_sqs_queues: {}".format(e))
                 return []
-            if "QueueUrls" in account_queues:
-                for queue in account_queues.get("QueueUrls"):
-                    queues.append(queue.split("/")[-1])
-
+            if resource_filter.add(queue.split("/")[-1] for queue in account_queues.get("QueueUrls", [])):
+                break
             next_token = account_queues.get("NextToken")
             if not next_token:
                 break
-        return queues
+            request["NextToken"] = next_token
+        return resource_filter.resources
+
+    def describe_resources(
+            self,
+            service_name: str,
+            resource_names: list,
+            max_workers=16,
+            ttl_seconds=300,
+            owner_tag="owner"
+    ) -> dict:
+        """
+        Returns the region, tags, encryption and owner of the listed resources, described concurrently through
+        the scanning role of the account, whatever the inventory backend.
+
+        Parameters
+        ----------
+            service_name : str
+                the AWS service of the resources (s3 or sqs)
+            resource_names : list
+                the names of the resources
+            max_workers : int, optional
+                the number of resources described concurrently (default is 16)
+            ttl_seconds : int, optional
+                how long the details of a resource are reused (default is 300)
+            owner_tag : str, optional
+                the tag key of the resource owner (default is "owner")
+
+        Returns
+        -------
+            dict
+                a dictionary mapping resource names to {"region", "encryption", "owner", "tags"}, empty dictionary
+                if the role cannot be assumed
+        """
+        response = self.__assume_role()
+        if not response:
+            return {}
+        return ResourceDetails.ResourceDetails(
+            account_id=self.account_id,
+            credentials=response.get("Credentials"),
+            max_workers=max_workers,
+            ttl_seconds=ttl_seconds,
+            owner_tag=owner_tag
+        ).describe(service_name, resource_names)
 
     @staticmethod
-    def aws_bedrock(prompt: str) -> str:
+    @Tracing.traced("aws.aws_bedrock")
+    def aws_bedrock(prompt: str, tier=None, output="file") -> str:
         """
         Uses the Bedrock AI model to generate a response to a prompt.
 
+        The model and region are picked by BedrockRouter, which falls back to the next
+        configured candidate (e.g. a cross-region inference profile) when a model throttles.
+
         Parameters
         ----------
             prompt : str
                 the prompt for the AI model
+            tier : str, optional
+                "simple" or "complex" (default is classified by the prompt size)
+            output : str, optional
+                "file" for the whole new environment file, "patch" for a unified diff of the environment
+                file (default is "file")
 
         Returns
         -------
             str
                 the response from the AI model
         """
-        session = boto3.Session()
-        bedrock = session.client('bedrock-runtime', region_name='us-east-1')
+        response = BedrockRouter.BedrockRouter().converse(
+            inference_config={
+                'temperature': 0,
+            },
+            system=[
+                {
+                    'text': PATCH_SYSTEM_PROMPT if output == "patch" else FILE_SYSTEM_PROMPT
+                }
+            ],
+            messages=[
+                {
+                    'role': 'user',
+                    'content': [
+                        {
+                            'text': prompt
+                        }
+                    ]
+                }
+            ],
+            tier=tier
+        )
         try:
-            response = bedrock.converse(
-                inferenceConfig={
-                    'temperature': 0,
-                },
-                modelId='anthropic.claude-3-5-sonnet-20240620-v1:0',
-                system=[
-                    {
-                        'text': """
-                            You are an AWS IAM and Terraform Expert, you’ll need to use the Terraform module and create a pull request with the change describe in the following prompt.
-                            Your boundaries are S3 or SQS permissions only, any other request for permissions will be automatically rejected and you will reply "I'm sorry, I can't do that".
-                            YOU WILL REPLY ONLY WITH THE TERRAFORM CODE. 
-                            THE CODE MUST BE ERROR-LESS AND FORMATTED. 
-                            DO NOT EXPLAIN YOUR ANSWER.
-                            DO NOT ADD DECORATIONS OR ANY COMMENTS IN THE CODE.
-                            YOU ARE ALLOWED TO CHANGE ONLY THE ENVIRONMENT CODE.
-                            IF CUSTOM IAM POLICY DOCUMENT USED ADD IT TO YOUR RESPONSE AS IS.
-                        """
-                    }
-                ],
-                messages=[
-                    {
-                        'role': 'user',
-                        'content': [
-                            {
-                                'text': prompt
-                            }
-                        ]
-                    }
-                ]
-            )
             result = response['output']['message']['content'][0]['text']
         except Exception as e:
             logger.error("AWSHandler.aws_bedrock: {}".format(e))
@@ -278,14 +459,15 @@ class AWSConnector:
         return result
 
     @staticmethod
+    @Tracing.traced("aws.get_secret_from_secrets_mangers")
     def get_secret_from_secrets_mangers(key: str) -> str:
         """
-        Gets a secret from AWS Secrets Manager.
+        Gets a secret from AWS Secrets Manager, cached for SECRETS_CACHE_TTL_SECONDS.
 
         Parameters
         ----------
             key : str
-                the name of the secret
+                the ARN of the secret, read in the region of the ARN
 
         Returns
         -------
@@ -293,16 +475,26 @@ class AWSConnector:
                 the secret value
         """
         secret_name = key
-        region_name = "us-west-2"
-        session = boto3.Session()
-        client = session.client(
-            service_name='secretsmanager',
-            region_name=region_name
-        )
+        # arn:aws:secretsmanager:region:account:secret:name
+        region_name = secret_region(secret_name)
+        cached_secret = SECRETS_CACHE["values"].get(secret_name)
+        if cached_secret and cached_secret[1] > time.monotonic():
+            return cached_secret[0]
+        if region_name not in SECRETS_CACHE["clients"]:
+            session = boto3.Session()
+            SECRETS_CACHE["clients"][region_name] = session.client(
+                service_name='secretsmanager',
+                region_name=region_name
+            )
+        client = SECRETS_CACHE["clients"][region_name]
         try:
             get_secret_value_response = client.get_secret_value(
                 SecretId=secret_name
             )
+            SECRETS_CACHE["values"][secret_name] = (
+                get_secret_value_response['SecretString'],
+                time.monotonic() + int(os.getenv("SECRETS_CACHE_TTL_SECONDS", "300"))
+            )
             return get_secret_value_response['SecretString']
         except ClientError as e:
             if e.response['Error']['Code'] == 'DecryptionFailureException':
@@ -326,3 +518,21 @@ class AWSConnector:
                 # Deal with the exception here, and/or rethrow at your discretion.
                 print("ERROR: AWSHandler.get_secret_from_secrets_mangers: {}".format(e))
         return ""
+
+    @staticmethod
+    @Tracing.traced("aws.preload_clients")
+    def preload_clients(secret_arns=()):
+        """
+        Creates the Secrets Manager clients of the regions of the secrets and loads the service models of the other
+        AWS clients, no API is called.
+
+        boto3 keeps the loaded models on its default session, so the clients created by the requests are cheap.
+        """
+        for region_name in {secret_region(secret_arn) for secret_arn in secret_arns or ("",)}:
+            if region_name not in SECRETS_CACHE["clients"]:
+                SECRETS_CACHE["clients"][region_name] = boto3.Session().client(
+                    service_name='secretsmanager',
+                    region_name=region_name
+                )
+        for service_name in ('organizations', 'sts', 's3', 'sqs'):
+            boto3.client(service_name)
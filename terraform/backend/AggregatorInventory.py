@@ -0,0 +1,292 @@
+import abc
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+import json
+import os
+import ResourceFilter
+import Tracing
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# ListResources MaxResults and SelectAggregateResourceConfig MaxResults upper bounds
+RESOURCE_EXPLORER_PAGE_SIZE = 1000
+CONFIG_PAGE_SIZE = 100
+
+RESOURCE_EXPLORER_TYPES = {"s3": "s3:bucket", "sqs": "sqs:queue"}
+CONFIG_TYPES = {"s3": "AWS::S3::Bucket", "sqs": "AWS::SQS::Queue"}
+# S3 bucket names are global, queues are listed in the region of the bot like the assume-role path does
+REGIONAL_SERVICES = ("sqs",)
+
+# The configured backend, kept at module scope so its client is created once per container
+AGGREGATOR_INVENTORY_CACHE = {}
+
+
+class AggregatorInventory(abc.ABC):
+    """
+    A class used to list the resources of the organization accounts from one org-wide aggregator,
+    without assuming a role into every account
+
+    The subclasses read a Resource Explorer aggregator view or a Config aggregator, both answer for every
+    account from the account of the bot. The aggregators are eventually consistent, a new resource shows up
+    within minutes.
+
+    ...
+
+    Attributes
+    ----------
+    region : str
+        the region of the regional services listing, None for every region
+
+    Methods
+    -------
+    pages(service_name: str, account_id=None) -> generator:
+        Yields the (account ID, resource name) pages of a service, for one account or every account
+    list_s3_buckets(account_id: str, resource_filter=None) -> list:
+        Lists the S3 buckets of an account, filtered by a ResourceFilter
+    list_sqs_queues(account_id: str, resource_filter=None) -> list:
+        Lists the SQS queues of an account, filtered by a ResourceFilter
+    resources_by_account(services: tuple) -> dict:
+        Lists the resources of every account
+    """
+
+    def __init__(self, region=None):
+        """
+        Constructs all the necessary attributes for the AggregatorInventory object.
+
+        Parameters
+        ----------
+            region : str, optional
+                the region of the regional services listing (default is None, every region)
+        """
+        self.region = region
+
+    @abc.abstractmethod
+    def pages(self, service_name: str, account_id=None):
+        """
+        Yields the resources of a service page by page, one aggregator query for one account or every account.
+
+        Parameters
+        ----------
+            service_name : str
+                the AWS service of the resources (s3 or sqs)
+            account_id : str, optional
+                the AWS account ID (default is None, every account)
+
+        Returns
+        -------
+            generator
+                lists of (account ID, resource name) tuples, raises BotoCoreError or ClientError if the aggregator fails
+        """
+
+    def __list(self, service_name: str, account_id: str, resource_filter=None) -> list:
+        """
+        Collects the resource names of an account until the filter limit is reached.
+        """
+        resource_filter = resource_filter or ResourceFilter.ResourceFilter()
+        if resource_filter.empty or not account_id:
+            return []
+        try:
+            for page in self.pages(service_name, account_id):
+                if resource_filter.add(resource_name for _, resource_name in page):
+                    break
+        except (BotoCoreError, ClientError) as e:
+            logger.error("AggregatorInventory.list: {}".format(e))
+            return []
+        return resource_filter.resources
+
+    @Tracing.traced("aggregator.list_s3_buckets")
+    def list_s3_buckets(self, account_id: str, resource_filter=None) -> list:
+        """
+        Lists the S3 buckets of an account.
+
+        Parameters
+        ----------
+            account_id : str
+                the AWS account ID
+            resource_filter : ResourceFilter, optional
+                the prefix, glob and limit to apply (default is None, every bucket)
+
+        Returns
+        -------
+            list
+                a list of S3 bucket names
+        """
+        return self.__list("s3", account_id, resource_filter)
+
+    @Tracing.traced("aggregator.list_sqs_queues")
+    def list_sqs_queues(self, account_id: str, resource_filter=None) -> list:
+        """
+        Lists the SQS queues of an account.
+
+        Parameters
+        ----------
+            account_id : str
+                the AWS account ID
+            resource_filter : ResourceFilter, optional
+                the prefix, glob and limit to apply (default is None, every queue)
+
+        Returns
+        -------
+            list
+                a list of SQS queue names
+        """
+        return self.__list("sqs", account_id, resource_filter)
+
+    @Tracing.traced("aggregator.resources_by_account")
+    def resources_by_account(self, services=("s3", "sqs")):
+        """
+        Lists the resources of every account, one paginated query per service for the whole organization.
+
+        Parameters
+        ----------
+            services : tuple, optional
+                the services to list (default is ("s3", "sqs"))
+
+        Returns
+        -------
+            dict
+                a dictionary mapping account IDs to {service name: resource names}, None if the aggregator failed
+        """
+        resources = {}
+        try:
+            for service_name in services:
+                for page in self.pages(service_name):
+                    for account_id, resource_name in page:
+                        account_resources = resources.setdefault(account_id, {name: [] for name in services})
+                        account_resources[service_name].append(resource_name)
+        except (BotoCoreError, ClientError) as e:
+            logger.error("AggregatorInventory.resources_by_account: {}".format(e))
+            return None
+        return resources
+
+
+class ResourceExplorerInventory(AggregatorInventory):
+    """
+    An AggregatorInventory reading an org-wide Resource Explorer view of the aggregator index region
+
+    ...
+
+    Attributes
+    ----------
+    view_arn : str
+        the ARN of the org-wide view, the client is created in its region
+    """
+
+    def __init__(self, view_arn: str, region=None, organization=None):
+        super().__init__(region=region)
+        self.view_arn = view_arn
+        region_name = view_arn.split(":")[3] or None
+        if organization is not None:
+            self.client = organization.client('resource-explorer-2', region_name=region_name)
+        else:
+            self.client = boto3.client('resource-explorer-2', region_name=region_name)
+
+    def pages(self, service_name: str, account_id=None):
+        filter_string = "resourcetype:{}".format(RESOURCE_EXPLORER_TYPES[service_name])
+        if account_id:
+            filter_string += " accountid:{}".format(account_id)
+        if self.region and service_name in REGIONAL_SERVICES:
+            filter_string += " region:{}".format(self.region)
+        request = {
+            "ViewArn": self.view_arn,
+            "Filters": {"FilterString": filter_string},
+            "MaxResults": RESOURCE_EXPLORER_PAGE_SIZE
+        }
+        while True:
+            response = self.client.list_resources(**request)
+            # arn:aws:s3:::name and arn:aws:sqs:region:account:name
+            yield [
+                (resource.get("OwningAccountId"), resource.get("Arn").split(":")[-1])
+                for resource in response.get("Resources", [])
+            ]
+            if not response.get("NextToken"):
+                break
+            request["NextToken"] = response.get("NextToken")
+
+
+class ConfigAggregatorInventory(AggregatorInventory):
+    """
+    An AggregatorInventory reading an AWS Config aggregator with advanced queries
+
+    ...
+
+    Attributes
+    ----------
+    aggregator_name : str
+        the name of the Config aggregator
+    """
+
+    def __init__(self, aggregator_name: str, region=None, organization=None):
+        super().__init__(region=region)
+        self.aggregator_name = aggregator_name
+        self.client = organization.client('config') if organization is not None else boto3.client('config')
+
+    def pages(self, service_name: str, account_id=None):
+        expression = "SELECT accountId, resourceName, configurationItemStatus WHERE resourceType = '{}'".format(
+            CONFIG_TYPES[service_name]
+        )
+        if account_id:
+            expression += " AND accountId = '{}'".format(account_id)
+        if self.region and service_name in REGIONAL_SERVICES:
+            expression += " AND awsRegion = '{}'".format(self.region)
+        request = {
+            "Expression": expression,
+            "ConfigurationAggregatorName": self.aggregator_name,
+            "MaxResults": CONFIG_PAGE_SIZE
+        }
+        while True:
+            response = self.client.select_aggregate_resource_config(**request)
+            page = []
+            for result in response.get("Results", []):
+                item = json.loads(result)
+                if item.get("configurationItemStatus") != "ResourceDeleted":
+                    page.append((item.get("accountId"), item.get("resourceName")))
+            yield page
+            if not response.get("NextToken"):
+                break
+            request["NextToken"] = response.get("NextToken")
+
+
+def get_aggregator_inventory(organization=None):
+    """
+    Returns the inventory backend selected by AWS_INVENTORY_BACKEND, None for the default assume-role listing.
+
+    AWS_INVENTORY_BACKEND=resource_explorer needs RESOURCE_EXPLORER_VIEW_ARN, AWS_INVENTORY_BACKEND=config needs
+    CONFIG_AGGREGATOR_NAME. An Organizations.Organization with its own inventory_backend is read with its own
+    view or aggregator from its management account, the other organizations than the first one assume roles.
+    """
+    backend = os.getenv("AWS_INVENTORY_BACKEND", "assume_role")
+    view_arn = os.getenv("RESOURCE_EXPLORER_VIEW_ARN")
+    aggregator_name = os.getenv("CONFIG_AGGREGATOR_NAME")
+    client_organization = None
+    if organization is not None and organization.inventory_backend:
+        backend = organization.inventory_backend
+        view_arn = organization.resource_explorer_view_arn
+        aggregator_name = organization.config_aggregator_name
+        client_organization = organization
+    elif organization is not None and not organization.default:
+        return None
+    region = os.getenv("AWS_REGION")
+    organization_name = client_organization.name if client_organization is not None else ""
+    if backend == "resource_explorer" and view_arn:
+        key = (backend, view_arn, region, organization_name)
+        if key not in AGGREGATOR_INVENTORY_CACHE:
+            AGGREGATOR_INVENTORY_CACHE[key] = ResourceExplorerInventory(
+                view_arn,
+                region=region,
+                organization=client_organization
+            )
+        return AGGREGATOR_INVENTORY_CACHE[key]
+    if backend == "config" and aggregator_name:
+        key = (backend, aggregator_name, region, organization_name)
+        if key not in AGGREGATOR_INVENTORY_CACHE:
+            AGGREGATOR_INVENTORY_CACHE[key] = ConfigAggregatorInventory(
+                aggregator_name,
+                region=region,
+                organization=client_organization
+            )
+        return AGGREGATOR_INVENTORY_CACHE[key]
+    if backend != "assume_role":
+        logger.error("AggregatorInventory.get_aggregator_inventory: {} is not configured, assuming roles".format(backend))
+    return None
@@ -0,0 +1,311 @@
+import boto3
+import botocore.config
+from botocore.exceptions import ClientError
+import json
+import os
+import time
+import Tracing
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+DEFAULT_MODEL_ID = "anthropic.claude-3-5-sonnet-20240620-v1:0"
+SIMPLE_MODEL_ID = "anthropic.claude-3-5-haiku-20241022-v1:0"
+DEFAULT_REGION = "us-east-1"
+
+# Every tier falls back from the in-region model to its cross-region inference profile, the simple tier is served
+# by a small model (Claude 3.5 Haiku is served through its inference profile) and falls back to the complex tier
+DEFAULT_MODEL_ROUTES = {
+    "simple": [
+        {"model_id": "us.{}".format(SIMPLE_MODEL_ID), "region": DEFAULT_REGION},
+        {"model_id": DEFAULT_MODEL_ID, "region": DEFAULT_REGION},
+        {"model_id": "us.{}".format(DEFAULT_MODEL_ID), "region": DEFAULT_REGION}
+    ],
+    "complex": [
+        {"model_id": DEFAULT_MODEL_ID, "region": DEFAULT_REGION},
+        {"model_id": "us.{}".format(DEFAULT_MODEL_ID), "region": DEFAULT_REGION}
+    ]
+}
+
+THROTTLING_ERROR_CODES = (
+    "ThrottlingException",
+    "ServiceQuotaExceededException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "ModelTimeoutException"
+)
+
+# The health of a candidate is its error rate over this window, older outcomes no longer count
+DEFAULT_HEALTH_WINDOW_SECONDS = 300
+HEALTH_MIN_INVOCATIONS = 5
+
+# Kept at module scope so the stats survive across warm invocations
+MODEL_STATS = {}
+BEDROCK_CLIENTS = {}
+
+
+class BedrockRouter:
+    """
+    A class used to route Bedrock requests between models and regions
+
+    ...
+
+    Attributes
+    ----------
+    routes : dict
+        a dictionary mapping a tier name to an ordered list of {"model_id", "region"} candidates
+    complex_prompt_chars : int
+        prompts longer than this are routed to the complex tier
+    throttle_cooldown_seconds : int
+        how long a throttled candidate is skipped
+    latency_budget_ms : int
+        candidates slower than this (moving average) are demoted, 0 disables the check
+    health_window_seconds : int
+        candidates failing more than half of their calls within this window are demoted
+
+    Methods
+    -------
+    classify(prompt: str) -> str:
+        Returns the tier for a prompt
+    candidates(tier: str) -> list:
+        Returns the tier candidates ordered by health
+    converse(system: list, messages: list, inference_config: dict, tier=None) -> dict:
+        Sends a converse request, falling back to the next candidate on failure
+    stats() -> dict:
+        Returns the per-model latency and error stats
+    preload_clients():
+        Creates the bedrock-runtime client of every candidate region
+    """
+
+    def __init__(
+            self,
+            routes=None,
+            complex_prompt_chars=None,
+            throttle_cooldown_seconds=None,
+            latency_budget_ms=None,
+            health_window_seconds=None
+    ):
+        """
+        Constructs all the necessary attributes for the BedrockRouter object.
+
+        Parameters
+        ----------
+            routes : dict, optional
+                tier to candidates mapping (default is BEDROCK_MODEL_ROUTES or DEFAULT_MODEL_ROUTES)
+            complex_prompt_chars : int, optional
+                complex tier threshold (default is BEDROCK_COMPLEX_PROMPT_CHARS or 12000)
+            throttle_cooldown_seconds : int, optional
+                throttled candidate cooldown (default is BEDROCK_THROTTLE_COOLDOWN_SECONDS or 60)
+            latency_budget_ms : int, optional
+                latency budget per candidate (default is BEDROCK_LATENCY_BUDGET_MS or 0)
+            health_window_seconds : int, optional
+                error rate window per candidate (default is BEDROCK_HEALTH_WINDOW_SECONDS or 300)
+        """
+        self.routes = routes or self.__load_routes()
+        self.complex_prompt_chars = complex_prompt_chars or int(os.getenv("BEDROCK_COMPLEX_PROMPT_CHARS", "12000"))
+        self.throttle_cooldown_seconds = throttle_cooldown_seconds or int(
+            os.getenv("BEDROCK_THROTTLE_COOLDOWN_SECONDS", "60")
+        )
+        self.latency_budget_ms = latency_budget_ms or int(os.getenv("BEDROCK_LATENCY_BUDGET_MS", "0"))
+        self.health_window_seconds = health_window_seconds or int(
+            os.getenv("BEDROCK_HEALTH_WINDOW_SECONDS", str(DEFAULT_HEALTH_WINDOW_SECONDS))
+        )
+
+    @staticmethod
+    def __load_routes() -> dict:
+        """
+        Loads the routes from the BEDROCK_MODEL_ROUTES environment variable.
+
+        Returns
+        -------
+            dict
+                the configured routes, or the default routes if missing or invalid
+        """
+        raw_routes = os.getenv("BEDROCK_MODEL_ROUTES")
+        if not raw_routes:
+            return DEFAULT_MODEL_ROUTES
+        try:
+            routes = json.loads(raw_routes)
+        except ValueError as e:
+            logger.error("BedrockRouter.__load_routes: {}".format(e))
+            return DEFAULT_MODEL_ROUTES
+        if not isinstance(routes, dict) or not routes.get("simple") or not routes.get("complex"):
+            logger.error("BedrockRouter.__load_routes: routes must define simple and complex tiers")
+            return DEFAULT_MODEL_ROUTES
+        return routes
+
+    @staticmethod
+    def __stats_key(candidate: dict) -> str:
+        return "{}/{}".format(candidate.get("region"), candidate.get("model_id"))
+
+    @staticmethod
+    def __client(region: str):
+        """
+        Returns a cached bedrock-runtime client for the region.
+
+        Botocore retries are kept low so a throttled model falls back to the next candidate
+        instead of retrying against the same one.
+        """
+        if region not in BEDROCK_CLIENTS:
+            BEDROCK_CLIENTS[region] = boto3.Session().client(
+                'bedrock-runtime',
+                region_name=region,
+                config=botocore.config.Config(retries={"mode": "standard", "max_attempts": 2})
+            )
+        return BEDROCK_CLIENTS[region]
+
+    def preload_clients(self):
+        """
+        Creates the bedrock-runtime client of every candidate region, no API is called.
+        """
+        for candidates in self.routes.values():
+            for candidate in candidates:
+                self.__client(candidate.get("region"))
+
+    def classify(self, prompt: str) -> str:
+        """
+        Returns the tier for a prompt.
+
+        Parameters
+        ----------
+            prompt : str
+                the prompt for the AI model
+
+        Returns
+        -------
+            str
+                "complex" for large prompts (large environment files or multi grants), "simple" otherwise
+        """
+        if len(prompt) > self.complex_prompt_chars:
+            return "complex"
+        return "simple"
+
+    def candidates(self, tier: str) -> list:
+        """
+        Returns the tier candidates ordered by health.
+
+        Candidates in throttling cooldown go last, then candidates with a high error rate within the health window,
+        then candidates over the latency budget. The configured order breaks ties.
+
+        Parameters
+        ----------
+            tier : str
+                the tier name
+
+        Returns
+        -------
+            list
+                the ordered candidates
+        """
+        now = time.monotonic()
+        ordered = []
+        for position, candidate in enumerate(self.routes.get(tier) or self.routes.get("complex")):
+            stats = MODEL_STATS.get(self.__stats_key(candidate), {})
+            cooling_down = stats.get("throttled_until", 0) > now
+            recent = [
+                failed for called_at, failed in stats.get("recent", []) if called_at > now - self.health_window_seconds
+            ]
+            unhealthy = len(recent) >= HEALTH_MIN_INVOCATIONS and sum(recent) / len(recent) > 0.5
+            slow = bool(self.latency_budget_ms) and stats.get("latency_ewma_ms", 0) > self.latency_budget_ms
+            ordered.append(((cooling_down, unhealthy, slow, position), candidate))
+        ordered.sort(key=lambda item: item[0])
+        return [candidate for _, candidate in ordered]
+
+    def __record(self, candidate: dict, latency_ms: float, error_code=None, usage=None):
+        stats = MODEL_STATS.setdefault(self.__stats_key(candidate), {
+            "invocations": 0,
+            "errors": 0,
+            "throttles": 0,
+            "latency_ewma_ms": 0.0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "throttled_until": 0,
+            "recent": []
+        })
+        now = time.monotonic()
+        stats["invocations"] += 1
+        # (time, failed) outcomes of the health window, the cumulative counters are kept for stats()
+        stats["recent"] = [
+            outcome for outcome in stats["recent"] if outcome[0] > now - self.health_window_seconds
+        ] + [(now, bool(error_code))]
+        if error_code:
+            stats["errors"] += 1
+            if error_code in THROTTLING_ERROR_CODES:
+                stats["throttles"] += 1
+                stats["throttled_until"] = now + self.throttle_cooldown_seconds
+            return
+        if stats["latency_ewma_ms"]:
+            stats["latency_ewma_ms"] = 0.8 * stats["latency_ewma_ms"] + 0.2 * latency_ms
+        else:
+            stats["latency_ewma_ms"] = latency_ms
+        if usage:
+            stats["input_tokens"] += usage.get("inputTokens", 0)
+            stats["output_tokens"] += usage.get("outputTokens", 0)
+
+    @Tracing.traced("bedrock.converse")
+    def converse(self, system: list, messages: list, inference_config: dict, tier=None) -> dict:
+        """
+        Sends a converse request, falling back to the next candidate on failure.
+
+        Parameters
+        ----------
+            system : list
+                the system prompt blocks
+            messages : list
+                the conversation messages
+            inference_config : dict
+                the inference configuration
+            tier : str, optional
+                the tier to route to (default is classified from the last message)
+
+        Returns
+        -------
+            dict
+                the converse response of the first successful candidate, empty dict if all failed
+        """
+        if tier is None:
+            tier = self.classify(messages[-1]['content'][0]['text'])
+        for candidate in self.candidates(tier):
+            start = time.monotonic()
+            try:
+                with Tracing.span("bedrock.{}".format(self.__stats_key(candidate))):
+                    response = self.__client(candidate.get("region")).converse(
+                        modelId=candidate.get("model_id"),
+                        system=system,
+                        messages=messages,
+                        inferenceConfig=inference_config
+                    )
+            except ClientError as e:
+                error_code = e.response.get('Error', {}).get('Code', "ClientError")
+                self.__record(candidate, (time.monotonic() - start) * 1000, error_code=error_code)
+                logger.error("BedrockRouter.converse: {} - {}".format(self.__stats_key(candidate), e))
+                continue
+            except Exception as e:
+                self.__record(candidate, (time.monotonic() - start) * 1000, error_code=type(e).__name__)
+                logger.error("BedrockRouter.converse: {} - {}".format(self.__stats_key(candidate), e))
+                continue
+            latency_ms = (time.monotonic() - start) * 1000
+            self.__record(candidate, latency_ms, usage=response.get("usage"))
+            logger.info("BedrockRouter.converse: tier {} served by {} in {:.0f}ms".format(
+                tier,
+                self.__stats_key(candidate),
+                latency_ms
+            ))
+            return response
+        logger.error("BedrockRouter.converse: all candidates failed for tier {}".format(tier))
+        return {}
+
+    @staticmethod
+    def stats() -> dict:
+        """
+        Returns the per-model latency and error stats.
+
+        Returns
+        -------
+            dict
+                a dictionary mapping "region/model_id" to its stats
+        """
+        return {
+            key: {name: value for name, value in stats.items() if name != "recent"}
+            for key, stats in MODEL_STATS.items()
+        }
@@ -0,0 +1,252 @@
+import boto3
+from botocore.exceptions import ClientError
+import hashlib
+import threading
+import time
+import Tracing
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+STATE_PENDING = "pending"
+STATE_DONE = "done"
+
+
+def grant_key(group_name: str, account_name: str, grants: list, expires_at=None) -> str:
+    """
+    Returns the coalescing key of a grant request, identical requests share the same key.
+
+    Parameters
+    ----------
+        group_name : str
+            the Okta group
+        account_name : str
+            the AWS account name
+        grants : list
+            the (service, resource, permission) tuples of the request, in any order
+        expires_at : datetime, optional
+            the expiry of a time-bound request, requests with another expiry are not identical
+    """
+    raw_key = "|".join([group_name, account_name] + sorted(
+        "{}:{}:{}".format(service_name.lower(), resource_name, permission.lower())
+        for service_name, resource_name, permission in grants
+    ))
+    if expires_at:
+        raw_key += "|expires:{}".format(expires_at.isoformat())
+    return "grant#{}".format(hashlib.sha256(raw_key.encode('utf-8')).hexdigest()[:24])
+
+
+class DynamoSingleFlight:
+    """
+    A class used to coalesce identical concurrent requests across Lambda invocations
+
+    The first request for a key becomes the leader and runs the pipeline, the others wait for
+    its result. Records are kept in the jobs status table, keyed by the coalescing key.
+
+    ...
+
+    Attributes
+    ----------
+    table_name : str
+        the name of the DynamoDB table
+    lease_seconds : int
+        how long a leader owns a key before another request may take it over
+    result_ttl_seconds : int
+        how long a completed result is shared with late identical requests
+
+    Methods
+    -------
+    acquire(key: str) -> bool:
+        Tries to become the leader for a key
+    wait(key: str, timeout_seconds: float) -> str:
+        Waits for the leader's result
+    complete(key: str, message: str):
+        Publishes the leader's result
+    abandon(key: str):
+        Releases a key after a failure so a waiting request can take over
+    """
+
+    def __init__(self, table_name: str, lease_seconds=600, result_ttl_seconds=600, poll_interval_seconds=2):
+        """
+        Constructs all the necessary attributes for the DynamoSingleFlight object.
+
+        Parameters
+        ----------
+            table_name : str
+                the name of the DynamoDB table
+            lease_seconds : int, optional
+                how long a leader owns a key (default is 600)
+            result_ttl_seconds : int, optional
+                how long a completed result is shared (default is 600)
+            poll_interval_seconds : int, optional
+                how often a waiting request polls for the result (default is 2)
+        """
+        self.table_name = table_name
+        self.lease_seconds = lease_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.client = boto3.client('dynamodb')
+
+    @Tracing.traced("coalescing.acquire")
+    def acquire(self, key: str) -> bool:
+        """
+        Tries to become the leader for a key.
+
+        Parameters
+        ----------
+            key : str
+                the coalescing key
+
+        Returns
+        -------
+            bool
+                True if this request is the leader, False if an identical request is running or recently finished
+        """
+        now = int(time.time())
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={
+                    "request_id": {"S": key},
+                    "state": {"S": STATE_PENDING},
+                    "lease_expires_at": {"N": str(now + self.lease_seconds)},
+                    "expires_at": {"N": str(now + self.lease_seconds + self.result_ttl_seconds)}
+                },
+                ConditionExpression="attribute_not_exists(request_id) OR lease_expires_at < :now",
+                ExpressionAttributeValues={":now": {"N": str(now)}}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                # Fail open, coalescing is an optimization
+                logger.error("Coalescing.DynamoSingleFlight.acquire: {}".format(e))
+                return True
+            return False
+        return True
+
+    @Tracing.traced("coalescing.wait")
+    def wait(self, key: str, timeout_seconds: float) -> str:
+        """
+        Waits for the leader's result.
+
+        Parameters
+        ----------
+            key : str
+                the coalescing key
+            timeout_seconds : float
+                the maximum time to wait
+
+        Returns
+        -------
+            str
+                the leader's Slack message, empty string on timeout or if the leader abandoned the key
+        """
+        deadline = time.monotonic() + timeout_seconds
+        while time.monotonic() < deadline:
+            try:
+                item = self.client.get_item(
+                    TableName=self.table_name,
+                    Key={"request_id": {"S": key}},
+                    ConsistentRead=True
+                ).get("Item")
+            except ClientError as e:
+                logger.error("Coalescing.DynamoSingleFlight.wait: {}".format(e))
+                return ""
+            if not item:
+                return ""
+            if item.get("state", {}).get("S") == STATE_DONE:
+                return item.get("message", {}).get("S", "")
+            time.sleep(self.poll_interval_seconds)
+        return ""
+
+    def complete(self, key: str, message: str):
+        """
+        Publishes the leader's result to the waiting and late identical requests.
+
+        Parameters
+        ----------
+            key : str
+                the coalescing key
+            message : str
+                the leader's Slack message
+        """
+        now = int(time.time())
+        try:
+            self.client.update_item(
+                TableName=self.table_name,
+                Key={"request_id": {"S": key}},
+                UpdateExpression="SET #state = :done, #message = :message, lease_expires_at = :lease, expires_at = :expires",
+                ExpressionAttributeNames={"#state": "state", "#message": "message"},
+                ExpressionAttributeValues={
+                    ":done": {"S": STATE_DONE},
+                    ":message": {"S": message},
+                    ":lease": {"N": str(now + self.result_ttl_seconds)},
+                    ":expires": {"N": str(now + self.result_ttl_seconds)}
+                }
+            )
+        except ClientError as e:
+            logger.error("Coalescing.DynamoSingleFlight.complete: {}".format(e))
+
+    def abandon(self, key: str):
+        """
+        Releases a key after a failure so a waiting request can take over.
+
+        Parameters
+        ----------
+            key : str
+                the coalescing key
+        """
+        try:
+            self.client.delete_item(TableName=self.table_name, Key={"request_id": {"S": key}})
+        except ClientError as e:
+            logger.error("Coalescing.DynamoSingleFlight.abandon: {}".format(e))
+
+
+class InMemorySingleFlight:
+    """
+    A local stand-in for DynamoSingleFlight, coalescing requests within one process
+    """
+
+    def __init__(self, result_ttl_seconds=600):
+        self.result_ttl_seconds = result_ttl_seconds
+        self.flights = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, key: str) -> bool:
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight and (not flight["done"].is_set() or flight["expires_at"] > time.monotonic()):
+                return False
+            self.flights[key] = {"done": threading.Event(), "message": "", "expires_at": 0}
+            return True
+
+    def wait(self, key: str, timeout_seconds: float) -> str:
+        flight = self.flights.get(key)
+        if not flight or not flight["done"].wait(timeout_seconds):
+            return ""
+        return flight["message"]
+
+    def complete(self, key: str, message: str):
+        flight = self.flights.get(key)
+        if flight:
+            flight["message"] = message
+            flight["expires_at"] = time.monotonic() + self.result_ttl_seconds
+            flight["done"].set()
+
+    def abandon(self, key: str):
+        with self.lock:
+            flight = self.flights.pop(key, None)
+        if flight:
+            flight["done"].set()
+
+
+# Used when no status table is configured, survives across warm invocations only
+IN_MEMORY_SINGLE_FLIGHT = InMemorySingleFlight()
+
+
+def get_single_flight(table_name=None):
+    """
+    Returns the DynamoDB backed single flight if a table is configured, the in-memory one otherwise.
+    """
+    if table_name:
+        return DynamoSingleFlight(table_name=table_name)
+    return IN_MEMORY_SINGLE_FLIGHT
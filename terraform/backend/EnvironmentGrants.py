@@ -0,0 +1,262 @@
+import fnmatch
+import re
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+LIST_ASSIGNMENT = re.compile(r"^\s*(\w+)\s*=\s*\[", re.MULTILINE)
+QUOTED_STRING = re.compile(r'"((?:[^"\\]|\\.)*)"')
+POLICY_DOCUMENT = re.compile(r'data\s+"aws_iam_policy_document"\s+"[^"]*"\s*\{')
+STATEMENT = re.compile(r"\bstatement\s*\{")
+VARIABLE_REFERENCE = re.compile(r"\bvar\.(\w+)")
+VARIABLE_DECLARATION = re.compile(r'variable\s+"(\w+)"')
+# A resource of a grant is listed in a "<service>_<permission>_<resources>" variable of the module
+RESOURCE_SUFFIXES = {"s3": "buckets", "sqs": "queues"}
+
+
+def strip_comments(text: str) -> str:
+    """
+    Removes the # and // line comments and the /* */ block comments outside of strings.
+    """
+    kept = []
+    position = 0
+    in_string = False
+    while position < len(text):
+        character = text[position]
+        if in_string:
+            if character == "\\":
+                kept.append(text[position:position + 2])
+                position += 2
+                continue
+            if character == '"':
+                in_string = False
+        elif character == '"':
+            in_string = True
+        elif character == "#" or text.startswith("//", position):
+            end = text.find("\n", position)
+            position = len(text) if end < 0 else end
+            continue
+        elif text.startswith("/*", position):
+            end = text.find("*/", position + 2)
+            position = len(text) if end < 0 else end + 2
+            continue
+        kept.append(character)
+        position += 1
+    return "".join(kept)
+
+
+def block_body(text: str, opening: int) -> str:
+    """
+    Returns the text between the bracket at the opening position and its matching closing bracket.
+    """
+    pairs = {"{": "}", "[": "]"}
+    closing = pairs[text[opening]]
+    depth = 0
+    in_string = False
+    escaped = False
+    for position in range(opening, len(text)):
+        character = text[position]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif character == "\\":
+                escaped = True
+            elif character == '"':
+                in_string = False
+        elif character == '"':
+            in_string = True
+        elif character == text[opening]:
+            depth += 1
+        elif character == closing:
+            depth -= 1
+            if depth == 0:
+                return text[opening + 1:position]
+    return text[opening + 1:]
+
+
+def remove_list_value(text: str, variable: str, value: str) -> str:
+    """
+    Removes a quoted value from the list assignment of a variable, keeping the layout of the other values.
+    Returns the text unchanged if the variable does not list the value.
+    """
+    for match in re.finditer(r"^[ \t]*{}\s*=\s*\[".format(re.escape(variable)), text, re.MULTILINE):
+        opening = match.end() - 1
+        body = block_body(text, opening)
+        values = QUOTED_STRING.findall(body)
+        if value not in values:
+            continue
+        if values == [value]:
+            new_body = ""
+        elif "\n" in body:
+            # One value per line, the line of the value is dropped with its comment
+            kept_lines = []
+            for line in body.split("\n"):
+                if re.fullmatch(r'\s*"{}"\s*,?\s*((#|//).*)?'.format(re.escape(value)), line):
+                    continue
+                kept_lines.append(re.sub(r'"{}"\s*,\s*'.format(re.escape(value)), "", line))
+            new_body = "\n".join(kept_lines)
+        else:
+            new_body = ", ".join('"{}"'.format(kept_value) for kept_value in values if kept_value != value)
+        return text[:opening + 1] + new_body + text[opening + 1 + len(body):]
+    return text
+
+
+class EnvironmentGrants:
+    """
+    A class used to find the grants an environment file already has
+
+    The list variables of the environment file (e.g. s3_read_buckets = ["name"]) are matched with the
+    variables of the SSO module, and the module policy documents resolve the actions every variable grants,
+    so a resource listed in a broader variable (e.g. one whose actions include the read actions) covers
+    a read request too.
+
+    ...
+
+    Attributes
+    ----------
+    assignments : dict
+        the list variables of the environment file, variable name -> listed values
+    variable_actions : dict
+        the actions the module policy documents grant on every variable, variable name -> set of actions
+    module_variables : set
+        the variables declared by the module
+
+    Methods
+    -------
+    grant_variable(service_name: str, permission: str) -> str:
+        Returns the module variable a grant adds its resource to, empty string if unknown
+    covering_variable(service_name: str, resource_name: str, permission: str) -> str:
+        Returns the variable of the environment file that already grants the permission on the resource
+    remove_grants(environment_text: str, grants: list) -> tuple:
+        Removes the resources of grants from their variables, for the revocation of expired grants
+    """
+
+    def __init__(self, environment_text: str, module_texts: list):
+        """
+        Constructs all the necessary attributes for the EnvironmentGrants object.
+
+        Parameters
+        ----------
+            environment_text : str
+                the Terraform environment file
+            module_texts : list
+                the Terraform files of the SSO module (variables.tf, data.tf, main.tf)
+        """
+        self.assignments = self.__parse_assignments(strip_comments(environment_text or ""))
+        module_text = strip_comments("\n".join(text or "" for text in module_texts))
+        self.module_variables = set(VARIABLE_DECLARATION.findall(module_text))
+        self.variable_actions = self.__parse_policy_actions(module_text)
+
+    @staticmethod
+    def __parse_assignments(text: str) -> dict:
+        assignments = {}
+        for match in LIST_ASSIGNMENT.finditer(text):
+            body = block_body(text, match.end() - 1)
+            assignments.setdefault(match.group(1), []).extend(QUOTED_STRING.findall(body))
+        return assignments
+
+    @staticmethod
+    def __parse_policy_actions(text: str) -> dict:
+        """
+        Returns the actions of the Allow statements of every policy document, by the variable of their resources.
+        """
+        variable_actions = {}
+        for document in POLICY_DOCUMENT.finditer(text):
+            document_body = block_body(text, document.end() - 1)
+            for statement in STATEMENT.finditer(document_body):
+                statement_body = block_body(document_body, statement.end() - 1)
+                if re.search(r'\beffect\s*=\s*"Deny"', statement_body):
+                    continue
+                actions = re.search(r"^\s*actions\s*=\s*\[", statement_body, re.MULTILINE)
+                resources = re.search(r"^\s*resources\s*=(.*)$", statement_body, re.MULTILINE)
+                if not actions or not resources:
+                    continue
+                action_names = set(QUOTED_STRING.findall(block_body(statement_body, actions.end() - 1)))
+                for variable in VARIABLE_REFERENCE.findall(resources.group(1)):
+                    variable_actions.setdefault(variable, set()).update(action_names)
+        return variable_actions
+
+    def grant_variable(self, service_name: str, permission: str) -> str:
+        """
+        Returns the module variable a grant adds its resource to, empty string if the module has none.
+        """
+        variable = "{}_{}_{}".format(service_name, permission, RESOURCE_SUFFIXES.get(service_name, ""))
+        if variable in self.module_variables or variable in self.assignments:
+            return variable
+        return ""
+
+    @staticmethod
+    def __covers(actions: set, requested_actions: set) -> bool:
+        """
+        Returns True if every requested action matches an action (or an action wildcard) of the set.
+        """
+        return all(
+            any(fnmatch.fnmatchcase(requested.lower(), action.lower()) for action in actions)
+            for requested in requested_actions
+        )
+
+    def covering_variable(self, service_name: str, resource_name: str, permission: str) -> str:
+        """
+        Returns the variable of the environment file that already grants the permission on the resource.
+
+        The resource must be listed (or matched by a listed wildcard) in the variable of the grant itself, or in a
+        variable of the same service whose policy actions include every action of the grant variable.
+
+        Parameters
+        ----------
+            service_name : str
+                the AWS service of the grant
+            resource_name : str
+                the resource of the grant
+            permission : str
+                the permission of the grant
+
+        Returns
+        -------
+            str
+                the covering variable, empty string if the grant is not in the environment file or cannot be resolved
+        """
+        requested_variable = self.grant_variable(service_name, permission)
+        if not requested_variable:
+            return ""
+        requested_actions = self.variable_actions.get(requested_variable)
+        for variable, values in self.assignments.items():
+            if not any(value == resource_name or fnmatch.fnmatchcase(resource_name, value) for value in values):
+                continue
+            if variable == requested_variable:
+                return variable
+            if (
+                    requested_actions
+                    and variable.startswith("{}_".format(service_name))
+                    and self.__covers(self.variable_actions.get(variable, set()), requested_actions)
+            ):
+                return variable
+        return ""
+
+    def remove_grants(self, environment_text: str, grants: list) -> tuple:
+        """
+        Removes the resources of grants from the variable of every grant, without Bedrock.
+
+        Parameters
+        ----------
+            environment_text : str
+                the Terraform environment file
+            grants : list
+                the (service, resource, permission) tuples to revoke
+
+        Returns
+        -------
+            tuple
+                the new environment file, and the removed and the not found grants
+        """
+        removed_grants = []
+        missing_grants = []
+        for service_name, resource_name, permission in grants:
+            variable = self.grant_variable(service_name, permission)
+            new_text = remove_list_value(environment_text, variable, resource_name) if variable else environment_text
+            if new_text == environment_text:
+                missing_grants.append((service_name, resource_name, permission))
+                continue
+            environment_text = new_text
+            removed_grants.append((service_name, resource_name, permission))
+        return environment_text, removed_grants, missing_grants
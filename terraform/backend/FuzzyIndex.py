@@ -0,0 +1,133 @@
+import collections
+
+NGRAM_SIZE = 3
+# Candidates sharing the most n-grams with the query are re-ranked by edit distance
+RERANK_CANDIDATES = 50
+# Trigrams in more names than this (and a quarter of the names) are not used to find candidates
+COMMON_GRAM_POSTINGS = 100
+
+
+class FuzzyIndex:
+    """
+    A class used to suggest the closest names to a misspelled one
+
+    Names are indexed by their character trigrams, so a lookup only scores the names sharing a trigram
+    with the query, then ranks the best candidates by edit distance. Building the index over 10k names
+    takes tens of milliseconds and a lookup a few milliseconds, no listing API is called.
+
+    ...
+
+    Attributes
+    ----------
+    names : list
+        the indexed names
+
+    Methods
+    -------
+    suggest(query: str, limit=3) -> list:
+        Returns the closest names to the query
+    distance(first: str, second: str, maximum: int) -> int:
+        Returns the edit distance between two names, maximum + 1 if it is larger than maximum
+    """
+
+    def __init__(self, names):
+        """
+        Constructs all the necessary attributes for the FuzzyIndex object.
+
+        Parameters
+        ----------
+            names : iterable
+                the names to index
+        """
+        self.names = list(dict.fromkeys(names))
+        self.__postings = collections.defaultdict(list)
+        self.__gram_counts = []
+        for position, name in enumerate(self.names):
+            grams = self.__grams(name)
+            self.__gram_counts.append(len(grams))
+            for gram in grams:
+                self.__postings[gram].append(position)
+
+    @staticmethod
+    def __grams(name: str) -> set:
+        padded = "^{}$".format(name.lower())
+        return {padded[start:start + NGRAM_SIZE] for start in range(max(1, len(padded) - NGRAM_SIZE + 1))}
+
+    @staticmethod
+    def distance(first: str, second: str, maximum: int) -> int:
+        """
+        Returns the edit distance (Levenshtein, case insensitive) between two names.
+
+        Parameters
+        ----------
+            first : str
+                the first name
+            second : str
+                the second name
+            maximum : int
+                the largest distance of interest, the computation stops early above it
+
+        Returns
+        -------
+            int
+                the edit distance, maximum + 1 if it is larger than maximum
+        """
+        first, second = first.lower(), second.lower()
+        if abs(len(first) - len(second)) > maximum:
+            return maximum + 1
+        previous = list(range(len(second) + 1))
+        for row, first_character in enumerate(first, start=1):
+            current = [row]
+            for column, second_character in enumerate(second, start=1):
+                current.append(min(
+                    previous[column] + 1,
+                    current[column - 1] + 1,
+                    previous[column - 1] + (first_character != second_character)
+                ))
+            if min(current) > maximum:
+                return maximum + 1
+            previous = current
+        return previous[-1]
+
+    def suggest(self, query: str, limit=3) -> list:
+        """
+        Returns the closest names to the query.
+
+        Parameters
+        ----------
+            query : str
+                the misspelled name
+            limit : int, optional
+                the maximum number of suggestions (default is 3)
+
+        Returns
+        -------
+            list
+                the closest names, best first, empty list if nothing is close enough
+        """
+        if not query or not self.names:
+            return []
+        query_grams = self.__grams(query)
+        # Trigrams shared by most names (e.g. "-pr" in a "*-prod-*" naming scheme) do not discriminate,
+        # they are skipped unless the query has nothing else
+        common = max(COMMON_GRAM_POSTINGS, len(self.names) // 4)
+        selective_grams = [gram for gram in query_grams if len(self.__postings.get(gram, ())) <= common]
+        shared = collections.Counter()
+        for gram in selective_grams or query_grams:
+            shared.update(self.__postings.get(gram, ()))
+        # Dice coefficient over the trigram sets
+        scored = sorted(
+            shared.items(),
+            key=lambda item: 2 * item[1] / (len(query_grams) + self.__gram_counts[item[0]]),
+            reverse=True
+        )[:RERANK_CANDIDATES]
+        maximum = max(2, len(query) // 3)
+        ranked = []
+        for position, shared_grams in scored:
+            name = self.names[position]
+            name_distance = self.distance(query, name, maximum)
+            similarity = 2 * shared_grams / (len(query_grams) + self.__gram_counts[position])
+            if name_distance <= maximum or similarity >= 0.6:
+                ranked.append((name_distance, -similarity, name))
+        ranked.sort()
+        return [name for _, _, name in ranked[:limit]]
@@ -1,12 +1,41 @@
 import base64
+import urllib.error
 import urllib.parse
 import urllib.request
 import json
 import datetime
 import logging
+import time
+import Resilience
+import Tracing
 logger = logging.getLogger()
 logger.setLevel("INFO")
 
+# The environment repository tree index, kept at module scope so warm invocations only revalidate its ETag
+ENVIRONMENT_TREE_CACHE = {"key": None, "etag": None, "sha": None, "index": None, "checked_at": 0}
+# Blob contents by SHA, a blob never changes
+BLOB_CACHE = {}
+BLOB_CACHE_MAX_ENTRIES = 256
+# The decoded module files by module path, the module changes far less often than the environment files
+MODULE_FILES_CACHE = {"key": None, "files": {}, "read_at": 0}
+MODULE_FILE_NAMES = ("data", "main", "variables")
+
+# Every file of a grant and the head commit of the main branch, in one GraphQL request
+GRANT_FILES_QUERY = """
+query($owner: String!, $environmentRepository: String!, $moduleRepository: String!, $branch: String!,
+      $environmentFile: String!, $dataFile: String!, $mainFile: String!, $variablesFile: String!) {
+  environment: repository(owner: $owner, name: $environmentRepository) {
+    head: ref(qualifiedName: $branch) { target { oid } }
+    file: object(expression: $environmentFile) { ... on Blob { oid text } }
+  }
+  module: repository(owner: $owner, name: $moduleRepository) {
+    data: object(expression: $dataFile) { ... on Blob { text } }
+    main: object(expression: $mainFile) { ... on Blob { text } }
+    variables: object(expression: $variablesFile) { ... on Blob { text } }
+  }
+}
+"""
+
 
 class GithubConnector:
     """
@@ -35,6 +64,18 @@ class GithubConnector:
     -------
     read_file_content(repository_name: str, file_path: str, ref=None) -> tuple[str, str]:
         Reads the content of a file in a repository
+    read_environment_tree(ttl_seconds=60) -> dict:
+        Indexes the environment files of the SSO account path as group -> account -> blob SHA
+    read_blob_content(repository_name: str, blob_sha: str) -> str:
+        Reads the content of a blob by its SHA
+    read_grant_files(environment_file_path: str, module_path: str, ref=None) -> dict:
+        Reads the environment file, the module files and the main branch head of a grant in one GraphQL request
+    read_module_files(module_path: str, ttl_seconds=300) -> dict:
+        Reads the decoded data.tf, main.tf and variables.tf of the module, cached for ttl_seconds
+    find_open_pull_request(group_name: str, account_name: str, window_minutes: int) -> dict:
+        Finds an open bot pull request for an environment file, opened within the window
+    read_pull_request_state(pull_request_url: str) -> str:
+        Reads whether a pull request of the environment repository is open, merged or closed
     create_full_request(
         group_name: str,
         account_name: str,
@@ -42,9 +83,14 @@ class GithubConnector:
         service_name: str,
         user_name: str,
         permission: str,
-        resource_name: str
+        resource_name: str,
+        grants=None,
+        pull_request=None,
+        rolling=False,
+        file_sha=None,
+        base_sha=None
     ) -> str:
-        Creates a full request
+        Creates a full request, or adds the change to an open bot pull request
     """
 
     def __init__(
@@ -79,6 +125,7 @@ class GithubConnector:
         self.terraform_module_repository_name = terraform_module_repository_name
         self.terraform_environment_sso_account_path = terraform_environment_sso_account_path
 
+    @Tracing.traced("github.read_file_content")
     def read_file_content(self, repository_name: str, file_path: str, ref=None) -> tuple[str, str]:
         """
         Reads the content of a file in a repository.
@@ -108,17 +155,400 @@ class GithubConnector:
         }
         try:
             request = urllib.request.Request("{}{}".format(self.base_url, endpoint), headers=request_headers)
-            with urllib.request.urlopen(request) as response:
+            with Resilience.urlopen(request, "github") as response:
                 if response.status == 200:
                     data = json.loads(response.read())
                     return data.get("content"), data.get("sha")
                 else:
                     logger.error("GithubConnector.read_file_content: {}".format(response.read()))
                     return "", ""
+        except Resilience.DependencyUnavailable:
+            raise
         except Exception as ex:
             logger.error("GithubConnector.read_file_content: {}".format(ex))
             return "", ""
 
+    def __index_tree(self, tree: dict) -> dict:
+        """
+        Maps the {sso account path}/{group}/{account}.tf blobs of a recursive tree to group -> account -> blob SHA.
+        """
+        prefix = "{}/".format(self.terraform_environment_sso_account_path.strip("/"))
+        index = {}
+        for entry in tree.get("tree", []):
+            path = entry.get("path", "")
+            if entry.get("type") != "blob" or not path.startswith(prefix) or not path.endswith(".tf"):
+                continue
+            parts = path[len(prefix):].split("/")
+            if len(parts) == 2:
+                index.setdefault(parts[0], {})[parts[1][:-len(".tf")]] = entry.get("sha")
+        return index
+
+    @Tracing.traced("github.read_environment_tree")
+    def read_environment_tree(self, ttl_seconds=60):
+        """
+        Indexes the environment files of the SSO account path from one recursive Git Trees call on the main branch.
+
+        The index is cached across warm invocations. Within ttl_seconds it is returned as is, after that the
+        tree is revalidated with its ETag (a 304 does not count against the GitHub rate limit) and only
+        indexed again if its SHA changed.
+
+        Parameters
+        ----------
+            ttl_seconds : int, optional
+                how long the cached index is used without revalidation (default is 60)
+
+        Returns
+        -------
+            dict
+                a dictionary mapping group names to {account name: blob SHA}, the cached index if GitHub fails,
+                None if no index could be read or the tree is too large to be returned in one call
+        """
+        cache_key = (self.owner, self.terraform_environment_repository_name, self.terraform_environment_sso_account_path)
+        if ENVIRONMENT_TREE_CACHE["key"] != cache_key:
+            ENVIRONMENT_TREE_CACHE.update({"key": cache_key, "etag": None, "sha": None, "index": None, "checked_at": 0})
+        cached_index = ENVIRONMENT_TREE_CACHE["index"]
+        if cached_index is not None and time.monotonic() - ENVIRONMENT_TREE_CACHE["checked_at"] < ttl_seconds:
+            return cached_index
+        endpoint = "/repos/{}/{}/git/trees/{}?recursive=1".format(
+            self.owner,
+            self.terraform_environment_repository_name,
+            self.main_branch_name
+        )
+        request_headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/vnd.github+json',
+            'Authorization': 'Bearer {}'.format(self.token)
+        }
+        if cached_index is not None and ENVIRONMENT_TREE_CACHE["etag"]:
+            request_headers['If-None-Match'] = ENVIRONMENT_TREE_CACHE["etag"]
+        try:
+            request = urllib.request.Request("{}{}".format(self.base_url, endpoint), headers=request_headers)
+            with Resilience.urlopen(request, "github") as response:
+                if response.getcode() != 200:
+                    logger.error("GithubConnector.read_environment_tree: {}".format(response.read()))
+                    return cached_index
+                etag = response.headers.get("ETag")
+                tree = json.loads(response.read())
+        except urllib.error.HTTPError as ex:
+            if ex.code == 304:
+                ENVIRONMENT_TREE_CACHE["checked_at"] = time.monotonic()
+                return cached_index
+            logger.error("GithubConnector.read_environment_tree: {}".format(ex))
+            return cached_index
+        except Resilience.DependencyUnavailable:
+            raise
+        except Exception as ex:
+            logger.error("GithubConnector.read_environment_tree: {}".format(ex))
+            return cached_index
+        if tree.get("truncated"):
+            logger.error("GithubConnector.read_environment_tree: the tree is truncated, files are read one by one")
+            return None
+        index = cached_index if tree.get("sha") == ENVIRONMENT_TREE_CACHE["sha"] else self.__index_tree(tree)
+        ENVIRONMENT_TREE_CACHE.update({
+            "etag": etag,
+            "sha": tree.get("sha"),
+            "index": index,
+            "checked_at": time.monotonic()
+        })
+        return index
+
+    @Tracing.traced("github.read_blob_content")
+    def read_blob_content(self, repository_name: str, blob_sha: str) -> str:
+        """
+        Reads the content of a blob by its SHA, cached across warm invocations.
+
+        Parameters
+        ----------
+            repository_name : str
+                The name of the repository
+            blob_sha : str
+                The SHA of the blob, from read_environment_tree
+
+        Returns
+        -------
+            str
+                The base64 content of the blob (like read_file_content) if successful, empty string otherwise
+        """
+        if blob_sha in BLOB_CACHE:
+            return BLOB_CACHE[blob_sha]
+        endpoint = "/repos/{}/{}/git/blobs/{}".format(self.owner, repository_name, blob_sha)
+        request_headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/vnd.github+json',
+            'Authorization': 'Bearer {}'.format(self.token)
+        }
+        try:
+            request = urllib.request.Request("{}{}".format(self.base_url, endpoint), headers=request_headers)
+            with Resilience.urlopen(request, "github") as response:
+                if response.getcode() != 200:
+                    logger.error("GithubConnector.read_blob_content: {}".format(response.read()))
+                    return ""
+                content = json.loads(response.read()).get("content") or ""
+        except Resilience.DependencyUnavailable:
+            raise
+        except Exception as ex:
+            logger.error("GithubConnector.read_blob_content: {}".format(ex))
+            return ""
+        if len(BLOB_CACHE) >= BLOB_CACHE_MAX_ENTRIES:
+            BLOB_CACHE.clear()
+        BLOB_CACHE[blob_sha] = content
+        return content
+
+    @Tracing.traced("github.read_grant_files")
+    def read_grant_files(self, environment_file_path: str, module_path: str, ref=None) -> dict:
+        """
+        Reads the environment file, the module files and the main branch head of a grant in one GraphQL request.
+
+        Parameters
+        ----------
+            environment_file_path : str
+                The path of the environment file in the environment repository
+            module_path : str
+                The path of the module directory (data.tf, main.tf, variables.tf) in the module repository
+            ref : str, optional
+                The branch to read the environment file from (default is None, the main branch)
+
+        Returns
+        -------
+            dict
+                The decoded "environment", "data", "main" and "variables" texts (empty if a file is missing),
+                the "environment_sha" blob SHA and the "head_sha" of the main branch, empty dict if the request failed
+        """
+        def expression(branch_name: str, path: str) -> str:
+            return "{}:{}".format(branch_name, "/".join(part for part in path.split("/") if part))
+
+        payload = {
+            "query": GRANT_FILES_QUERY,
+            "variables": {
+                "owner": self.owner,
+                "environmentRepository": self.terraform_environment_repository_name,
+                "moduleRepository": self.terraform_module_repository_name,
+                "branch": "refs/heads/{}".format(self.main_branch_name),
+                "environmentFile": expression(ref or self.main_branch_name, environment_file_path),
+                "dataFile": expression(self.main_branch_name, "{}/data.tf".format(module_path)),
+                "mainFile": expression(self.main_branch_name, "{}/main.tf".format(module_path)),
+                "variablesFile": expression(self.main_branch_name, "{}/variables.tf".format(module_path))
+            }
+        }
+        request_headers = {
+            'Content-Type': 'application/json',
+            'Authorization': 'Bearer {}'.format(self.token)
+        }
+        try:
+            request = urllib.request.Request(
+                url="{}/graphql".format(self.base_url),
+                headers=request_headers,
+                data=bytes(json.dumps(payload), encoding='utf-8'),
+                method='POST'
+            )
+            with Resilience.urlopen(request, "github") as response:
+                if response.getcode() != 200:
+                    logger.error("GithubConnector.read_grant_files: {}".format(response.read()))
+                    return {}
+                result = json.loads(response.read())
+        except Resilience.DependencyUnavailable:
+            raise
+        except Exception as ex:
+            logger.error("GithubConnector.read_grant_files: {}".format(ex))
+            return {}
+        environment = (result.get("data") or {}).get("environment")
+        module = (result.get("data") or {}).get("module")
+        if result.get("errors") or not environment or not module or not environment.get("head"):
+            logger.error("GithubConnector.read_grant_files: {}".format(result.get("errors")))
+            return {}
+        environment_file = environment.get("file") or {}
+        module_files = {name: (module.get(name) or {}).get("text") or "" for name in MODULE_FILE_NAMES}
+        if all(module_files.values()):
+            self.__cache_module_files(module_path, module_files)
+        return dict(
+            module_files,
+            environment=environment_file.get("text") or "",
+            environment_sha=environment_file.get("oid") or "",
+            head_sha=environment.get("head").get("target").get("oid")
+        )
+
+    def __cache_module_files(self, module_path: str, module_files: dict):
+        MODULE_FILES_CACHE.update({
+            "key": (self.owner, self.terraform_module_repository_name, module_path),
+            "files": module_files,
+            "read_at": time.monotonic()
+        })
+
+    @Tracing.traced("github.read_module_files")
+    def read_module_files(self, module_path: str, ttl_seconds=300) -> dict:
+        """
+        Reads the decoded data.tf, main.tf and variables.tf of the module, cached for ttl_seconds.
+
+        The GraphQL read of a grant refreshes the cache, the REST reads are only sent when it is stale.
+
+        Parameters
+        ----------
+            module_path : str
+                The path of the module directory in the module repository
+            ttl_seconds : int, optional
+                How long the cached files are used (default is 300)
+
+        Returns
+        -------
+            dict
+                The "data", "main" and "variables" texts, empty dict if a file could not be read
+        """
+        cache_key = (self.owner, self.terraform_module_repository_name, module_path)
+        if MODULE_FILES_CACHE["key"] == cache_key and time.monotonic() - MODULE_FILES_CACHE["read_at"] < ttl_seconds:
+            return MODULE_FILES_CACHE["files"]
+        module_files = {}
+        for name in MODULE_FILE_NAMES:
+            content = self.read_file_content(
+                repository_name=self.terraform_module_repository_name,
+                file_path="{}/{}.tf".format(module_path, name)
+            )[0]
+            if not content:
+                return {}
+            module_files[name] = base64.b64decode(content).decode("utf-8")
+        self.__cache_module_files(module_path, module_files)
+        return module_files
+
+    @staticmethod
+    def __rolling_branch_prefix(group_name: str, account_name: str) -> str:
+        return "aws_permissions_bot_rolling_{}_{}_".format(group_name, account_name)
+
+    @Tracing.traced("github.find_open_pull_request")
+    def find_open_pull_request(self, group_name: str, account_name: str, window_minutes: int) -> dict:
+        """
+        Finds an open bot pull request for an environment file, opened within the window.
+
+        Parameters
+        ----------
+            group_name : str
+                The name of the group
+            account_name : str
+                The name of the account
+            window_minutes : int
+                Only pull requests opened in the last window_minutes are reused
+
+        Returns
+        -------
+            dict
+                The branch, number, html_url and body of the newest matching pull request, empty dict otherwise
+        """
+        endpoint = "/repos/{}/{}/pulls?state=open&base={}&sort=created&direction=desc&per_page=100".format(
+            self.owner,
+            self.terraform_environment_repository_name,
+            self.main_branch_name
+        )
+        request_headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/vnd.github.audit-log-preview+json',
+            'Authorization': 'Bearer {}'.format(self.token)
+        }
+        branch_prefix = self.__rolling_branch_prefix(group_name, account_name)
+        window_start = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=window_minutes)
+        try:
+            request = urllib.request.Request("{}{}".format(self.base_url, endpoint), headers=request_headers)
+            with Resilience.urlopen(request, "github") as response:
+                if response.getcode() != 200:
+                    logger.error("GithubConnector.find_open_pull_request: {}".format(response.read()))
+                    return {}
+                pull_requests = json.loads(response.read())
+        except Resilience.DependencyUnavailable:
+            raise
+        except Exception as ex:
+            logger.error("GithubConnector.find_open_pull_request: {}".format(ex))
+            return {}
+        for pull_request in pull_requests:
+            created_at = datetime.datetime.strptime(
+                pull_request.get("created_at"),
+                "%Y-%m-%dT%H:%M:%SZ"
+            ).replace(tzinfo=datetime.timezone.utc)
+            if pull_request.get("head").get("ref").startswith(branch_prefix) and created_at >= window_start:
+                return {
+                    "branch": pull_request.get("head").get("ref"),
+                    "number": pull_request.get("number"),
+                    "html_url": pull_request.get("html_url"),
+                    "body": pull_request.get("body") or ""
+                }
+        return {}
+
+    @Tracing.traced("github.read_pull_request_state")
+    def read_pull_request_state(self, pull_request_url: str) -> str:
+        """
+        Reads whether a pull request of the environment repository is open, merged or closed.
+
+        Parameters
+        ----------
+            pull_request_url : str
+                The html url of the pull request (https://github.com/<owner>/<repository>/pull/<number>)
+
+        Returns
+        -------
+            str
+                "open", "merged" or "closed" (closed without merging), empty string otherwise
+        """
+        pull_request_number = (pull_request_url or "").rstrip("/").rpartition("/")[2]
+        if not pull_request_number.isdigit():
+            logger.error("GithubConnector.read_pull_request_state: invalid pull request {}".format(pull_request_url))
+            return ""
+        endpoint = "/repos/{}/{}/pulls/{}".format(
+            self.owner,
+            self.terraform_environment_repository_name,
+            pull_request_number
+        )
+        request_headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/vnd.github.audit-log-preview+json',
+            'Authorization': 'Bearer {}'.format(self.token)
+        }
+        try:
+            request = urllib.request.Request("{}{}".format(self.base_url, endpoint), headers=request_headers)
+            with Resilience.urlopen(request, "github") as response:
+                if response.getcode() != 200:
+                    logger.error("GithubConnector.read_pull_request_state: {}".format(response.read()))
+                    return ""
+                pull_request = json.loads(response.read())
+        except Resilience.DependencyUnavailable:
+            raise
+        except Exception as ex:
+            logger.error("GithubConnector.read_pull_request_state: {}".format(ex))
+            return ""
+        if pull_request.get("merged_at"):
+            return "merged"
+        return "open" if pull_request.get("state") == "open" else "closed"
+
+    @Tracing.traced("github.append_to_pull_request")
+    def __append_to_pull_request(self, pull_request: dict, description: str) -> bool:
+        endpoint = "/repos/{}/{}/pulls/{}".format(
+            self.owner,
+            self.terraform_environment_repository_name,
+            pull_request.get("number")
+        )
+        payload = {
+            "body": "{}\n{}".format(pull_request.get("body"), description)
+        }
+        request_headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/vnd.github.audit-log-preview+json',
+            'Authorization': 'Bearer {}'.format(self.token)
+        }
+        try:
+            request = urllib.request.Request(
+                url="{}{}".format(self.base_url, endpoint),
+                headers=request_headers,
+                data=bytes(json.dumps(payload), encoding='utf-8'),
+                method='PATCH'
+            )
+            with Resilience.urlopen(request, "github") as response:
+                if response.getcode() == 200:
+                    return True
+                else:
+                    logger.error("GithubConnector.__append_to_pull_request: {}".format(response.read()))
+                    return False
+        except Resilience.DependencyUnavailable:
+            raise
+        except Exception as ex:
+            logger.error("GithubConnector.__append_to_pull_request: {}".format(ex))
+            return False
+
+    @Tracing.traced("github.read_latest_commit_sha")
     def __read_latest_commit_sha(self):
         endpoint = "/repos/{}/{}/git/refs/heads/{}".format(
             self.owner,
@@ -132,21 +562,24 @@ class GithubConnector:
         }
         try:
             request = urllib.request.Request("{}{}".format(self.base_url, endpoint), headers=request_headers)
-            with urllib.request.urlopen(request) as response:
+            with Resilience.urlopen(request, "github") as response:
                 if response.getcode() == 200:
                     return json.loads(response.read())['object']['sha']
                 else:
                     logger.error("GithubConnector.__read_latest_commit_sha: {}".format(response.read()))
                     return ""
+        except Resilience.DependencyUnavailable:
+            raise
         except Exception as ex:
             logger.error("GithubConnector.__read_latest_commit_sha: {}".format(ex))
             return ""
 
-    def __create_new_branch(self, new_branch_name: str):
+    @Tracing.traced("github.create_new_branch")
+    def __create_new_branch(self, new_branch_name: str, base_sha=None):
         endpoint = "/repos/{}/{}/git/refs".format(self.owner, self.terraform_environment_repository_name)
         payload = {
             "ref": "refs/heads/{}".format(new_branch_name),
-            "sha": self.__read_latest_commit_sha()
+            "sha": base_sha or self.__read_latest_commit_sha()
         }
         request_headers = {
             'Content-Type': 'application/json',
@@ -159,16 +592,19 @@ class GithubConnector:
                 headers=request_headers,
                 data=bytes(json.dumps(payload), encoding='utf-8')
             )
-            with urllib.request.urlopen(request) as response:
+            with Resilience.urlopen(request, "github") as response:
                 if response.getcode() == 201:
                     return True
                 else:
                     logger.error("GithubConnector.__create_new_branch: {}".format(response.read()))
                     return False
+        except Resilience.DependencyUnavailable:
+            raise
         except Exception as ex:
             logger.error("GithubConnector.__create_new_branch: {}".format(ex))
             return False
 
+    @Tracing.traced("github.update_file")
     def __update_file(self, group_name: str, account_name: str, new_content: str, new_branch_name: str, file_sha: str):
         endpoint = "/repos/{}/{}/contents/{}/{}/{}.tf".format(
             self.owner,
@@ -195,16 +631,19 @@ class GithubConnector:
                 data=bytes(json.dumps(payload), encoding='utf-8'),
                 method='PUT'
             )
-            with urllib.request.urlopen(request) as response:
+            with Resilience.urlopen(request, "github") as response:
                 if response.getcode() == 200:
                     return True
                 else:
                     logger.error("GithubConnector.__update_file: {}".format(response.read()))
                     return False
+        except Resilience.DependencyUnavailable:
+            raise
         except Exception as ex:
             logger.error("GithubConnector.__update_file: {}".format(ex))
             return False
 
+    @Tracing.traced("github.create_full_request")
     def create_full_request(
         self,
         group_name: str,
@@ -213,10 +652,17 @@ class GithubConnector:
         service_name: str,
         user_name: str,
         permission: str,
-        resource_name: str
+        resource_name: str,
+        grants=None,
+        pull_request=None,
+        rolling=False,
+        file_sha=None,
+        base_sha=None,
+        expires_at=None,
+        revoke=False
     ) -> str:
         """
-        Creates a full request.
+        Creates a full request, or adds the change to an open bot pull request.
 
         Parameters
         ----------
@@ -234,22 +680,82 @@ class GithubConnector:
                 The permission
             resource_name : str
                 The name of the resource
+            grants : list, optional
+                The (service, resource, permission) tuples of a combined request, listed in the pull request body
+            pull_request : dict, optional
+                An open bot pull request from find_open_pull_request, the change is committed to its branch
+                and described in its body instead of opening a new pull request. new_content must be
+                generated from the file on that branch
+            rolling : bool, optional
+                Name the new branch so later requests can find it with find_open_pull_request (default is False)
+            file_sha : str, optional
+                The blob SHA of the environment file new_content was generated from (on the pull request branch
+                if any), the file is not read again and the update fails if it changed meanwhile (default is None,
+                read the file)
+            base_sha : str, optional
+                The main branch commit the files were read at, the new branch starts from it (default is None,
+                the latest commit)
+            expires_at : datetime, optional
+                The expiry of time-bound grants, noted in the pull request body (default is None, permanent)
+            revoke : bool, optional
+                The change removes expired grants, the branch and the body say so (default is False)
 
         Returns
         -------
             str
-                The url of the created pull request if successful, empty string otherwise
+                The url of the created (or updated) pull request if successful, empty string otherwise
         """
-        new_branch_name = "aws_permissions_bot_{}_{}_{}_in_{}_for_{}_{}".format(
-            service_name,
-            permission,
-            resource_name,
+        description = "AWS Permissions bot - updating {}/{}.tf - {} {} permission for {}".format(
+            group_name,
             account_name,
-            user_name,
-            int(datetime.datetime.now().timestamp()*1000)
+            "removing expired" if revoke else "adding",
+            permission,
+            user_name
         )
-        if self.__create_new_branch(new_branch_name):
-            file_path_sha = self.read_file_content(
+        if expires_at:
+            description += " until {}".format(expires_at.strftime("%Y-%m-%d %H:%M UTC"))
+        if grants:
+            description += "\n" + "\n".join(
+                "- {} {} permission to {}".format(grant_service, grant_permission, grant_resource)
+                for grant_service, grant_resource, grant_permission in grants
+            )
+
+        if pull_request:
+            file_path_sha = file_sha or self.read_file_content(
+                repository_name=self.terraform_environment_repository_name,
+                file_path="{}/{}/{}.tf".format(self.terraform_environment_sso_account_path, group_name, account_name),
+                ref=pull_request.get("branch")
+            )[1]
+            if not self.__update_file(group_name, account_name, new_content, pull_request.get("branch"), file_path_sha):
+                return ""
+            if not self.__append_to_pull_request(pull_request, description):
+                return ""
+            return pull_request.get("html_url")
+
+        if revoke:
+            new_branch_name = "aws_permissions_bot_revoke_{}_{}_{}_in_{}_{}".format(
+                service_name,
+                permission,
+                resource_name,
+                account_name,
+                int(datetime.datetime.now().timestamp()*1000)
+            )
+        elif rolling:
+            new_branch_name = "{}{}".format(
+                self.__rolling_branch_prefix(group_name, account_name),
+                int(datetime.datetime.now().timestamp()*1000)
+            )
+        else:
+            new_branch_name = "aws_permissions_bot_{}_{}_{}_in_{}_for_{}_{}".format(
+                service_name,
+                permission,
+                resource_name,
+                account_name,
+                user_name,
+                int(datetime.datetime.now().timestamp()*1000)
+            )
+        if self.__create_new_branch(new_branch_name, base_sha):
+            file_path_sha = file_sha or self.read_file_content(
                 repository_name=self.terraform_environment_repository_name,
                 file_path="{}/{}/{}.tf".format(self.terraform_environment_sso_account_path, group_name, account_name)
             )[1]
@@ -264,12 +770,7 @@ class GithubConnector:
                     "title": new_branch_name,
                     "head": new_branch_name,
                     "base": self.main_branch_name,
-                    "body": "AWS Permissions bot - updating {}/{}.tf - adding {} permission for {}".format(
-                        group_name,
-                        account_name,
-                        permission,
-                        user_name
-                    )
+                    "body": description
                 }
                 try:
                     request = urllib.request.Request(
@@ -278,12 +779,14 @@ class GithubConnector:
                         data=bytes(json.dumps(payload), encoding='utf-8'),
                         method='POST'
                     )
-                    with urllib.request.urlopen(request) as response:
+                    with Resilience.urlopen(request, "github") as response:
                         if response.getcode() == 201:
                             return json.loads(response.read()).get("html_url")
                         else:
                             logger.error("GithubConnector.create_full_request: {}".format(response.read()))
                             return ""
+                except Resilience.DependencyUnavailable:
+                    raise
                 except Exception as ex:
                     logger.error("GithubConnector.create_full_request: {}".format(ex))
                     return ""
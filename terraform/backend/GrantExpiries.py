@@ -0,0 +1,341 @@
+import boto3
+from botocore.exceptions import ClientError
+import datetime
+import re
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+STATUS_PENDING = "pending"
+# Removed by a revocation pull request that is not merged yet
+STATUS_REVOKING = "revoking"
+# The sparse index of the expiries by status, sorted by expiry
+DUE_INDEX_NAME = "due"
+# BatchWriteItem upper bound
+BATCH_WRITE_SIZE = 25
+RELATIVE_EXPIRY = re.compile(r"^(\d+)([mhdw])$")
+EXPIRY_UNITS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+
+def parse_expiry(value: str, now=None):
+    """
+    Returns the expiry of an --expires value, a duration (30m, 12h, 7d, 2w) or a UTC date (2026-11-01) or
+    date and time (2026-11-01T18:00), None if the value cannot be parsed or is not in the future.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    match = RELATIVE_EXPIRY.match((value or "").strip().lower())
+    if match:
+        # To the minute, so identical requests made together get the same expiry
+        expires_at = (now + datetime.timedelta(**{EXPIRY_UNITS[match.group(2)]: int(match.group(1))})).replace(
+            second=0,
+            microsecond=0
+        )
+    else:
+        try:
+            expires_at = datetime.datetime.fromisoformat((value or "").strip())
+        except ValueError:
+            return None
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=datetime.timezone.utc)
+    if expires_at <= now:
+        return None
+    return expires_at
+
+
+def grant_item_key(service_name: str, resource_name: str, permission: str) -> str:
+    return "{}|{}|{}".format(service_name, resource_name, permission)
+
+
+class ExpiryStore:
+    """
+    A class used to keep the expiry of the time-bound grants in DynamoDB
+
+    One item per grant, keyed by its environment file ("<group>/<account>") and its
+    "<service>|<resource>|<permission>". The items are in an index by status sorted by expiry, so the expiry
+    scheduler reads only the grants that are due. A grant whose revocation pull request is open is kept as
+    revoking with the pull request, and deleted once the pull request is merged.
+
+    ...
+
+    Attributes
+    ----------
+    table_name : str
+        the name of the DynamoDB expiry table
+
+    Methods
+    -------
+    record(group_name: str, account_name: str, grants: list, expires_at: datetime, user_name: str, pull_request_url: str) -> bool:
+        Records the expiry of the grants of a pull request
+    due(until: datetime) -> dict:
+        Returns the pending grants expiring until a time, by environment file
+    revoking() -> dict:
+        Returns the grants of the revocation pull requests not merged yet, by environment file
+    pending(group_name: str, account_name: str, resources: list) -> dict:
+        Returns the pending grants of resources of an environment file, whatever their permission
+    mark(file_name: str, records: list, status: str, revocation_url="") -> bool:
+        Moves records to revoking with their revocation pull request, or back to pending
+    delete(file_name: str, records: list) -> bool:
+        Deletes the records of revoked grants
+    """
+
+    def __init__(self, table_name: str):
+        """
+        Constructs all the necessary attributes for the ExpiryStore object.
+
+        Parameters
+        ----------
+            table_name : str
+                the name of the DynamoDB expiry table
+        """
+        self.table_name = table_name
+        self.client = boto3.client('dynamodb')
+
+    def __batch_write(self, requests: list) -> bool:
+        for start in range(0, len(requests), BATCH_WRITE_SIZE):
+            pending = {self.table_name: requests[start:start + BATCH_WRITE_SIZE]}
+            for _ in range(5):
+                response = self.client.batch_write_item(RequestItems=pending)
+                pending = response.get("UnprocessedItems") or {}
+                if not pending:
+                    break
+            if pending:
+                logger.error("GrantExpiries.ExpiryStore: {} unprocessed items".format(len(pending.get(self.table_name))))
+                return False
+        return True
+
+    def record(
+            self,
+            group_name: str,
+            account_name: str,
+            grants: list,
+            expires_at: datetime.datetime,
+            user_name: str,
+            pull_request_url: str
+    ) -> bool:
+        """
+        Records the expiry of the grants of a pull request, a grant recorded before gets the new expiry.
+
+        Parameters
+        ----------
+            group_name : str
+                the Okta group of the environment file
+            account_name : str
+                the AWS account name of the environment file
+            grants : list
+                the (service, resource, permission) tuples
+            expires_at : datetime
+                the expiry of the grants
+            user_name : str
+                the requester
+            pull_request_url : str
+                the pull request of the grants
+
+        Returns
+        -------
+            bool
+                True if recorded, False otherwise
+        """
+        file_name = "{}/{}".format(group_name, account_name)
+        try:
+            return self.__batch_write([
+                {"PutRequest": {"Item": {
+                    "file": {"S": file_name},
+                    "grant": {"S": grant_item_key(service_name, resource_name, permission)},
+                    "status": {"S": STATUS_PENDING},
+                    "expires_at": {"N": str(int(expires_at.timestamp()))},
+                    "user_name": {"S": user_name},
+                    "pull_request": {"S": pull_request_url}
+                }}}
+                for service_name, resource_name, permission in grants
+            ])
+        except ClientError as e:
+            logger.error("GrantExpiries.ExpiryStore.record: {}".format(e))
+            return False
+
+    @staticmethod
+    def __record(item: dict) -> dict:
+        return {
+            "grant": tuple(item["grant"]["S"].split("|", 2)),
+            "expires_at": int(item["expires_at"]["N"]),
+            "user_name": item.get("user_name", {}).get("S", ""),
+            "pull_request": item.get("pull_request", {}).get("S", ""),
+            "revocation": item.get("revocation", {}).get("S", "")
+        }
+
+    def __query_status(self, status: str, until=None) -> dict:
+        """
+        Returns the records of a status expiring until a time (any time if None), by environment file.
+        """
+        request = {
+            "TableName": self.table_name,
+            "IndexName": DUE_INDEX_NAME,
+            "KeyConditionExpression": "#status = :status",
+            "ExpressionAttributeNames": {"#status": "status"},
+            "ExpressionAttributeValues": {":status": {"S": status}}
+        }
+        if until is not None:
+            request["KeyConditionExpression"] += " AND expires_at <= :until"
+            request["ExpressionAttributeValues"][":until"] = {"N": str(int(until.timestamp()))}
+        records = {}
+        while True:
+            response = self.client.query(**request)
+            for item in response.get("Items") or []:
+                records.setdefault(item["file"]["S"], []).append(self.__record(item))
+            if not response.get("LastEvaluatedKey"):
+                break
+            request["ExclusiveStartKey"] = response.get("LastEvaluatedKey")
+        return records
+
+    def due(self, until: datetime.datetime) -> dict:
+        """
+        Returns the pending grants expiring until a time.
+
+        Parameters
+        ----------
+            until : datetime
+                the end of the expiry window
+
+        Returns
+        -------
+            dict
+                a dictionary mapping environment files ("<group>/<account>") to their due records, a record is
+                {"grant": (service, resource, permission), "expires_at", "user_name", "pull_request",
+                "revocation"}, None if the index cannot be read
+        """
+        try:
+            return self.__query_status(STATUS_PENDING, until=until)
+        except ClientError as e:
+            logger.error("GrantExpiries.ExpiryStore.due: {}".format(e))
+            return None
+
+    def revoking(self) -> dict:
+        """
+        Returns the grants removed by a revocation pull request that is not merged yet.
+
+        Returns
+        -------
+            dict
+                a dictionary mapping environment files ("<group>/<account>") to their records, the "revocation"
+                of a record is its revocation pull request, None if the index cannot be read
+        """
+        try:
+            return self.__query_status(STATUS_REVOKING)
+        except ClientError as e:
+            logger.error("GrantExpiries.ExpiryStore.revoking: {}".format(e))
+            return None
+
+    def pending(self, group_name: str, account_name: str, resources: list) -> dict:
+        """
+        Returns the pending grants of resources of an environment file, whatever their permission.
+
+        Parameters
+        ----------
+            group_name : str
+                the Okta group of the environment file
+            account_name : str
+                the AWS account name of the environment file
+            resources : list
+                the (service, resource) tuples
+
+        Returns
+        -------
+            dict
+                a dictionary mapping (service, resource, permission) to its record, a record is
+                {"grant", "expires_at", "user_name", "pull_request", "revocation"}, None if the table cannot be read
+        """
+        file_name = "{}/{}".format(group_name, account_name)
+        pending_grants = {}
+        try:
+            for service_name, resource_name in dict.fromkeys(resources):
+                request = {
+                    "TableName": self.table_name,
+                    "KeyConditionExpression": "#file = :file AND begins_with(#grant, :prefix)",
+                    "ExpressionAttributeNames": {"#file": "file", "#grant": "grant"},
+                    "ExpressionAttributeValues": {
+                        ":file": {"S": file_name},
+                        ":prefix": {"S": grant_item_key(service_name, resource_name, "")}
+                    },
+                    "ConsistentRead": True
+                }
+                while True:
+                    response = self.client.query(**request)
+                    for item in response.get("Items") or []:
+                        record = self.__record(item)
+                        # A resource name may be the prefix of another one
+                        if item.get("status", {}).get("S") != STATUS_PENDING or record["grant"][1] != resource_name:
+                            continue
+                        pending_grants[record["grant"]] = record
+                    if not response.get("LastEvaluatedKey"):
+                        break
+                    request["ExclusiveStartKey"] = response.get("LastEvaluatedKey")
+        except ClientError as e:
+            logger.error("GrantExpiries.ExpiryStore.pending: {}".format(e))
+            return None
+        return pending_grants
+
+    def mark(self, file_name: str, records: list, status: str, revocation_url="") -> bool:
+        """
+        Moves records to revoking with their revocation pull request, or back to pending to be revoked again.
+
+        Parameters
+        ----------
+            file_name : str
+                the environment file ("<group>/<account>")
+            records : list
+                the records from due() or revoking()
+            status : str
+                STATUS_REVOKING or STATUS_PENDING
+            revocation_url : str, optional
+                the revocation pull request of revoking records (default is "")
+
+        Returns
+        -------
+            bool
+                True if written, False otherwise
+        """
+        items = []
+        for record in records:
+            item = {
+                "file": {"S": file_name},
+                "grant": {"S": grant_item_key(*record["grant"])},
+                "status": {"S": status},
+                "expires_at": {"N": str(record["expires_at"])},
+                "user_name": {"S": record["user_name"]},
+                "pull_request": {"S": record["pull_request"]}
+            }
+            if revocation_url:
+                item["revocation"] = {"S": revocation_url}
+            items.append({"PutRequest": {"Item": item}})
+        try:
+            return self.__batch_write(items)
+        except ClientError as e:
+            logger.error("GrantExpiries.ExpiryStore.mark: {}".format(e))
+            return False
+
+    def delete(self, file_name: str, records: list) -> bool:
+        """
+        Deletes the records of revoked grants.
+
+        Parameters
+        ----------
+            file_name : str
+                the environment file ("<group>/<account>")
+            records : list
+                the records from due() or revoking()
+
+        Returns
+        -------
+            bool
+                True if deleted, False otherwise
+        """
+        try:
+            return self.__batch_write([
+                {"DeleteRequest": {"Key": {
+                    "file": {"S": file_name},
+                    "grant": {"S": grant_item_key(*record["grant"])}
+                }}}
+                for record in records
+            ])
+        except ClientError as e:
+            logger.error("GrantExpiries.ExpiryStore.delete: {}".format(e))
+            return False
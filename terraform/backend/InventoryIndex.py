@@ -0,0 +1,383 @@
+import bisect
+import boto3
+from botocore.exceptions import ClientError
+import datetime
+import FuzzyIndex
+import gzip
+import json
+import Organizations
+import os
+import time
+import Tracing
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+SNAPSHOT_VERSION = 2
+# Version 1 snapshots kept the resource names as JSON lists
+SUPPORTED_SNAPSHOT_VERSIONS = (1, 2)
+
+# The loaded indexes by (bucket, key), kept at module scope so warm invocations only revalidate their ETag
+INVENTORY_INDEX_CACHE = {}
+# The index of every organization, rebuilt when one of the organization indexes is reloaded
+MERGED_INDEX_CACHE = {"sources": [], "index": None}
+
+
+class InventoryIndex:
+    """
+    A class used to search a precomputed snapshot of the organization accounts and their resources
+
+    The snapshot is a gzipped JSON document in S3, written by the inventory sweep:
+    {"version": 2, "generated_at": "...", "sweep": {...}, "accounts": {name: id},
+     "resources": {account name: {service: "sorted names, one per line"}}}
+    One string per listing parses much faster than a list of names, a listing is split on first use.
+    Names are kept sorted, so a prefix search is a binary search. No AWS listing API is called.
+
+    ...
+
+    Attributes
+    ----------
+    snapshot : dict
+        the snapshot document
+    accounts : dict
+        a dictionary mapping AWS account names to their IDs
+    generated_at : datetime
+        when the snapshot was generated, None if unknown
+
+    Methods
+    -------
+    build_snapshot(accounts: dict, resources: dict, sweep=None) -> dict:
+        Builds a snapshot document
+    merge(indexes: list) -> InventoryIndex:
+        Merges the indexes of several organizations
+    age_seconds() -> float:
+        Returns the age of the snapshot
+    resource_names(account_name: str, service_name: str, prefix="") -> list:
+        Returns the sorted resource names of an account with a prefix, None if the account was not swept
+    search_accounts(query: str, limit=100) -> list:
+        Returns the account names matching a typed query
+    search_resources(account_name: str, service_name: str, query: str, limit=100) -> list:
+        Returns the resource names of an account matching a typed query
+    to_bytes() -> bytes:
+        Returns the compressed snapshot
+    from_bytes(data: bytes) -> InventoryIndex:
+        Loads an index from a compressed snapshot
+    load(bucket: str, key: str, ttl_seconds=60) -> InventoryIndex:
+        Loads the index from S3, cached across warm invocations
+    save(bucket: str, key: str) -> bool:
+        Writes the snapshot to S3
+    """
+
+    def __init__(self, snapshot: dict):
+        """
+        Constructs all the necessary attributes for the InventoryIndex object.
+
+        Parameters
+        ----------
+            snapshot : dict
+                the snapshot document, see build_snapshot
+        """
+        self.snapshot = snapshot
+        self.accounts = snapshot.get("accounts", {})
+        self.generated_at = None
+        if snapshot.get("generated_at"):
+            self.generated_at = datetime.datetime.fromisoformat(snapshot.get("generated_at"))
+        self.__resources = snapshot.get("resources", {})
+        self.__account_names = sorted(self.accounts)
+        self.__names = {}
+        self.__fuzzy_indexes = {}
+
+    @staticmethod
+    def build_snapshot(accounts: dict, resources: dict, sweep=None) -> dict:
+        """
+        Builds a snapshot document.
+
+        Parameters
+        ----------
+            accounts : dict
+                a dictionary mapping AWS account names to their IDs
+            resources : dict
+                a dictionary mapping account names to {service name: resource names}
+            sweep : dict, optional
+                the statistics of the sweep that listed the resources (default is None)
+
+        Returns
+        -------
+            dict
+                the snapshot document, with sorted resource names
+        """
+        return {
+            "version": SNAPSHOT_VERSION,
+            "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "sweep": sweep or {},
+            "accounts": accounts,
+            "resources": {
+                account_name: {
+                    service_name: "\n".join(sorted(set(names))) for service_name, names in services.items()
+                }
+                for account_name, services in resources.items()
+            }
+        }
+
+    @staticmethod
+    def merge(indexes: list):
+        """
+        Merges the indexes of several organizations, an account in several indexes is taken from the first one.
+
+        Parameters
+        ----------
+            indexes : list
+                the organization indexes, in the order of AWS_ORGANIZATIONS
+
+        Returns
+        -------
+            InventoryIndex
+                the merged index, as old as its oldest index
+        """
+        generated_at = [index.generated_at for index in indexes]
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "generated_at": None if None in generated_at else min(generated_at).isoformat(),
+            "sweep": {},
+            "accounts": {},
+            "resources": {}
+        }
+        for index in reversed(indexes):
+            snapshot["accounts"].update(index.accounts)
+            snapshot["resources"].update(index.snapshot.get("resources", {}))
+        return InventoryIndex(snapshot)
+
+    def age_seconds(self) -> float:
+        """
+        Returns the age of the snapshot in seconds, infinite if unknown.
+        """
+        if self.generated_at is None:
+            return float("inf")
+        return (datetime.datetime.now(datetime.timezone.utc) - self.generated_at).total_seconds()
+
+    def __service_names(self, account_name: str, service_name: str):
+        """
+        Returns the sorted names of a listing, split once, None if the listing is not in the snapshot.
+        """
+        key = (account_name, service_name)
+        if key not in self.__names:
+            names = self.__resources.get(account_name, {}).get(service_name)
+            if isinstance(names, str):
+                names = names.split("\n") if names else []
+            self.__names[key] = names
+        return self.__names[key]
+
+    def resource_names(self, account_name: str, service_name: str, prefix=""):
+        """
+        Returns the sorted resource names of an account with a prefix.
+
+        Parameters
+        ----------
+            account_name : str
+                the AWS account name
+            service_name : str
+                the service name (s3, sqs)
+            prefix : str, optional
+                the resource names prefix (default is "")
+
+        Returns
+        -------
+            list
+                the sorted resource names, None if the account or the service was not swept
+        """
+        names = self.__service_names(account_name, service_name)
+        if names is None or not prefix:
+            return names
+        start = bisect.bisect_left(names, prefix)
+        end = start
+        while end < len(names) and names[end].startswith(prefix):
+            end += 1
+        return names[start:end]
+
+    def __fuzzy_index(self, key: tuple, names: list):
+        if key not in self.__fuzzy_indexes:
+            self.__fuzzy_indexes[key] = FuzzyIndex.FuzzyIndex(names)
+        return self.__fuzzy_indexes[key]
+
+    def __search(self, key: tuple, names: list, query: str, limit: int) -> list:
+        """
+        Returns the names starting with the query, then containing it, then the closest ones.
+        """
+        if not query:
+            return names[:limit]
+        start = bisect.bisect_left(names, query)
+        results = []
+        for name in names[start:start + limit]:
+            if not name.startswith(query):
+                break
+            results.append(name)
+        if len(results) < limit:
+            lowered = query.lower()
+            found = set(results)
+            for name in names:
+                if lowered in name.lower() and name not in found:
+                    results.append(name)
+                    if len(results) >= limit:
+                        break
+        if not results:
+            results = self.__fuzzy_index(key, names).suggest(query, limit=min(limit, 10))
+        return results
+
+    @Tracing.traced("inventory.search_accounts")
+    def search_accounts(self, query: str, limit=100) -> list:
+        """
+        Returns the account names matching a typed query.
+
+        Parameters
+        ----------
+            query : str
+                the typed text
+            limit : int, optional
+                the maximum number of names (default is 100, the Slack options limit)
+
+        Returns
+        -------
+            list
+                the names starting with the query, then the names containing it, then the closest names
+        """
+        return self.__search(("accounts",), self.__account_names, query, limit)
+
+    @Tracing.traced("inventory.search_resources")
+    def search_resources(self, account_name: str, service_name: str, query: str, limit=100) -> list:
+        """
+        Returns the resource names of an account matching a typed query.
+
+        Parameters
+        ----------
+            account_name : str
+                the AWS account name
+            service_name : str
+                the service name (s3, sqs)
+            query : str
+                the typed text
+            limit : int, optional
+                the maximum number of names (default is 100, the Slack options limit)
+
+        Returns
+        -------
+            list
+                the names starting with the query, then the names containing it, then the closest names
+        """
+        names = self.__service_names(account_name, service_name) or []
+        return self.__search((account_name, service_name), names, query, limit)
+
+    def to_bytes(self) -> bytes:
+        return gzip.compress(json.dumps(self.snapshot, separators=(",", ":")).encode('utf-8'), compresslevel=6)
+
+    @staticmethod
+    def from_bytes(data: bytes):
+        snapshot = json.loads(gzip.decompress(data))
+        if snapshot.get("version") not in SUPPORTED_SNAPSHOT_VERSIONS:
+            logger.error("InventoryIndex.from_bytes: unsupported snapshot version {}".format(snapshot.get("version")))
+            return None
+        return InventoryIndex(snapshot)
+
+    @staticmethod
+    @Tracing.traced("inventory.load")
+    def load(bucket: str, key: str, ttl_seconds=60):
+        """
+        Loads the index from S3, cached across warm invocations.
+
+        Within ttl_seconds the cached index is returned as is, after that its ETag is revalidated and the
+        snapshot is only downloaded again if it changed.
+
+        Parameters
+        ----------
+            bucket : str
+                the S3 bucket of the snapshot
+            key : str
+                the S3 key of the snapshot
+            ttl_seconds : int, optional
+                how long the cached index is used without revalidation (default is 60)
+
+        Returns
+        -------
+            InventoryIndex
+                the index, the cached index if S3 fails, None if no index could be loaded
+        """
+        cache = INVENTORY_INDEX_CACHE.setdefault((bucket, key), {"index": None, "etag": None, "checked_at": 0})
+        cached_index = cache["index"]
+        if cached_index is not None and time.monotonic() - cache["checked_at"] < ttl_seconds:
+            return cached_index
+        request = {"Bucket": bucket, "Key": key}
+        if cached_index is not None and cache["etag"]:
+            request["IfNoneMatch"] = cache["etag"]
+        try:
+            response = boto3.client('s3').get_object(**request)
+            index = InventoryIndex.from_bytes(response.get("Body").read())
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ("304", "NotModified"):
+                cache["checked_at"] = time.monotonic()
+                return cached_index
+            logger.error("InventoryIndex.load: {}".format(e))
+            return cached_index
+        except Exception as e:
+            logger.error("InventoryIndex.load: {}".format(e))
+            return cached_index
+        if index is None:
+            return cached_index
+        cache.update({"index": index, "etag": response.get("ETag"), "checked_at": time.monotonic()})
+        return index
+
+    def save(self, bucket: str, key: str) -> bool:
+        """
+        Writes the snapshot to S3.
+
+        Parameters
+        ----------
+            bucket : str
+                the S3 bucket of the snapshot
+            key : str
+                the S3 key of the snapshot
+
+        Returns
+        -------
+            bool
+                True if the snapshot was written
+        """
+        try:
+            boto3.client('s3').put_object(
+                Bucket=bucket,
+                Key=key,
+                Body=self.to_bytes(),
+                ContentType="application/gzip"
+            )
+        except ClientError as e:
+            logger.error("InventoryIndex.save: {}".format(e))
+            return False
+        return True
+
+
+def load_configured_index(organization_name=None):
+    """
+    Loads the index configured by INVENTORY_BUCKET and the inventory key of every organization, None if not
+    configured. The indexes of several organizations are merged, unless organization_name selects one of them.
+    """
+    bucket = os.getenv("INVENTORY_BUCKET")
+    if not bucket:
+        return None
+    organizations = Organizations.get_organizations()
+    if organization_name is not None:
+        organizations = [organization for organization in organizations if organization.name == organization_name]
+    indexes = [
+        index for index in (
+            InventoryIndex.load(
+                bucket,
+                organization.inventory_key,
+                ttl_seconds=int(os.getenv("INVENTORY_INDEX_TTL_SECONDS", "60"))
+            )
+            for organization in organizations
+        )
+        if index is not None
+    ]
+    if len(indexes) <= 1:
+        return indexes[0] if indexes else None
+    sources = MERGED_INDEX_CACHE["sources"]
+    if len(sources) != len(indexes) or any(source is not index for source, index in zip(sources, indexes)):
+        MERGED_INDEX_CACHE.update({"sources": indexes, "index": InventoryIndex.merge(indexes)})
+    return MERGED_INDEX_CACHE["index"]
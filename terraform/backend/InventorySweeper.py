@@ -0,0 +1,140 @@
+import AggregatorInventory
+import AWSHandler
+import boto3
+import concurrent.futures
+import Organizations
+import os
+import time
+import Tracing
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+
+class InventorySweeper:
+    """
+    A class used to list the resources of every account of every organization in parallel
+
+    The accounts of an organization with an org-wide aggregator (AWS_INVENTORY_BACKEND, or the inventory_backend
+    of the organization) are listed by one query per service instead, the other accounts of every organization
+    share one pool of workers.
+
+    ...
+
+    Attributes
+    ----------
+    services : tuple
+        the services to list in every account
+    max_workers : int
+        the number of accounts listed concurrently
+    stats : dict
+        the duration, listed accounts and failed accounts of the last sweep
+
+    Methods
+    -------
+    sweep() -> tuple:
+        Lists every account, returns the account map and the resources per account and service
+    """
+
+    def __init__(self, services=("s3", "sqs"), max_workers=16):
+        """
+        Constructs all the necessary attributes for the InventorySweeper object.
+
+        Parameters
+        ----------
+            services : tuple, optional
+                the services to list in every account (default is ("s3", "sqs"))
+            max_workers : int, optional
+                the number of accounts listed concurrently (default is 16)
+        """
+        self.services = services
+        self.max_workers = max_workers
+        self.stats = {}
+
+    def __list_account(self, account_name: str) -> dict:
+        """
+        Assumes the security-scanning role into one account and lists its services.
+        """
+        aws_connector = AWSHandler.AWSConnector(account_name, resolve_ou=False)
+        account_resources = {}
+        for service_name in self.services:
+            if service_name == "s3":
+                account_resources[service_name] = aws_connector.list_s3_buckets()
+            elif service_name == "sqs":
+                account_resources[service_name] = aws_connector.list_sqs_queues()
+        return account_resources
+
+    def __sweep_aggregator(self, aggregator_inventory, accounts: dict) -> dict:
+        """
+        Lists every account from the org-wide aggregator, an account without resources has empty listings,
+        None if the aggregator failed.
+        """
+        resources_by_id = aggregator_inventory.resources_by_account(self.services)
+        if resources_by_id is None:
+            return None
+        return {
+            account_name: resources_by_id.get(account_id, {service_name: [] for service_name in self.services})
+            for account_name, account_id in accounts.items()
+        }
+
+    @Tracing.traced("inventory.sweep")
+    def sweep(self) -> tuple:
+        """
+        Lists every account of every organization, returns the account map and the resources per account
+        and service.
+
+        Accounts that fail (e.g. the role is missing) are left out of the resources, so the handler
+        lists them live instead of trusting an empty listing.
+
+        Returns
+        -------
+            tuple
+                a dictionary mapping AWS account names to their IDs, and a dictionary mapping account names to
+                {service name: resource names}
+        """
+        start = time.perf_counter()
+        accounts = AWSHandler.AWSConnector("", resolve_ou=False).aws_accounts
+        account_organizations = Organizations.merged_accounts(
+            ttl_seconds=int(os.getenv("AWS_ACCOUNTS_CACHE_TTL_SECONDS", "300"))
+        )
+        resources = {}
+        failed_accounts = []
+        listed_accounts = dict(accounts)
+        for organization in Organizations.get_organizations():
+            aggregator_inventory = AggregatorInventory.get_aggregator_inventory(organization)
+            if aggregator_inventory is None:
+                continue
+            organization_accounts = {
+                account_name: account_id for account_name, account_id in accounts.items()
+                if account_organizations.get(account_name, ("",))[0] == organization.name
+            }
+            organization_resources = self.__sweep_aggregator(aggregator_inventory, organization_accounts)
+            if organization_resources is None:
+                failed_accounts.extend(organization_accounts)
+            else:
+                resources.update(organization_resources)
+            for account_name in organization_accounts:
+                listed_accounts.pop(account_name)
+        if listed_accounts:
+            # Clients of the default session are created from the worker threads, the session is set up once here
+            for service_name in ("sts",) + tuple(self.services):
+                boto3.client(service_name)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.__list_account, account_name): account_name for account_name in listed_accounts
+            }
+            for future in concurrent.futures.as_completed(futures):
+                account_name = futures[future]
+                try:
+                    resources[account_name] = future.result()
+                except Exception as e:
+                    logger.error("InventorySweeper.sweep: {} - {}".format(account_name, e))
+                    failed_accounts.append(account_name)
+        self.stats = {
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            "accounts": len(resources),
+            "failed_accounts": sorted(failed_accounts),
+            "resources": sum(len(names) for services in resources.values() for names in services.values())
+        }
+        logger.info("InventorySweeper.sweep: {}".format(self.stats))
+        return accounts, resources
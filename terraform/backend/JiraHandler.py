@@ -3,6 +3,8 @@ import urllib.request
 import base64
 import json
 import logging
+import Resilience
+import Tracing
 
 
 class JiraConnector:
@@ -26,6 +28,8 @@ class JiraConnector:
        Creates a new issue in Jira
    build_jira_ticket(project_key: str, issue_type: str, assignee_id: str, assignee_mention: str, service_name: str, resource_name: str, permission_level: str, account_name: str, github_pull_request_url: str):
        Builds the payload for a Jira ticket
+   build_revocation_ticket(project_key: str, issue_type: str, assignee_id: str, account_name: str, grants: list, github_pull_request_url: str):
+       Builds the payload for the Jira ticket of the expired grants of an environment file
    get_user_id_by_email_address(email_address: str) -> str:
        Gets the user id by email address
    """
@@ -45,6 +49,7 @@ class JiraConnector:
         self.token = token
         self.base_url = 'https://{}.atlassian.net/rest/api/3'.format(jira_organization_name)
 
+    @Tracing.traced("jira.create_new_issue")
     def create_new_issue(self, payload: dict) -> str:
         """
         Creates a new issue in Jira.
@@ -66,13 +71,15 @@ class JiraConnector:
         }
         try:
             request = urllib.request.Request(url="{}{}".format(self.base_url, endpoint), headers=request_headers, data=bytes(json.dumps(payload), encoding='utf-8'), method='POST')
-            with urllib.request.urlopen(request) as response:
+            with Resilience.urlopen(request, "jira") as response:
                 if response.getcode() == 201:
                     jira_issue_key = json.loads(response.read()).get("key")
                     return jira_issue_key
                 else:
                     logging.error("JiraConnector.create_new_issue: {}".format(response.read()))
                     return ""
+        except Resilience.DependencyUnavailable:
+            raise
         except Exception as e:
             logging.error("JiraConnector.create_new_issue: {}".format(e))
             return ""
@@ -213,6 +220,119 @@ class JiraConnector:
         }
         return jira_payload
 
+    @staticmethod
+    def build_revocation_ticket(
+        project_key: str,
+        issue_type: str,
+        assignee_id: str,
+        account_name: str,
+        grants: list,
+        github_pull_request_url: str
+    ):
+        """
+        Builds the payload for the Jira ticket of the expired grants of an environment file.
+
+        Parameters
+        ----------
+            project_key : str
+                The key of the project
+            issue_type : str
+                The type of the issue
+            assignee_id : str
+                The id of the assignee
+            account_name : str
+                The name of the account
+            grants : list
+                The (service, resource, permission, user name) tuples of the expired grants
+            github_pull_request_url : str
+                The url of the GitHub pull request removing them
+
+        Returns
+        -------
+            dict
+                The payload for the Jira ticket
+        """
+        grant_lines = []
+        for service_name, resource_name, permission_level, user_name in grants:
+            grant_lines.extend([
+                {
+                    "type": "hardBreak"
+                },
+                {
+                    "type": "text",
+                    "text": "service: {} - resource: {} - permission level: {} - requested by: {}".format(
+                        service_name,
+                        resource_name,
+                        permission_level,
+                        user_name
+                    )
+                }
+            ])
+        jira_payload = {
+            "fields": {
+                "project": {
+                    "key": project_key
+                },
+                "issuetype": {
+                    "id": issue_type
+                },
+                "summary": "AWS SSO - revoke expired permissions - {}".format(account_name),
+                "description": {
+                    "version": 1,
+                    "type": "doc",
+                    "content": [
+                        {
+                            "type": "paragraph",
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": "Hey "
+                                },
+                                {
+                                    "type": "mention",
+                                    "attrs": {
+                                        "id": assignee_id,
+                                        "accessLevel": ""
+                                    }
+                                },
+                                {
+                                    "type": "text",
+                                    "text": ", the following permissions expired:"
+                                }
+                            ] + grant_lines + [
+                                {
+                                    "type": "hardBreak"
+                                },
+                                {
+                                    "type": "text",
+                                    "text": "Please review and approve - "
+                                },
+                                {
+                                    "type": "text",
+                                    "text": "Pull Request",
+                                    "marks": [
+                                        {
+                                            "type": "link",
+                                            "attrs": {
+                                                "href": github_pull_request_url,
+                                                "title": "Github Pull Request"
+                                            }
+                                        }
+                                    ]
+                                }
+                            ]
+                        }
+                    ]
+                },
+                "assignee": {
+                    "id": assignee_id
+                }
+            },
+            "update": {}
+        }
+        return jira_payload
+
+    @Tracing.traced("jira.get_user_id_by_email_address")
     def get_user_id_by_email_address(self, email_address: str) -> str:
         """
         Gets the user id by email address.
@@ -241,13 +361,15 @@ class JiraConnector:
                 headers=request_headers,
                 method='GET'
             )
-            with urllib.request.urlopen(request) as response:
+            with Resilience.urlopen(request, "jira") as response:
                 if response.getcode() == 200:
                     user_id = json.loads(response.read())[0].get("accountId")
                     return user_id
                 else:
                     logging.error("JiraConnector.get_user_id_by_email_address: {}".format(response.read()))
                     return ""
+        except Resilience.DependencyUnavailable:
+            raise
         except Exception as ex:
             logging.error("JiraConnector.get_user_id_by_email_address: {}".format(ex))
             return ""
@@ -0,0 +1,369 @@
+import boto3
+from botocore.exceptions import ClientError
+import datetime
+import json
+import time
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+# An identical request was running, its pull request is not returned to this one
+STATUS_COALESCED = "coalesced"
+
+
+def job_message(request_id: str, body="", slack=None) -> dict:
+    """
+    Returns a job message, the backend reads the parsed Slack fields ("slack") before the raw body ("body").
+    """
+    if slack:
+        return {"request_id": request_id, "slack": slack}
+    return {"request_id": request_id, "body": body}
+
+
+class StatusStore:
+    """
+    A class used to keep a status record per request ID in DynamoDB
+
+    ...
+
+    Attributes
+    ----------
+    table_name : str
+        the name of the DynamoDB status table
+    ttl_days : int
+        how long a status record is kept
+    lease_seconds : int
+        how long a running record is owned by its worker, past it the worker is taken for killed by a timeout
+
+    Methods
+    -------
+    create(request_id: str, user_name: str, command: str) -> bool:
+        Creates a queued status record, False if the same request is already queued or running
+    claim(request_id: str) -> bool:
+        Moves a queued record, or a running record past its lease, to running, False if another worker owns it
+    update(request_id: str, status: str, message="") -> bool:
+        Updates the status and the result message of a record
+    get(request_id: str) -> dict:
+        Gets a status record
+    delete(request_id: str) -> bool:
+        Deletes a status record, for a request that could not be queued
+    """
+
+    def __init__(self, table_name: str, ttl_days=7, lease_seconds=900):
+        """
+        Constructs all the necessary attributes for the StatusStore object.
+
+        Parameters
+        ----------
+            table_name : str
+                the name of the DynamoDB status table
+            ttl_days : int, optional
+                how long a status record is kept (default is 7)
+            lease_seconds : int, optional
+                how long a running record is owned by its worker, at least the function timeout (default is 900,
+                the longest Lambda timeout)
+        """
+        self.table_name = table_name
+        self.ttl_days = ttl_days
+        self.lease_seconds = lease_seconds
+        self.client = boto3.client('dynamodb')
+
+    @staticmethod
+    def __now(offset_seconds=0) -> str:
+        return (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=offset_seconds)).isoformat()
+
+    def create(self, request_id: str, user_name: str, command: str) -> bool:
+        """
+        Creates a queued status record.
+
+        Parameters
+        ----------
+            request_id : str
+                the request ID
+            user_name : str
+                the Slack user name of the requester
+            command : str
+                the slash command text
+
+        Returns
+        -------
+            bool
+                True if created, False if the request is already queued or running (duplicate request)
+        """
+        expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=self.ttl_days)
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={
+                    "request_id": {"S": request_id},
+                    "status": {"S": STATUS_QUEUED},
+                    "user_name": {"S": user_name},
+                    "command": {"S": command},
+                    "message": {"S": ""},
+                    "updated_at": {"S": self.__now()},
+                    "expires_at": {"N": str(int(expires_at.timestamp()))}
+                },
+                # A completed or failed request can be run again
+                ConditionExpression="attribute_not_exists(request_id) OR NOT #status IN (:queued, :running)",
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues={":queued": {"S": STATUS_QUEUED}, ":running": {"S": STATUS_RUNNING}}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                logger.error("JobQueue.StatusStore.create: {}".format(e))
+            return False
+        return True
+
+    def claim(self, request_id: str) -> bool:
+        """
+        Moves a queued record to running so a redelivered job is not processed twice.
+
+        A record still running after lease_seconds belongs to a worker killed by the Lambda timeout, its redelivered
+        job takes it over.
+
+        Parameters
+        ----------
+            request_id : str
+                the request ID
+
+        Returns
+        -------
+            bool
+                True if this worker owns the job, False otherwise
+        """
+        try:
+            self.client.update_item(
+                TableName=self.table_name,
+                Key={"request_id": {"S": request_id}},
+                UpdateExpression="SET #status = :running, updated_at = :now",
+                # The ISO timestamps are all UTC, they compare as strings
+                ConditionExpression="#status = :queued OR (#status = :running AND updated_at < :stale)",
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues={
+                    ":running": {"S": STATUS_RUNNING},
+                    ":queued": {"S": STATUS_QUEUED},
+                    ":now": {"S": self.__now()},
+                    ":stale": {"S": self.__now(-self.lease_seconds)}
+                }
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                logger.error("JobQueue.StatusStore.claim: {}".format(e))
+            return False
+        return True
+
+    def update(self, request_id: str, status: str, message="") -> bool:
+        """
+        Updates the status and the result message of a record.
+
+        Parameters
+        ----------
+            request_id : str
+                the request ID
+            status : str
+                the new status
+            message : str, optional
+                the result message sent to Slack (default is "")
+
+        Returns
+        -------
+            bool
+                True if updated, False otherwise
+        """
+        try:
+            self.client.update_item(
+                TableName=self.table_name,
+                Key={"request_id": {"S": request_id}},
+                UpdateExpression="SET #status = :status, #message = :message, updated_at = :now",
+                ExpressionAttributeNames={"#status": "status", "#message": "message"},
+                ExpressionAttributeValues={
+                    ":status": {"S": status},
+                    ":message": {"S": message},
+                    ":now": {"S": self.__now()}
+                }
+            )
+        except ClientError as e:
+            logger.error("JobQueue.StatusStore.update: {}".format(e))
+            return False
+        return True
+
+    def get(self, request_id: str) -> dict:
+        """
+        Gets a status record.
+
+        Parameters
+        ----------
+            request_id : str
+                the request ID
+
+        Returns
+        -------
+            dict
+                the status record, empty dict if not found
+        """
+        try:
+            item = self.client.get_item(
+                TableName=self.table_name,
+                Key={"request_id": {"S": request_id}},
+                ConsistentRead=True
+            ).get("Item")
+        except ClientError as e:
+            logger.error("JobQueue.StatusStore.get: {}".format(e))
+            return {}
+        if not item:
+            return {}
+        return {key: list(value.values())[0] for key, value in item.items()}
+
+    def delete(self, request_id: str) -> bool:
+        """
+        Deletes a status record, for a request that could not be queued so a retry is not taken for a duplicate.
+
+        Parameters
+        ----------
+            request_id : str
+                the request ID
+
+        Returns
+        -------
+            bool
+                True if deleted, False otherwise
+        """
+        try:
+            self.client.delete_item(TableName=self.table_name, Key={"request_id": {"S": request_id}})
+        except ClientError as e:
+            logger.error("JobQueue.StatusStore.delete: {}".format(e))
+            return False
+        return True
+
+
+class InMemoryStatusStore:
+    """
+    A local stand-in for StatusStore, used by tests and benchmarks
+
+    ...
+
+    Attributes
+    ----------
+    records : dict
+        a dictionary mapping request IDs to their status records
+    """
+
+    def __init__(self, lease_seconds=900):
+        self.records = {}
+        self.lease_seconds = lease_seconds
+
+    def create(self, request_id: str, user_name: str, command: str) -> bool:
+        if self.records.get(request_id, {}).get("status") in (STATUS_QUEUED, STATUS_RUNNING):
+            return False
+        self.records[request_id] = {
+            "request_id": request_id,
+            "status": STATUS_QUEUED,
+            "user_name": user_name,
+            "command": command,
+            "message": "",
+            "updated_at": time.time()
+        }
+        return True
+
+    def claim(self, request_id: str) -> bool:
+        record = self.records.get(request_id)
+        if not record:
+            return False
+        stale = record.get("status") == STATUS_RUNNING and record.get("updated_at", 0) < time.time() - self.lease_seconds
+        if record.get("status") != STATUS_QUEUED and not stale:
+            return False
+        record["status"] = STATUS_RUNNING
+        record["updated_at"] = time.time()
+        return True
+
+    def update(self, request_id: str, status: str, message="") -> bool:
+        record = self.records.setdefault(request_id, {"request_id": request_id})
+        record["status"] = status
+        record["message"] = message
+        record["updated_at"] = time.time()
+        return True
+
+    def get(self, request_id: str) -> dict:
+        return dict(self.records.get(request_id, {}))
+
+    def delete(self, request_id: str) -> bool:
+        self.records.pop(request_id, None)
+        return True
+
+
+class SqsJobQueue:
+    """
+    A class used to send jobs to the backend through SQS
+
+    ...
+
+    Attributes
+    ----------
+    queue_url : str
+        the url of the jobs queue
+
+    Methods
+    -------
+    send(request_id: str, body="", slack=None) -> bool:
+        Sends a job to the queue, with the raw Slack body or the parsed Slack fields
+    """
+
+    def __init__(self, queue_url: str):
+        self.queue_url = queue_url
+        self.client = boto3.client('sqs')
+
+    def send(self, request_id: str, body="", slack=None) -> bool:
+        try:
+            self.client.send_message(
+                QueueUrl=self.queue_url,
+                MessageBody=json.dumps(job_message(request_id, body, slack))
+            )
+        except ClientError as e:
+            logger.error("JobQueue.SqsJobQueue.send: {}".format(e))
+            return False
+        return True
+
+
+class InMemoryJobQueue:
+    """
+    A local stand-in for SqsJobQueue, used by tests and benchmarks
+
+    ...
+
+    Attributes
+    ----------
+    messages : list
+        the pending jobs
+
+    Methods
+    -------
+    send(request_id: str, body="", slack=None) -> bool:
+        Adds a job to the queue
+    receive_event(batch_size=10) -> dict:
+        Pops up to batch_size jobs as an SQS event source mapping event
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    def send(self, request_id: str, body="", slack=None) -> bool:
+        self.messages.append(json.dumps(job_message(request_id, body, slack)))
+        return True
+
+    def receive_event(self, batch_size=10) -> dict:
+        batch, self.messages = self.messages[:batch_size], self.messages[batch_size:]
+        return {
+            "Records": [
+                {
+                    "messageId": str(index),
+                    "body": message,
+                    "eventSource": "aws:sqs",
+                    "attributes": {"ApproximateReceiveCount": "1"}
+                }
+                for index, message in enumerate(batch)
+            ]
+        }
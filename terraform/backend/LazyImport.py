@@ -0,0 +1,192 @@
+import functools
+import importlib
+import importlib.abc
+import json
+import os
+import sys
+import time
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# Module name to {"cumulative_ms", "self_ms"}, filled by the import profiler
+IMPORT_TIMES = {}
+
+
+class LazyModule:
+    """
+    A class used to defer a module import until one of its attributes is used
+
+    Connector modules (and boto3 behind them) are only imported by the command paths that need
+    them, so a help request never pays for them on a cold start.
+
+    ...
+
+    Attributes
+    ----------
+    module_name : str
+        the name of the module to import
+    """
+
+    def __init__(self, module_name: str):
+        """
+        Constructs all the necessary attributes for the LazyModule object.
+
+        Parameters
+        ----------
+            module_name : str
+                the name of the module to import
+        """
+        self.module_name = module_name
+        self.__module = None
+
+    def load(self):
+        """
+        Imports the module if needed and returns it.
+        """
+        if self.__module is None:
+            start = time.perf_counter()
+            self.__module = importlib.import_module(self.module_name)
+            logger.debug("LazyModule.load: {} loaded in {:.1f}ms".format(
+                self.module_name,
+                (time.perf_counter() - start) * 1000
+            ))
+        return self.__module
+
+    def __getattr__(self, attribute: str):
+        return getattr(self.load(), attribute)
+
+
+class _TimingLoader(importlib.abc.Loader):
+    """
+    Wraps a module loader to record the time spent executing the module.
+    """
+
+    def __init__(self, loader, profiler):
+        self.__loader = loader
+        self.__profiler = profiler
+
+    def create_module(self, spec):
+        return self.__loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.__profiler.enter()
+        start = time.perf_counter()
+        try:
+            self.__loader.exec_module(module)
+        finally:
+            self.__profiler.exit(module.__name__, (time.perf_counter() - start) * 1000)
+
+    def __getattr__(self, attribute: str):
+        return getattr(self.__loader, attribute)
+
+
+class ImportProfiler(importlib.abc.MetaPathFinder):
+    """
+    A class used to record the init cost of every module imported after it is installed
+
+    Enabled with IMPORT_PROFILE=1. The cumulative time includes the module imports, the self time
+    excludes them (like python -X importtime).
+
+    ...
+
+    Methods
+    -------
+    install():
+        Starts recording imports
+    report(top=25) -> dict:
+        Returns the slowest modules by cumulative time
+    log(top=25):
+        Logs the report as JSON
+    """
+
+    def __init__(self):
+        self.__children_ms = []
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimingLoader(spec.loader, self)
+                return spec
+        return None
+
+    def enter(self):
+        self.__children_ms.append(0.0)
+
+    def exit(self, module_name: str, cumulative_ms: float):
+        children_ms = self.__children_ms.pop()
+        if self.__children_ms:
+            self.__children_ms[-1] += cumulative_ms
+        IMPORT_TIMES[module_name] = {
+            "cumulative_ms": round(cumulative_ms, 2),
+            "self_ms": round(cumulative_ms - children_ms, 2)
+        }
+
+    @staticmethod
+    def report(top=25) -> dict:
+        """
+        Returns the slowest modules by cumulative time.
+
+        Parameters
+        ----------
+            top : int, optional
+                the number of modules to return (default is 25)
+
+        Returns
+        -------
+            dict
+                the total self time of every recorded module and the slowest modules
+        """
+        slowest = sorted(IMPORT_TIMES.items(), key=lambda item: item[1]["cumulative_ms"], reverse=True)[:top]
+        return {
+            "import_profile": True,
+            "modules": len(IMPORT_TIMES),
+            "total_ms": round(sum(times["self_ms"] for times in IMPORT_TIMES.values()), 2),
+            "slowest": [dict(module=module_name, **times) for module_name, times in slowest]
+        }
+
+    def log(self, top=25):
+        logger.info(json.dumps(self.report(top=top)))
+
+
+IMPORT_PROFILER = ImportProfiler()
+
+
+def profile_imports_if_enabled() -> bool:
+    """
+    Installs the import profiler when IMPORT_PROFILE is set, returns True if installed.
+    """
+    if os.getenv("IMPORT_PROFILE", "").lower() in ("1", "true", "yes"):
+        IMPORT_PROFILER.install()
+        return True
+    return False
+
+
+def log_imports_after_first_call(enabled: bool):
+    """
+    Decorates the Lambda handler to log the import profile once, after the cold start invocation,
+    so both the init phase imports and the lazy imports of the first command are recorded.
+    """
+    def decorator(handler):
+        if not enabled:
+            return handler
+        state = {"logged": False}
+
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            try:
+                return handler(event, context)
+            finally:
+                if not state["logged"]:
+                    state["logged"] = True
+                    IMPORT_PROFILER.log()
+        return wrapper
+    return decorator
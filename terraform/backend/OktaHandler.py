@@ -2,6 +2,8 @@ import urllib.parse
 import urllib.request
 import json
 import logging
+import Resilience
+import Tracing
 
 
 class OktaConnector:
@@ -9,6 +11,7 @@ class OktaConnector:
         self.token = token
         self.base_url = "https://{}.okta.com".format(organization_name)
 
+    @Tracing.traced("okta.get_user_id")
     def __get_user_id(self, email_address: str) -> str:
         endpoint = "/api/v1/users/{}".format(email_address)
         params = {
@@ -23,7 +26,7 @@ class OktaConnector:
             url="{}{}?{}".format(self.base_url, endpoint, urllib.parse.urlencode(params)),
             headers=request_headers
         )
-        with urllib.request.urlopen(request) as response:
+        with Resilience.urlopen(request, "okta") as response:
             if response.getcode() == 200:
                 response_data = json.loads(response.read())
                 return response_data.get("id")
@@ -31,6 +34,7 @@ class OktaConnector:
                 logging.error("OktaConnector.__get_user_id: {}".format(response.read()))
                 return ""
 
+    @Tracing.traced("okta.get_user_aws_groups")
     def get_user_aws_groups(self, email_address: str) -> list[str]:
         endpoint = "/api/v1/users/{}/groups".format(self.__get_user_id(email_address=email_address))
         request_headers = {
@@ -39,7 +43,7 @@ class OktaConnector:
             'Authorization': 'SSWS {}'.format(self.token)
         }
         request = urllib.request.Request("{}{}".format(self.base_url, endpoint), headers=request_headers)
-        with urllib.request.urlopen(request) as response:
+        with Resilience.urlopen(request, "okta") as response:
             if response.getcode() == 200:
                 groups = []
                 for group in json.loads(response.read()):
@@ -0,0 +1,297 @@
+import boto3
+import concurrent.futures
+import datetime
+import FuzzyIndex
+import json
+import os
+import threading
+import time
+import Tracing
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+DEFAULT_ORGANIZATION_NAME = "default"
+# Refresh the management role credentials this long before they expire
+CREDENTIALS_REFRESH_MARGIN_SECONDS = 300
+# The parsed AWS_ORGANIZATIONS and its Organization objects, kept at module scope with their caches
+ORGANIZATIONS_CACHE = {"config": None, "organizations": []}
+# Account name -> (organization name, account ID) of every organization, and its fuzzy index
+MERGED_ACCOUNTS_CACHE = {"accounts": {}, "index": None, "expires_at": 0}
+MERGED_ACCOUNTS_LOCK = threading.Lock()
+
+
+class Organization:
+    """
+    A class used to reach one AWS Organization from the bot
+
+    The organization is read from its management account, through management_role_arn if set or with the
+    credentials of the Lambda otherwise. Every organization keeps its own account map, organizational unit map
+    and management credentials across warm invocations, and its own inventory snapshot.
+
+    ...
+
+    Attributes
+    ----------
+    name : str
+        the organization name of the configuration
+    default : bool
+        the first organization of the configuration, the one of the deployment inventory settings
+    management_role_arn : str
+        the role assumed to read the organization, empty string for the credentials of the Lambda
+    scanning_role_name : str
+        the role assumed into every account of the organization to list its resources
+    inventory_key : str
+        the S3 key of the organization inventory snapshot in INVENTORY_BUCKET
+    inventory_backend : str
+        the AWS_INVENTORY_BACKEND of the organization, empty string for the deployment one
+    resource_explorer_view_arn : str
+        the org-wide Resource Explorer view of the organization
+    config_aggregator_name : str
+        the Config aggregator of the organization
+
+    Methods
+    -------
+    client(service_name: str, **kwargs) -> boto3.client:
+        Returns a client of the management account
+    list_accounts(ttl_seconds=300) -> dict:
+        Returns the active accounts of the organization, cached for ttl_seconds
+    map_organizational_units(ttl_seconds=300) -> dict:
+        Returns the organizational unit of every account of the organization, cached for ttl_seconds
+    scanning_role_arn(account_id: str) -> str:
+        Returns the ARN of the scanning role of an account
+    """
+
+    def __init__(self, config: dict, default=False):
+        """
+        Constructs all the necessary attributes for the Organization object.
+
+        Parameters
+        ----------
+            config : dict
+                an entry of AWS_ORGANIZATIONS, only "name" is required
+            default : bool, optional
+                the first organization, its inventory settings default to the deployment ones (default is False)
+        """
+        self.name = config.get("name", DEFAULT_ORGANIZATION_NAME)
+        self.default = default
+        self.management_role_arn = config.get("management_role_arn", "")
+        self.scanning_role_name = config.get("scanning_role_name", "security-scanning")
+        self.inventory_key = config.get("inventory_key") or (
+            os.getenv("INVENTORY_KEY", "inventory/snapshot.json.gz") if default
+            else "inventory/{}/snapshot.json.gz".format(self.name)
+        )
+        self.inventory_backend = config.get("inventory_backend", "")
+        self.resource_explorer_view_arn = config.get("resource_explorer_view_arn", "")
+        self.config_aggregator_name = config.get("config_aggregator_name", "")
+        self.__session = None
+        self.__session_expires_at = 0
+        self.__accounts = {"accounts": {}, "expires_at": 0}
+        self.__account_ous = {"ous": {}, "expires_at": 0}
+        self.__lock = threading.Lock()
+
+    def __management_session(self):
+        """
+        Returns the session of the management role, assumed again shortly before its credentials expire.
+        """
+        with self.__lock:
+            if self.__session is not None and self.__session_expires_at > time.monotonic():
+                return self.__session
+            credentials = boto3.client('sts').assume_role(
+                RoleArn=self.management_role_arn,
+                RoleSessionName="aws-permissions-bot-{}".format(self.name)
+            ).get("Credentials")
+            lifetime_seconds = 3600
+            if isinstance(credentials.get("Expiration"), datetime.datetime):
+                lifetime_seconds = (
+                    credentials.get("Expiration") - datetime.datetime.now(datetime.timezone.utc)
+                ).total_seconds()
+            self.__session = boto3.Session(
+                aws_access_key_id=credentials.get("AccessKeyId"),
+                aws_secret_access_key=credentials.get("SecretAccessKey"),
+                aws_session_token=credentials.get("SessionToken")
+            )
+            self.__session_expires_at = time.monotonic() + lifetime_seconds - CREDENTIALS_REFRESH_MARGIN_SECONDS
+            return self.__session
+
+    def client(self, service_name: str, **kwargs):
+        """
+        Returns a client of the management account, with the credentials of the Lambda without management role.
+        """
+        if not self.management_role_arn:
+            return boto3.client(service_name, **kwargs)
+        return self.__management_session().client(service_name, **kwargs)
+
+    @Tracing.traced("organizations.list_accounts")
+    def list_accounts(self, ttl_seconds=300) -> dict:
+        """
+        Returns the active accounts of the organization, cached for ttl_seconds.
+
+        Parameters
+        ----------
+            ttl_seconds : int, optional
+                how long warm invocations reuse the accounts (default is 300)
+
+        Returns
+        -------
+            dict
+                a dictionary mapping AWS account names to their IDs
+        """
+        if self.__accounts["accounts"] and self.__accounts["expires_at"] > time.monotonic():
+            return self.__accounts["accounts"]
+        client = self.client('organizations')
+        response = client.list_accounts(
+            MaxResults=20
+        )
+        accounts = {}
+        while True:
+            for account in response.get("Accounts") or []:
+                if account.get("Status") == "ACTIVE":
+                    accounts[account.get("Name")] = account.get("Id")
+            if not response.get("NextToken"):
+                break
+            response = client.list_accounts(
+                MaxResults=20,
+                NextToken=response.get("NextToken")
+            )
+        self.__accounts.update({"accounts": accounts, "expires_at": time.monotonic() + ttl_seconds})
+        return accounts
+
+    @Tracing.traced("organizations.map_organizational_units")
+    def map_organizational_units(self, ttl_seconds=300) -> dict:
+        """
+        Crawls the organization once and returns the organizational unit of every account, cached for ttl_seconds.
+
+        Parameters
+        ----------
+            ttl_seconds : int, optional
+                how long warm invocations reuse the organizational units (default is 300)
+
+        Returns
+        -------
+            dict
+                a dictionary mapping AWS account IDs to the name of their organizational unit
+        """
+        if self.__account_ous["expires_at"] > time.monotonic():
+            return self.__account_ous["ous"]
+        client = self.client('organizations')
+        queue = [client.list_roots()['Roots'][0]['Id']]
+        account_ous = {}
+        while queue:
+            parent_id = queue.pop(0)
+            for response in client.get_paginator('list_organizational_units_for_parent').paginate(ParentId=parent_id):
+                for ou in response['OrganizationalUnits']:
+                    queue.append(ou['Id'])
+                    accounts_paginator = client.get_paginator('list_accounts_for_parent')
+                    for accounts_response in accounts_paginator.paginate(ParentId=ou['Id']):
+                        for account in accounts_response['Accounts']:
+                            account_ous[account['Id']] = ou['Name']
+        self.__account_ous.update({"ous": account_ous, "expires_at": time.monotonic() + ttl_seconds})
+        return account_ous
+
+    def scanning_role_arn(self, account_id: str) -> str:
+        return "arn:aws:iam::{}:role/{}".format(account_id, self.scanning_role_name)
+
+
+def get_organizations() -> list:
+    """
+    Returns the organizations of AWS_ORGANIZATIONS, a JSON list of {"name", "management_role_arn",
+    "scanning_role_name", "inventory_key", "inventory_backend", "resource_explorer_view_arn",
+    "config_aggregator_name"}. Without it, the one organization of the Lambda credentials.
+
+    The organizations are kept across warm invocations as long as AWS_ORGANIZATIONS does not change.
+    """
+    config = (os.getenv("AWS_ORGANIZATIONS", ""), os.getenv("INVENTORY_KEY", ""))
+    if ORGANIZATIONS_CACHE["config"] == config and ORGANIZATIONS_CACHE["organizations"]:
+        return ORGANIZATIONS_CACHE["organizations"]
+    entries = [{"name": DEFAULT_ORGANIZATION_NAME}]
+    if config[0]:
+        try:
+            entries = json.loads(config[0]) or entries
+        except ValueError as e:
+            logger.error("Organizations.get_organizations: {}".format(e))
+    organizations = [Organization(entry, default=position == 0) for position, entry in enumerate(entries)]
+    ORGANIZATIONS_CACHE.update({"config": config, "organizations": organizations})
+    MERGED_ACCOUNTS_CACHE.update({"accounts": {}, "index": None, "expires_at": 0})
+    return organizations
+
+
+def get_organization(name: str):
+    """
+    Returns the organization of a name, None if it is not configured.
+    """
+    for organization in get_organizations():
+        if organization.name == name:
+            return organization
+    return None
+
+
+def for_each_organization(method_name: str, **kwargs) -> dict:
+    """
+    Calls a method of every organization concurrently, an organization that fails is left out.
+
+    Returns
+    -------
+        dict
+            a dictionary mapping organization names to the results
+    """
+    organizations = get_organizations()
+    if len(organizations) == 1:
+        return {organizations[0].name: getattr(organizations[0], method_name)(**kwargs)}
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(organizations)) as executor:
+        futures = {
+            executor.submit(getattr(organization, method_name), **kwargs): organization.name
+            for organization in organizations
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                logger.error("Organizations.for_each_organization: {} {} - {}".format(futures[future], method_name, e))
+    return results
+
+
+@Tracing.traced("organizations.merged_accounts")
+def merged_accounts(ttl_seconds=300) -> dict:
+    """
+    Returns the accounts of every organization, listed concurrently, cached for ttl_seconds.
+
+    An account name found in several organizations resolves to the first one of AWS_ORGANIZATIONS.
+    An organization that fails to list is left out until the next refresh.
+
+    Parameters
+    ----------
+        ttl_seconds : int, optional
+            how long warm invocations reuse the merged accounts (default is 300)
+
+    Returns
+    -------
+        dict
+            a dictionary mapping AWS account names to (organization name, account ID)
+    """
+    with MERGED_ACCOUNTS_LOCK:
+        if MERGED_ACCOUNTS_CACHE["accounts"] and MERGED_ACCOUNTS_CACHE["expires_at"] > time.monotonic():
+            return MERGED_ACCOUNTS_CACHE["accounts"]
+        listings = for_each_organization("list_accounts", ttl_seconds=ttl_seconds)
+        accounts = {}
+        for organization in get_organizations():
+            for account_name, account_id in listings.get(organization.name, {}).items():
+                if account_name in accounts:
+                    logger.error("Organizations.merged_accounts: {} is in {} and {}, {} is used".format(
+                        account_name, accounts[account_name][0], organization.name, accounts[account_name][0]
+                    ))
+                    continue
+                accounts[account_name] = (organization.name, account_id)
+        MERGED_ACCOUNTS_CACHE.update({"accounts": accounts, "index": None, "expires_at": time.monotonic() + ttl_seconds})
+        return accounts
+
+
+def suggest_accounts(account_name: str, limit=3) -> list:
+    """
+    Returns the account names of every organization closest to a misspelled one.
+    """
+    accounts = merged_accounts()
+    if MERGED_ACCOUNTS_CACHE["index"] is None or MERGED_ACCOUNTS_CACHE["accounts"] is not accounts:
+        MERGED_ACCOUNTS_CACHE["index"] = FuzzyIndex.FuzzyIndex(accounts)
+    return MERGED_ACCOUNTS_CACHE["index"].suggest(account_name, limit=limit)
@@ -2,6 +2,8 @@ import urllib.parse
 import urllib.request
 import json
 import logging
+import Resilience
+import Tracing
 logger = logging.getLogger()
 logger.setLevel("INFO")
 
@@ -42,6 +44,7 @@ class PagerDutyConnector:
             'Authorization': 'Token token={}'.format(token)
         }
 
+    @Tracing.traced("pagerduty.get_on_call_email_address")
     def get_on_call_email_address(self, schedule_ids: str) -> str:
         """
         Returns the email address of the on-call user for the given schedule_ids
@@ -66,7 +69,7 @@ class PagerDutyConnector:
                 url="{}{}?{}".format(self.base_url, endpoint, urllib.parse.urlencode(params)),
                 headers=self.headers
             )
-            with urllib.request.urlopen(request) as response:
+            with Resilience.urlopen(request, "pagerduty") as response:
                 if response.getcode() == 200:
                     response_data = json.loads(response.read())
                     on_call_user_id = response_data.get("oncalls")[0].get("user").get("id")
@@ -74,10 +77,13 @@ class PagerDutyConnector:
                 else:
                     logger.error("PagerDutyHandler.get_on_call_email_address: {}".format(response.read()))
                     return ""
+        except Resilience.DependencyUnavailable:
+            raise
         except Exception as ex:
             logger.error("PagerDutyHandler.get_on_call_email_address: {}".format(ex))
             return ""
 
+    @Tracing.traced("pagerduty.get_users_email")
     def __get_users_email(self, user_id) -> str:
         """
         Returns the email address of the user with the given user_id
@@ -98,12 +104,14 @@ class PagerDutyConnector:
                 url="{}{}".format(self.base_url, endpoint),
                 headers=self.headers
             )
-            with urllib.request.urlopen(request) as response:
+            with Resilience.urlopen(request, "pagerduty") as response:
                 if response.getcode() == 200:
                     return json.loads(response.read()).get("user").get("email")
                 else:
                     logger.error("PagerDutyHandler.get_users_email: {}".format(response.read()))
                     return ""
+        except Resilience.DependencyUnavailable:
+            raise
         except Exception as ex:
             logger.error("PagerDutyHandler.get_users_email: {}".format(ex))
             return ""
@@ -0,0 +1,285 @@
+import functools
+import json
+import os
+import time
+import Tracing
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# Span name (or "prefix.") -> profiled stage, the outermost matching span of a stage is profiled
+PROFILE_STAGES = {
+    "parse_command": "parse",
+    "inventory": "inventory",
+    "build_prompt": "prompt",
+    "aws.aws_bedrock": "bedrock",
+    "github.": "github"
+}
+TOP_ENTRIES = 5
+
+
+def stage_of(span_name: str) -> str:
+    """
+    Returns the profiled stage of a span name, empty string if the span is not profiled.
+    """
+    if span_name in PROFILE_STAGES:
+        return PROFILE_STAGES[span_name]
+    for prefix, stage in PROFILE_STAGES.items():
+        if prefix.endswith(".") and span_name.startswith(prefix):
+            return stage
+    return ""
+
+
+class RequestProfiler:
+    """
+    A class used to profile the stages of one request with cProfile and tracemalloc
+
+    The profiler listens to the spans of the request trace: a stage is profiled from the enter to the exit
+    of its outermost span, and the stages called several times (e.g. every GitHub call) are accumulated.
+
+    ...
+
+    Attributes
+    ----------
+    trace : Tracing.Trace
+        the trace of the profiled request
+    cpu : bool
+        collect cProfile stats per stage
+    memory : bool
+        collect the tracemalloc allocations per stage
+    stages : dict
+        the stage name to its calls, time, cProfile.Profile and allocation sizes by line
+
+    Methods
+    -------
+    start():
+        Starts listening to the spans of the trace
+    stop():
+        Stops listening and tracing the allocations
+    summary() -> dict:
+        Returns the compact per-stage summary, the slowest functions and the largest allocations
+    write(output: str) -> list:
+        Writes the full cProfile stats and allocations to a /tmp directory or an s3://bucket/prefix
+    """
+
+    def __init__(self, trace, cpu=True, memory=False):
+        """
+        Constructs all the necessary attributes for the RequestProfiler object.
+
+        Parameters
+        ----------
+            trace : Tracing.Trace
+                the trace of the profiled request
+            cpu : bool, optional
+                collect cProfile stats per stage (default is True)
+            memory : bool, optional
+                collect the tracemalloc allocations per stage (default is False)
+        """
+        self.trace = trace
+        self.cpu = cpu
+        self.memory = memory
+        self.stages = {}
+        self.__active = None
+        self.__active_stage = None
+        self.__started = 0.0
+        self.__snapshot = None
+        self.__started_tracemalloc = False
+        self.__memory_peak = 0
+
+    def start(self):
+        """
+        Starts listening to the spans of the trace.
+        """
+        if self.memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.__started_tracemalloc = True
+            tracemalloc.reset_peak()
+        self.trace.span_listeners.append(self.__on_span)
+
+    def stop(self):
+        """
+        Stops listening and tracing the allocations.
+        """
+        if self.__on_span in self.trace.span_listeners:
+            self.trace.span_listeners.remove(self.__on_span)
+        if self.memory:
+            import tracemalloc
+            self.__memory_peak = tracemalloc.get_traced_memory()[1]
+            if self.__started_tracemalloc:
+                tracemalloc.stop()
+
+    def __on_span(self, event: str, span_name: str, depth: int):
+        if event == "enter" and self.__active is None:
+            stage_name = stage_of(span_name)
+            if stage_name:
+                self.__enter(stage_name, span_name, depth)
+        elif event == "exit" and self.__active == (span_name, depth):
+            self.__exit()
+
+    def __enter(self, stage_name: str, span_name: str, depth: int):
+        stage = self.stages.setdefault(stage_name, {"calls": 0, "ms": 0.0, "profile": None, "allocations": {}})
+        stage["calls"] += 1
+        self.__active = (span_name, depth)
+        self.__active_stage = stage
+        if self.memory:
+            self.__snapshot = self.__take_snapshot()
+        if self.cpu:
+            import cProfile
+            if stage["profile"] is None:
+                stage["profile"] = cProfile.Profile()
+            stage["profile"].enable()
+        self.__started = time.perf_counter()
+
+    def __exit(self):
+        stage = self.__active_stage
+        stage["ms"] += (time.perf_counter() - self.__started) * 1000
+        if self.cpu:
+            stage["profile"].disable()
+        if self.memory:
+            snapshot = self.__take_snapshot()
+            for statistic in snapshot.compare_to(self.__snapshot, "lineno"):
+                if statistic.size_diff:
+                    frame = statistic.traceback[0]
+                    line = "{}:{}".format(frame.filename, frame.lineno)
+                    stage["allocations"][line] = stage["allocations"].get(line, 0) + statistic.size_diff
+            self.__snapshot = None
+        self.__active = None
+        self.__active_stage = None
+
+    @staticmethod
+    def __take_snapshot():
+        """
+        Takes a tracemalloc snapshot without the allocations of tracemalloc and the import machinery.
+        """
+        import tracemalloc
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>")
+        ))
+
+    @staticmethod
+    def __top_functions(profile) -> list:
+        """
+        Returns the functions with the most cumulative time of a stage profile.
+        """
+        import pstats
+        stats = pstats.Stats(profile).stats
+        ordered = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+        return [
+            "{}:{}({}) {:.1f}ms/{}".format(os.path.basename(filename), line, function, cumulative * 1000, calls)
+            for (filename, line, function), (_, calls, _, cumulative, _) in ordered[:TOP_ENTRIES]
+        ]
+
+    def summary(self) -> dict:
+        """
+        Returns the compact per-stage summary, the slowest functions and the largest allocations.
+
+        Returns
+        -------
+            dict
+                the request ID, the command and, per stage, the calls, time, top functions and top allocations
+        """
+        stages = {}
+        for stage_name, stage in self.stages.items():
+            stage_summary = {"calls": stage["calls"], "ms": round(stage["ms"], 2)}
+            if stage["profile"] is not None:
+                stage_summary["top_functions"] = self.__top_functions(stage["profile"])
+            if self.memory:
+                ordered = sorted(stage["allocations"].items(), key=lambda item: item[1], reverse=True)
+                stage_summary["allocated_kb"] = round(sum(stage["allocations"].values()) / 1024, 1)
+                stage_summary["top_allocations"] = [
+                    "{} {:+.1f}KB".format(os.path.basename(line), size / 1024) for line, size in ordered[:TOP_ENTRIES]
+                ]
+            stages[stage_name] = stage_summary
+        summary = {
+            "profile": "aws_permissions_bot",
+            "request_id": self.trace.request_id,
+            "command": self.trace.command,
+            "stages": stages
+        }
+        if self.memory:
+            summary["peak_kb"] = round(self.__memory_peak / 1024, 1)
+        return summary
+
+    def write(self, output: str) -> list:
+        """
+        Writes the full cProfile stats (<stage>.pstats, for pstats or snakeviz) and the allocations
+        (allocations.json) of the request.
+
+        Parameters
+        ----------
+            output : str
+                a local directory (e.g. /tmp/profiles) or an s3://bucket/prefix
+
+        Returns
+        -------
+            list
+                the written paths or S3 URIs, empty list if the write failed
+        """
+        request_directory = self.trace.request_id or str(int(time.time() * 1000))
+        local_directory = output
+        if output.startswith("s3://"):
+            local_directory = "/tmp/profiles"
+        local_directory = os.path.join(local_directory, request_directory)
+        files = {}
+        try:
+            os.makedirs(local_directory, exist_ok=True)
+            for stage_name, stage in self.stages.items():
+                if stage["profile"] is not None:
+                    file_name = "{}.pstats".format(stage_name)
+                    files[file_name] = os.path.join(local_directory, file_name)
+                    stage["profile"].dump_stats(files[file_name])
+            if self.memory:
+                files["allocations.json"] = os.path.join(local_directory, "allocations.json")
+                with open(files["allocations.json"], "w") as allocations_file:
+                    json.dump({name: stage["allocations"] for name, stage in self.stages.items()}, allocations_file)
+        except OSError as e:
+            logger.error("RequestProfiler.write: {}".format(e))
+            return []
+        if not output.startswith("s3://"):
+            return list(files.values())
+        import boto3
+        from botocore.exceptions import BotoCoreError, ClientError
+        bucket, _, prefix = output[len("s3://"):].partition("/")
+        written = []
+        client = boto3.client('s3')
+        try:
+            for file_name, path in files.items():
+                key = "/".join(part for part in (prefix.strip("/"), request_directory, file_name) if part)
+                with open(path, "rb") as profile_file:
+                    client.put_object(Bucket=bucket, Key=key, Body=profile_file.read())
+                written.append("s3://{}/{}".format(bucket, key))
+        except (BotoCoreError, ClientError, OSError) as e:
+            logger.error("RequestProfiler.write: {}".format(e))
+            return []
+        return written
+
+
+def profile_request(handler):
+    """
+    Decorates a Lambda handler, inside Tracing.trace_request, to profile the stages of every request
+    when PROFILING is set.
+
+    PROFILING is "cpu", "memory" or "cpu,memory", PROFILING_OUTPUT a directory or s3://bucket/prefix for the full
+    profiles. The summary is logged as one JSON line. Requests outside of a trace (SQS batches) are passed through.
+    """
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        modes = {mode.strip() for mode in os.getenv("PROFILING", "").lower().split(",") if mode.strip()}
+        trace = Tracing.current_trace()
+        if not modes or trace is None:
+            return handler(event, context)
+        profiler = RequestProfiler(trace, cpu="cpu" in modes, memory="memory" in modes)
+        profiler.start()
+        try:
+            return handler(event, context)
+        finally:
+            profiler.stop()
+            summary = profiler.summary()
+            if os.getenv("PROFILING_OUTPUT"):
+                summary["files"] = profiler.write(os.getenv("PROFILING_OUTPUT"))
+            logger.info(json.dumps(summary))
+    return wrapper
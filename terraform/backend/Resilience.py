@@ -0,0 +1,239 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import SlackHandler
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# The monotonic time the running request must have answered by, None outside of a request
+CURRENT_DEADLINE = contextvars.ContextVar("current_deadline", default=None)
+# Provider -> circuit breaker, kept across warm invocations
+CIRCUIT_BREAKERS = {}
+CIRCUIT_BREAKERS_LOCK = threading.Lock()
+PROVIDER_NAMES = {
+    "okta": "Okta",
+    "github": "GitHub",
+    "jira": "Jira",
+    "pagerduty": "PagerDuty",
+    "slack": "Slack"
+}
+
+
+class DependencyUnavailable(Exception):
+    """
+    Raised when a provider does not answer within the request deadline, or its circuit breaker is open.
+
+    The connectors let it through their error handling, the Lambda handler reports it to Slack.
+    """
+
+    def __init__(self, provider: str, reason: str):
+        super().__init__("{} {}".format(PROVIDER_NAMES.get(provider, provider), reason))
+        self.provider = provider
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """
+    A class used to stop calling a provider that keeps failing
+
+    After failure_threshold consecutive failures (timeouts, connection errors, 5xx) the breaker opens and
+    every call fails fast. After reset_seconds one trial call is let through (half open), its success closes
+    the breaker and its failure opens it again.
+
+    ...
+
+    Attributes
+    ----------
+    provider : str
+        the provider name (okta, github, jira, pagerduty, slack)
+    failure_threshold : int
+        the consecutive failures that open the breaker
+    reset_seconds : float
+        how long the breaker stays open before a trial call
+    state : str
+        closed, open or half_open
+    failures : int
+        the consecutive failures
+
+    Methods
+    -------
+    allow() -> bool:
+        Returns True if a call may be made
+    record_success():
+        Closes the breaker
+    record_failure():
+        Counts a failure, opens the breaker at the threshold or after a failed trial call
+    """
+
+    def __init__(self, provider: str, failure_threshold=3, reset_seconds=30.0):
+        """
+        Constructs all the necessary attributes for the CircuitBreaker object.
+
+        Parameters
+        ----------
+            provider : str
+                the provider name
+            failure_threshold : int, optional
+                the consecutive failures that open the breaker (default is 3)
+            reset_seconds : float, optional
+                how long the breaker stays open before a trial call (default is 30.0)
+        """
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.__opened_at = 0.0
+        self.__lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Returns True if a call may be made, only one trial call is let through once the breaker is half open.
+        """
+        with self.__lock:
+            if self.state == "closed":
+                return True
+            # A trial call that never reported back is retried after another reset_seconds
+            if time.monotonic() - self.__opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self.__opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        """
+        Closes the breaker.
+        """
+        with self.__lock:
+            if self.state != "closed":
+                logger.info("CircuitBreaker: {} closed".format(self.provider))
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        """
+        Counts a failure, opens the breaker at the threshold or after a failed trial call.
+        """
+        with self.__lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.error("CircuitBreaker: {} opened after {} failures".format(self.provider, self.failures))
+                self.state = "open"
+                self.__opened_at = time.monotonic()
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """
+    Returns the circuit breaker of a provider, created on first use with CIRCUIT_BREAKER_FAILURES and
+    CIRCUIT_BREAKER_RESET_SECONDS.
+    """
+    with CIRCUIT_BREAKERS_LOCK:
+        if provider not in CIRCUIT_BREAKERS:
+            CIRCUIT_BREAKERS[provider] = CircuitBreaker(
+                provider,
+                failure_threshold=int(os.getenv("CIRCUIT_BREAKER_FAILURES", "3")),
+                reset_seconds=float(os.getenv("CIRCUIT_BREAKER_RESET_SECONDS", "30"))
+            )
+        return CIRCUIT_BREAKERS[provider]
+
+
+def remaining_seconds():
+    """
+    Returns the seconds left before the running request deadline, None outside of a request.
+    """
+    deadline = CURRENT_DEADLINE.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def urlopen(request, provider: str, timeout_seconds=None):
+    """
+    Opens a request to a provider within the request deadline and through the provider circuit breaker.
+
+    The timeout is timeout_seconds (default HTTP_TIMEOUT_SECONDS), or the time left before the deadline if shorter. HTTP errors are
+    raised as is for the connector to handle, a 5xx counts as a failure of the provider.
+
+    Parameters
+    ----------
+        request : urllib.request.Request
+            the request
+        provider : str
+            the provider name (okta, github, jira, pagerduty, slack)
+        timeout_seconds : float, optional
+            the timeout of the call (default is HTTP_TIMEOUT_SECONDS)
+
+    Returns
+    -------
+        http.client.HTTPResponse
+            the response, to be used as a context manager like urllib.request.urlopen
+
+    Raises
+    ------
+        DependencyUnavailable
+            if the deadline has passed, the breaker is open, or the provider times out or cannot be reached
+    """
+    timeout = timeout_seconds or float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+    remaining = remaining_seconds()
+    if remaining is not None:
+        if remaining <= 0:
+            raise DependencyUnavailable(provider, "was not called, the request ran out of time")
+        timeout = min(timeout, remaining)
+    circuit_breaker = get_circuit_breaker(provider)
+    if not circuit_breaker.allow():
+        raise DependencyUnavailable(provider, "is unavailable")
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code >= 500:
+            circuit_breaker.record_failure()
+        else:
+            circuit_breaker.record_success()
+        raise
+    except (urllib.error.URLError, OSError) as e:
+        circuit_breaker.record_failure()
+        logger.error("Resilience.urlopen: {} - {}".format(provider, e))
+        raise DependencyUnavailable(provider, "is not responding") from e
+    circuit_breaker.record_success()
+    return response
+
+
+def bounded_request(handler):
+    """
+    Decorates a Lambda handler so every request gets a deadline, DEADLINE_MARGIN_MS before the Lambda timeout,
+    and a provider that is unavailable is reported to Slack instead of failing the request.
+
+    SQS batches are passed through, each job of the batch gets its own deadline from its handler call.
+    """
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if "Records" in event or context is None:
+            return handler(event, context)
+        margin_ms = int(os.getenv("DEADLINE_MARGIN_MS", "5000"))
+        deadline = time.monotonic() + (context.get_remaining_time_in_millis() - margin_ms) / 1000
+        token = CURRENT_DEADLINE.set(deadline)
+        try:
+            return handler(event, context)
+        except DependencyUnavailable as e:
+            logger.error("Request stopped: {}".format(e))
+            text = "AWS Permissions bot Error - {}, please try again in a few minutes".format(e)
+            response_url = SlackHandler.parse_slack_event(event).get("response_url")
+            if not response_url:
+                # Scheduled events (warm-up, inventory sweep) have no Slack command to answer
+                return {"statusCode": 503, "body": text}
+            # The final message gets the margin kept for it
+            CURRENT_DEADLINE.set(None)
+            try:
+                SlackHandler.response_to_slack(response_url, text)
+            except DependencyUnavailable as slack_error:
+                logger.error("Request stopped: {}".format(slack_error))
+            return {"statusCode": 200, "body": text}
+        finally:
+            CURRENT_DEADLINE.reset(token)
+    return wrapper
@@ -0,0 +1,209 @@
+import boto3
+from botocore.exceptions import ClientError
+import concurrent.futures
+import threading
+import time
+import Tracing
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# (account ID, service, resource name) -> (expires at, details), reused by warm invocations
+RESOURCE_DETAILS_CACHE = {}
+RESOURCE_DETAILS_LOCK = threading.Lock()
+# The error codes of a bucket without tags or default encryption, not failures
+S3_NO_TAGS_ERRORS = ("NoSuchTagSet",)
+S3_NO_ENCRYPTION_ERRORS = ("ServerSideEncryptionConfigurationNotFoundError",)
+
+
+class ResourceDetails:
+    """
+    A class used to describe the S3 buckets and SQS queues of an account concurrently
+
+    Every resource is described by a few read calls (location, tags, encryption) made by a bounded pool of workers
+    over the clients of the assumed role. The details are cached per resource for ttl_seconds, so a repeated or
+    narrowed detail listing only describes the resources it did not describe yet.
+
+    ...
+
+    Attributes
+    ----------
+    account_id : str
+        the ID of the AWS account
+    credentials : dict
+        the credentials of the assumed role
+    max_workers : int
+        the number of resources described concurrently
+    ttl_seconds : int
+        how long the details of a resource are reused
+    owner_tag : str
+        the tag key of the resource owner
+
+    Methods
+    -------
+    describe(service_name: str, resource_names: list) -> dict:
+        Returns the region, tags, encryption and owner of every resource
+    """
+
+    def __init__(self, account_id: str, credentials: dict, max_workers=16, ttl_seconds=300, owner_tag="owner"):
+        """
+        Constructs all the necessary attributes for the ResourceDetails object.
+
+        Parameters
+        ----------
+            account_id : str
+                the ID of the AWS account
+            credentials : dict
+                the "Credentials" of the AssumeRole response
+            max_workers : int, optional
+                the number of resources described concurrently (default is 16)
+            ttl_seconds : int, optional
+                how long the details of a resource are reused (default is 300)
+            owner_tag : str, optional
+                the tag key of the resource owner, matched case-insensitively (default is "owner")
+        """
+        self.account_id = account_id
+        self.credentials = credentials
+        self.max_workers = max_workers
+        self.ttl_seconds = ttl_seconds
+        self.owner_tag = owner_tag
+
+    def __client(self, service_name: str):
+        return boto3.client(
+            service_name,
+            aws_access_key_id=self.credentials.get("AccessKeyId"),
+            aws_secret_access_key=self.credentials.get("SecretAccessKey"),
+            aws_session_token=self.credentials.get("SessionToken")
+        )
+
+    def __owner(self, tags: dict) -> str:
+        for key, value in tags.items():
+            if key.lower() == self.owner_tag.lower():
+                return value
+        return ""
+
+    @staticmethod
+    def __error_code(error: ClientError) -> str:
+        return error.response.get("Error", {}).get("Code", "")
+
+    def __describe_bucket(self, s3_client, bucket_name: str) -> dict:
+        """
+        Returns the region, tags and default encryption of a bucket, "unknown" for a call that failed.
+        """
+        details = {"region": "unknown", "encryption": "unknown", "tags": {}}
+        try:
+            # A bucket of us-east-1 has no location constraint
+            location = s3_client.get_bucket_location(Bucket=bucket_name).get("LocationConstraint")
+            details["region"] = location or "us-east-1"
+        except Exception as e:
+            logger.error("ResourceDetails.__describe_bucket: {} - {}".format(bucket_name, e))
+        try:
+            tag_set = s3_client.get_bucket_tagging(Bucket=bucket_name).get("TagSet") or []
+            details["tags"] = {tag.get("Key"): tag.get("Value") for tag in tag_set}
+        except ClientError as e:
+            if self.__error_code(e) not in S3_NO_TAGS_ERRORS:
+                logger.error("ResourceDetails.__describe_bucket: {} - {}".format(bucket_name, e))
+        except Exception as e:
+            logger.error("ResourceDetails.__describe_bucket: {} - {}".format(bucket_name, e))
+        try:
+            rules = s3_client.get_bucket_encryption(Bucket=bucket_name).get(
+                "ServerSideEncryptionConfiguration", {}
+            ).get("Rules") or [{}]
+            details["encryption"] = rules[0].get("ApplyServerSideEncryptionByDefault", {}).get(
+                "SSEAlgorithm", "none"
+            )
+        except ClientError as e:
+            if self.__error_code(e) in S3_NO_ENCRYPTION_ERRORS:
+                details["encryption"] = "none"
+            else:
+                logger.error("ResourceDetails.__describe_bucket: {} - {}".format(bucket_name, e))
+        except Exception as e:
+            logger.error("ResourceDetails.__describe_bucket: {} - {}".format(bucket_name, e))
+        return details
+
+    def __describe_queue(self, sqs_client, queue_name: str) -> dict:
+        """
+        Returns the region, tags and encryption of a queue, "unknown" for a call that failed.
+        """
+        details = {"region": "unknown", "encryption": "unknown", "tags": {}}
+        try:
+            queue_url = sqs_client.get_queue_url(
+                QueueName=queue_name,
+                QueueOwnerAWSAccountId=self.account_id
+            ).get("QueueUrl")
+        except Exception as e:
+            logger.error("ResourceDetails.__describe_queue: {} - {}".format(queue_name, e))
+            return details
+        # https://sqs.<region>.amazonaws.com/<account ID>/<queue name>
+        details["region"] = queue_url.split("/")[2].split(".")[1]
+        try:
+            attributes = sqs_client.get_queue_attributes(
+                QueueUrl=queue_url,
+                AttributeNames=["KmsMasterKeyId", "SqsManagedSseEnabled"]
+            ).get("Attributes") or {}
+            if attributes.get("KmsMasterKeyId"):
+                details["encryption"] = "aws:kms"
+            elif attributes.get("SqsManagedSseEnabled") == "true":
+                details["encryption"] = "sqs-sse"
+            else:
+                details["encryption"] = "none"
+        except Exception as e:
+            logger.error("ResourceDetails.__describe_queue: {} - {}".format(queue_name, e))
+        try:
+            details["tags"] = sqs_client.list_queue_tags(QueueUrl=queue_url).get("Tags") or {}
+        except Exception as e:
+            logger.error("ResourceDetails.__describe_queue: {} - {}".format(queue_name, e))
+        return details
+
+    @Tracing.traced("aws.describe_resources")
+    def describe(self, service_name: str, resource_names: list) -> dict:
+        """
+        Returns the region, tags, encryption and owner of every resource, the cached ones are not described again.
+
+        Parameters
+        ----------
+            service_name : str
+                the AWS service of the resources (s3 or sqs)
+            resource_names : list
+                the names of the resources
+
+        Returns
+        -------
+            dict
+                a dictionary mapping resource names to {"region", "encryption", "owner", "tags"}
+        """
+        now = time.monotonic()
+        details = {}
+        with RESOURCE_DETAILS_LOCK:
+            for resource_name in resource_names:
+                cached = RESOURCE_DETAILS_CACHE.get((self.account_id, service_name, resource_name))
+                if cached and cached[0] > now:
+                    details[resource_name] = cached[1]
+        missing_names = [resource_name for resource_name in resource_names if resource_name not in details]
+        if not missing_names:
+            return details
+        if service_name == "s3":
+            describe_resource, client = self.__describe_bucket, self.__client("s3")
+        elif service_name == "sqs":
+            describe_resource, client = self.__describe_queue, self.__client("sqs")
+        else:
+            return details
+        # The clients are thread safe, the workers share them
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(missing_names)))) as executor:
+            futures = {
+                executor.submit(describe_resource, client, resource_name): resource_name
+                for resource_name in missing_names
+            }
+            for future in concurrent.futures.as_completed(futures):
+                resource_details = future.result()
+                resource_details["owner"] = self.__owner(resource_details["tags"])
+                details[futures[future]] = resource_details
+        expires_at = time.monotonic() + self.ttl_seconds
+        with RESOURCE_DETAILS_LOCK:
+            for resource_name in missing_names:
+                # A resource with a failed call is described again by the next listing
+                if "unknown" not in (details[resource_name]["region"], details[resource_name]["encryption"]):
+                    RESOURCE_DETAILS_CACHE[(self.account_id, service_name, resource_name)] = (
+                        expires_at, details[resource_name]
+                    )
+        return details
@@ -0,0 +1,161 @@
+import fnmatch
+import re
+
+GLOB_WILDCARDS = "*?["
+
+
+class ResourceFilter:
+    """
+    A class used to filter and cap a resource listing
+
+    The prefix (and the literal prefix of the glob) is pushed down to the listing API where supported,
+    the compiled glob is applied to the streamed pages, and the listing stops once the limit is reached.
+
+    ...
+
+    Attributes
+    ----------
+    prefix : str
+        the resource names prefix
+    match : str
+        a glob the resource names must match (fnmatch syntax, case sensitive)
+    limit : int
+        the maximum number of resources to return, 0 for no limit
+    api_prefix : str
+        the prefix to send to the listing API
+    resources : list
+        the matching resources collected so far
+    truncated : bool
+        True if more resources matched than the limit
+
+    Methods
+    -------
+    page_size(maximum: int) -> int:
+        Returns the listing page size to request
+    matches(name: str) -> bool:
+        Returns True if a resource name passes the filter
+    add(names: iterable) -> bool:
+        Collects the matching names of a listing page, returns True once the limit is reached
+    reset():
+        Drops the collected names, before listing again from another source
+    """
+
+    def __init__(self, prefix="", match="", limit=0):
+        """
+        Constructs all the necessary attributes for the ResourceFilter object.
+
+        Parameters
+        ----------
+            prefix : str, optional
+                the resource names prefix (default is "")
+            match : str, optional
+                a glob the resource names must match (default is "")
+            limit : int, optional
+                the maximum number of resources to return (default is 0, no limit)
+        """
+        self.prefix = prefix or ""
+        self.match = match or ""
+        self.limit = limit or 0
+        self.resources = []
+        self.truncated = False
+        self.__pattern = re.compile(fnmatch.translate(self.match)) if self.match else None
+        self.__disjoint = False
+        literal_prefix = self.__literal_prefix(self.match)
+        if literal_prefix.startswith(self.prefix):
+            self.api_prefix = literal_prefix
+        elif self.prefix.startswith(literal_prefix):
+            self.api_prefix = self.prefix
+        else:
+            # e.g. --prefix prod- --match dev-*, nothing can match
+            self.api_prefix = self.prefix
+            self.__disjoint = True
+
+    @staticmethod
+    def __literal_prefix(pattern: str) -> str:
+        """
+        Returns the part of a glob before its first wildcard.
+        """
+        for position, character in enumerate(pattern):
+            if character in GLOB_WILDCARDS:
+                return pattern[:position]
+        return pattern
+
+    @property
+    def active(self) -> bool:
+        return bool(self.prefix or self.match or self.limit)
+
+    @property
+    def empty(self) -> bool:
+        """
+        True if no resource name can pass the filter, the listing can be skipped.
+        """
+        return self.__disjoint
+
+    def page_size(self, maximum: int) -> int:
+        """
+        Returns the listing page size to request.
+
+        Without a glob every name the API returns for the prefix is kept, so one more than the limit is enough
+        to know if the listing is truncated. With a glob the names are sparse and the largest page is used.
+
+        Parameters
+        ----------
+            maximum : int
+                the largest page size of the listing API
+
+        Returns
+        -------
+            int
+                the page size
+        """
+        if self.limit and self.__pattern is None:
+            return min(maximum, self.limit + 1)
+        return maximum
+
+    def matches(self, name: str) -> bool:
+        """
+        Returns True if a resource name passes the filter.
+
+        Parameters
+        ----------
+            name : str
+                the resource name
+
+        Returns
+        -------
+            bool
+                True if the name starts with the prefix and matches the glob
+        """
+        if self.__disjoint or not name.startswith(self.api_prefix):
+            return False
+        return self.__pattern is None or self.__pattern.match(name) is not None
+
+    def add(self, names) -> bool:
+        """
+        Collects the matching names of a listing page.
+
+        Parameters
+        ----------
+            names : iterable
+                the resource names of the page
+
+        Returns
+        -------
+            bool
+                True once the limit is reached, the remaining pages do not need to be fetched
+        """
+        for name in names:
+            if not self.matches(name):
+                continue
+            if self.limit and len(self.resources) >= self.limit:
+                self.truncated = True
+                return True
+            self.resources.append(name)
+        return False
+
+    def reset(self):
+        """
+        Drops the collected names, before listing again from another source.
+        """
+        self.resources = []
+        self.truncated = False
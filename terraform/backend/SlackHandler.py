@@ -2,15 +2,31 @@ import urllib
 import urllib.parse
 import urllib.request
 import json
+import Resilience
+import Tracing
 
 
 def parse_slack_url(slack_url: str) -> dict:
     return urllib.parse.parse_qs(slack_url)
 
 
-def response_to_slack(response_url: str, text: str):
+def parse_slack_event(event: dict) -> dict:
+    """
+    Returns the response_url, text and user_name of a Slack command, from the fields parsed by the invocation
+    lambda ("slack") or from the raw slash command body ("body").
+    """
+    if event.get("slack"):
+        return event.get("slack")
+    slack_payload = parse_slack_url(event.get("body") or "")
+    return {field: slack_payload.get(field, [""])[0] for field in ("response_url", "text", "user_name")}
+
+
+@Tracing.traced("slack.response_to_slack")
+def response_to_slack(response_url: str, text: str, replace_original=False, timeout_seconds=None):
     payload = {
         "text": text
     }
+    if replace_original:
+        payload["replace_original"] = True
     request = urllib.request.Request(url=response_url, data=bytes(json.dumps(payload), encoding='utf-8'), method='POST')
-    urllib.request.urlopen(request)
+    Resilience.urlopen(request, "slack", timeout_seconds=timeout_seconds)
@@ -0,0 +1,188 @@
+import boto3
+import hashlib
+import InventoryIndex
+import JobQueue
+import json
+import os
+import SlackHandler
+import time
+import Tracing
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# Must match the grant modal opened by the invocation lambda
+GRANT_MODAL_CALLBACK_ID = "aws_permissions_grant"
+SLACK_OPTIONS_LIMIT = 100
+SLACK_OPTION_TEXT_LIMIT = 75
+
+
+def slack_response(body="", status_code=200) -> dict:
+    if isinstance(body, dict):
+        return {"statusCode": status_code, "headers": {"Content-Type": "application/json"}, "body": json.dumps(body)}
+    return {"statusCode": status_code, "body": body}
+
+
+def state_values(view: dict) -> dict:
+    """
+    Returns the current values of the modal inputs by block ID, a list for multi selects.
+    """
+    values = {}
+    for block_id, actions in view.get("state", {}).get("values", {}).items():
+        for action in actions.values():
+            if action.get("selected_options") is not None:
+                values[block_id] = [option.get("value") for option in action.get("selected_options")]
+            elif action.get("selected_option"):
+                values[block_id] = action.get("selected_option").get("value")
+            else:
+                values[block_id] = action.get("value") or ""
+    return values
+
+
+def options(names: list) -> list:
+    return [
+        {"text": {"type": "plain_text", "text": name[:SLACK_OPTION_TEXT_LIMIT]}, "value": name}
+        for name in names[:SLACK_OPTIONS_LIMIT]
+    ]
+
+
+def load_options(payload: dict) -> dict:
+    """
+    Answers a Slack external select options request from the inventory index, AWS is never listed.
+
+    The index merges the snapshots of every organization of AWS_ORGANIZATIONS, so the accounts of all of them
+    are offered.
+
+    Parameters
+    ----------
+        payload : dict
+            the block_suggestion payload
+
+    Returns
+    -------
+        dict
+            the Lambda response with the matching options
+    """
+    start = time.perf_counter()
+    index = InventoryIndex.load_configured_index()
+    load_ms = (time.perf_counter() - start) * 1000
+    action_id = payload.get("action_id")
+    query = payload.get("value") or ""
+    names = []
+    if index is not None and action_id == "account":
+        names = index.search_accounts(query, limit=SLACK_OPTIONS_LIMIT)
+    elif index is not None and action_id == "resources":
+        values = state_values(payload.get("view", {}))
+        names = index.search_resources(
+            values.get("account") or "",
+            values.get("service") or "s3",
+            query,
+            limit=SLACK_OPTIONS_LIMIT
+        )
+    logger.info("SlackInteractive.load_options: {} \"{}\" - {} options, index load {:.1f}ms, total {:.1f}ms".format(
+        action_id,
+        query,
+        len(names),
+        load_ms,
+        (time.perf_counter() - start) * 1000
+    ))
+    return slack_response({"options": options(names)})
+
+
+def grant_command(values: dict) -> str:
+    command = "grant -s {} -p {} -a {} -r {}".format(
+        values.get("service"),
+        values.get("permission"),
+        values.get("account"),
+        " ".join(values.get("resources") or [])
+    )
+    if values.get("permission_set_name"):
+        command += " -ps {}".format(values.get("permission_set_name"))
+    return command
+
+
+def submit_grant(payload: dict) -> dict:
+    """
+    Queues the grant of a submitted modal like a slash command, and replaces the modal with the request ID.
+
+    Parameters
+    ----------
+        payload : dict
+            the view_submission payload
+
+    Returns
+    -------
+        dict
+            the Lambda response, input errors or the updated modal
+    """
+    view = payload.get("view", {})
+    values = state_values(view)
+    errors = {}
+    for block_id in ("account", "service", "permission", "permission_set_name"):
+        if len((values.get(block_id) or "").split()) > 1:
+            errors[block_id] = "Spaces are not allowed"
+    if not values.get("resources"):
+        errors["resources"] = "Select at least one resource"
+    if errors:
+        return slack_response({"response_action": "errors", "errors": errors})
+
+    metadata = json.loads(view.get("private_metadata") or "{}")
+    command = grant_command(values)
+    slack_fields = {
+        "response_url": metadata.get("response_url"),
+        "text": command,
+        "user_name": metadata.get("user_name") or payload.get("user", {}).get("username", "")
+    }
+    # A double submit of the same modal is the same request
+    request_id = hashlib.sha256(view.get("id", command).encode('utf-8')).hexdigest()[:12]
+    queue_url = os.getenv("QUEUE_URL")
+    if queue_url:
+        status_store = JobQueue.StatusStore(table_name=os.getenv("STATUS_TABLE_NAME"))
+        if status_store.create(request_id, slack_fields.get("user_name"), command):
+            if not JobQueue.SqsJobQueue(queue_url).send(request_id, slack=slack_fields):
+                # Never queued, a resubmit must not be taken for a duplicate
+                status_store.delete(request_id)
+                return slack_response({
+                    "response_action": "errors",
+                    "errors": {"resources": "Failed to queue the request, please submit it again"}
+                })
+    else:
+        boto3.client('lambda').invoke(
+            FunctionName=os.getenv("LAMBDA_NAME"),
+            InvocationType='Event',
+            Payload=json.dumps({"slack": slack_fields})
+        )
+    logger.info("SlackInteractive.submit_grant: {} - {}".format(request_id, command))
+    return slack_response({
+        "response_action": "update",
+        "view": {
+            "type": "modal",
+            "title": {"type": "plain_text", "text": "AWS Permissions"},
+            "close": {"type": "plain_text", "text": "Close"},
+            "blocks": [
+                {
+                    "type": "section",
+                    "text": {
+                        "type": "mrkdwn",
+                        "text": "Working on it, request `{}` was queued. The result will be posted in the channel, "
+                                "check it with `/aws_permissions status {}`".format(request_id, request_id)
+                    }
+                }
+            ]
+        }
+    })
+
+
+@Tracing.trace_request
+def lambda_handler(event, context):
+    """
+    Handles the Slack interactivity requests: external select options and the grant modal submission.
+    """
+    payload = json.loads(SlackHandler.parse_slack_url(event.get("body") or "").get("payload", ["{}"])[0])
+    Tracing.current_trace().command = payload.get("type", "")
+    if payload.get("type") == "block_suggestion":
+        return load_options(payload)
+    if payload.get("type") == "view_submission" and payload.get("view", {}).get("callback_id") == GRANT_MODAL_CALLBACK_ID:
+        return submit_grant(payload)
+    # block_actions and view_closed need no answer
+    return slack_response()
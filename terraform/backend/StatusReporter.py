@@ -0,0 +1,181 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+import SlackHandler
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+CURRENT_REPORTER = contextvars.ContextVar("current_reporter", default=None)
+# Slack accepts 5 messages per response URL, one is kept for the final message
+SLACK_RESPONSE_URL_MESSAGES = 5
+
+
+class StatusReporter:
+    """
+    A class used to post the progress of a request to Slack from a background worker
+
+    update() only records the latest status, the worker posts it through the response URL, replacing the previous
+    status message. The worker starts on the first update, and updates within min_interval_seconds of the start or
+    of the last post are coalesced, only the latest one is posted, so a fast request only gets its final message.
+    At most max_posts are posted, the final message always has a response URL message left.
+
+    ...
+
+    Attributes
+    ----------
+    response_url : str
+        the Slack response URL of the command
+    max_posts : int
+        the maximum number of status messages
+    min_interval_seconds : float
+        the minimum time between two status messages
+    timeout_seconds : float
+        the timeout of a status message, and how long stop() waits for one in flight
+    posted : list
+        the posted status messages
+
+    Methods
+    -------
+    update(text: str):
+        Records the latest status, never blocks
+    stop():
+        Drops the pending status and waits for a post in flight, so the final message comes last
+    """
+
+    def __init__(
+            self,
+            response_url: str,
+            max_posts=SLACK_RESPONSE_URL_MESSAGES - 1,
+            min_interval_seconds=2.0,
+            timeout_seconds=1.0
+    ):
+        """
+        Constructs all the necessary attributes for the StatusReporter object.
+
+        Parameters
+        ----------
+            response_url : str
+                the Slack response URL of the command
+            max_posts : int, optional
+                the maximum number of status messages (default is 4)
+            min_interval_seconds : float, optional
+                the minimum time between two status messages (default is 2.0)
+            timeout_seconds : float, optional
+                the timeout of a status message (default is 1.0)
+        """
+        self.response_url = response_url
+        self.max_posts = max_posts
+        self.min_interval_seconds = min_interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.posted = []
+        self.__pending = None
+        self.__stopped = False
+        self.__started = False
+        self.__last_post = time.monotonic()
+        self.__condition = threading.Condition()
+        self.__worker = threading.Thread(target=self.__run, name="slack-status", daemon=True)
+
+    def update(self, text: str):
+        """
+        Records the latest status, an earlier status that was not posted yet is replaced.
+        """
+        with self.__condition:
+            if self.__stopped or len(self.posted) >= self.max_posts:
+                return
+            self.__pending = text
+            if not self.__started:
+                self.__started = True
+                self.__worker.start()
+            self.__condition.notify()
+
+    def stop(self):
+        """
+        Drops the pending status and waits up to timeout_seconds for a post in flight.
+        """
+        with self.__condition:
+            self.__stopped = True
+            self.__pending = None
+            self.__condition.notify()
+        if self.__worker.is_alive():
+            self.__worker.join(self.timeout_seconds)
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while not self.__stopped and self.__pending is None:
+                    self.__condition.wait()
+                if self.__stopped:
+                    return
+                # Coalesce the updates of the rate limit window, the latest one is posted
+                wait_seconds = self.__last_post + self.min_interval_seconds - time.monotonic()
+                if wait_seconds > 0:
+                    self.__condition.wait(wait_seconds)
+                    continue
+                text = self.__pending
+                self.__pending = None
+            try:
+                SlackHandler.response_to_slack(
+                    self.response_url,
+                    text,
+                    replace_original=bool(self.posted),
+                    timeout_seconds=self.timeout_seconds
+                )
+                self.posted.append(text)
+            except Exception as e:
+                logger.error("StatusReporter.__run: {}".format(e))
+            self.__last_post = time.monotonic()
+            with self.__condition:
+                if len(self.posted) >= self.max_posts:
+                    return
+
+
+def report(text: str):
+    """
+    Posts a status of the running request to Slack in the background, no-op outside of a reported request.
+    """
+    reporter = CURRENT_REPORTER.get()
+    if reporter is not None:
+        reporter.update(text)
+
+
+def stop():
+    """
+    Stops the status updates of the running request, called before its final message.
+    """
+    reporter = CURRENT_REPORTER.get()
+    if reporter is not None:
+        reporter.stop()
+
+
+def report_status(handler):
+    """
+    Decorates a Lambda handler so the Slack commands get progress messages while they run, unless
+    SLACK_STATUS_UPDATES is "false".
+
+    SLACK_STATUS_MAX_UPDATES (at most 4), SLACK_STATUS_MIN_INTERVAL_SECONDS and SLACK_STATUS_TIMEOUT_SECONDS bound
+    the status messages. SQS batches and events without a response URL are passed through, each job of a batch
+    gets its own reporter from its handler call.
+    """
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if "Records" in event or os.getenv("SLACK_STATUS_UPDATES", "true").lower() != "true":
+            return handler(event, context)
+        response_url = SlackHandler.parse_slack_event(event).get("response_url")
+        if not response_url:
+            return handler(event, context)
+        reporter = StatusReporter(
+            response_url,
+            max_posts=min(int(os.getenv("SLACK_STATUS_MAX_UPDATES", "4")), SLACK_RESPONSE_URL_MESSAGES - 1),
+            min_interval_seconds=float(os.getenv("SLACK_STATUS_MIN_INTERVAL_SECONDS", "2")),
+            timeout_seconds=float(os.getenv("SLACK_STATUS_TIMEOUT_SECONDS", "1"))
+        )
+        token = CURRENT_REPORTER.set(reporter)
+        try:
+            return handler(event, context)
+        finally:
+            reporter.stop()
+            CURRENT_REPORTER.reset(token)
+    return wrapper
@@ -0,0 +1,164 @@
+import re
+import Tracing
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class TerraformPatch:
+    """
+    A class used to apply a unified diff returned by the model to the environment file
+
+    The hunks are applied strictly: every context and removed line must match the file exactly. A hunk is
+    looked up at its stated line first, then anywhere in the file as long as its context is found once, since
+    the model often miscounts line numbers but not the lines themselves.
+
+    ...
+
+    Attributes
+    ----------
+    hunks : list
+        the parsed hunks, a list of {"start": int, "old": list, "new": list}
+    error : str
+        why the diff could not be parsed or applied, empty string otherwise
+
+    Methods
+    -------
+    apply(text: str) -> str:
+        Applies the hunks to a file, returns the patched file or empty string if the patch does not apply
+    """
+
+    def __init__(self, diff: str):
+        """
+        Constructs all the necessary attributes for the TerraformPatch object.
+
+        Parameters
+        ----------
+            diff : str
+                the unified diff, optionally wrapped in a markdown code fence
+        """
+        self.error = ""
+        self.hunks = self.__parse(diff or "")
+
+    def __parse(self, diff: str) -> list:
+        """
+        Parses the hunks of a unified diff, the file headers before the first hunk and code fences are skipped.
+        """
+        hunks = []
+        hunk = None
+        for line in diff.splitlines():
+            header = HUNK_HEADER.match(line)
+            if header:
+                hunk = {"start": int(header.group(1)), "old": [], "new": []}
+                hunks.append(hunk)
+            elif hunk is None or line.startswith("```") or line.startswith("\\"):
+                # Before the first hunk, the file headers and any text; in a hunk, "--- x" removes the line "-- x"
+                continue
+            elif line.startswith("-"):
+                hunk["old"].append(line[1:])
+            elif line.startswith("+"):
+                hunk["new"].append(line[1:])
+            elif line.startswith(" ") or line == "":
+                hunk["old"].append(line[1:])
+                hunk["new"].append(line[1:])
+            else:
+                self.error = "unexpected line in hunk: {}".format(line)
+                return []
+        if not hunks:
+            self.error = "no hunk found"
+        for hunk in hunks:
+            # Blank lines after the last hunk are not context
+            while hunk["old"][-1:] == [""] and hunk["new"][-1:] == [""]:
+                hunk["old"].pop()
+                hunk["new"].pop()
+        return [hunk for hunk in hunks if hunk["old"] != hunk["new"]]
+
+    @staticmethod
+    def __find(lines: list, old: list, stated: int, after: int) -> int:
+        """
+        Returns where the old lines of a hunk are, the stated position first, -1 if they are missing or ambiguous.
+        """
+        size = len(old)
+        if stated >= after and lines[stated:stated + size] == old:
+            return stated
+        positions = [
+            position for position in range(after, len(lines) - size + 1) if lines[position:position + size] == old
+        ]
+        if len(positions) != 1:
+            return -1
+        return positions[0]
+
+    @staticmethod
+    def __balanced(text: str) -> bool:
+        """
+        Returns True if the braces and brackets outside strings and comments are balanced.
+        """
+        closing = {"}": "{", "]": "[", ")": "("}
+        stack = []
+        for line in text.splitlines():
+            in_string = False
+            escaped = False
+            for position, character in enumerate(line):
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif character == "\\":
+                        escaped = True
+                    elif character == '"':
+                        in_string = False
+                elif character == '"':
+                    in_string = True
+                elif character == "#" or line.startswith("//", position):
+                    break
+                elif character in "{[(":
+                    stack.append(character)
+                elif character in closing:
+                    if not stack or stack.pop() != closing[character]:
+                        return False
+        return not stack
+
+    @Tracing.traced("terraform.apply_patch")
+    def apply(self, text: str) -> str:
+        """
+        Applies the hunks to a file.
+
+        Parameters
+        ----------
+            text : str
+                the file to patch
+
+        Returns
+        -------
+            str
+                the patched file, empty string if a hunk does not apply, the diff changes nothing or the patched
+                file has unbalanced braces
+        """
+        if not self.hunks:
+            self.error = self.error or "the diff changes nothing"
+            logger.error("TerraformPatch.apply: {}".format(self.error))
+            return ""
+        lines = text.splitlines()
+        patched = []
+        position = 0
+        for hunk in self.hunks:
+            # An insertion without context goes after the stated line
+            stated = max(0, hunk["start"] - 1) if hunk["old"] else min(hunk["start"], len(lines))
+            found = self.__find(lines, hunk["old"], stated, position) if hunk["old"] else stated
+            if found < position:
+                self.error = "hunk at line {} does not apply".format(hunk["start"])
+                logger.error("TerraformPatch.apply: {}".format(self.error))
+                return ""
+            patched.extend(lines[position:found])
+            patched.extend(hunk["new"])
+            position = found + len(hunk["old"])
+        patched.extend(lines[position:])
+        result = "\n".join(patched)
+        if text.endswith("\n"):
+            result += "\n"
+        if not self.__balanced(result):
+            self.error = "the patched file has unbalanced braces"
+            logger.error("TerraformPatch.apply: {}".format(self.error))
+            return ""
+        return result
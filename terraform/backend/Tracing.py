@@ -0,0 +1,208 @@
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import time
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+CURRENT_TRACE = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """
+    A class used to collect the timing spans of one request
+
+    ...
+
+    Attributes
+    ----------
+    request_id : str
+        the request ID
+    command : str
+        the bot command (grant, list, help...)
+    spans : list
+        the finished spans, each a dictionary with name, depth, start_ms, duration_ms and error
+    span_listeners : list
+        callables notified with ("enter" | "exit", span name, depth) around every span
+
+    Methods
+    -------
+    span(name: str):
+        A context manager timing a block of code
+    breakdown() -> dict:
+        Returns the structured timing breakdown of the request
+    emit():
+        Logs the breakdown, and CloudWatch EMF metrics if TRACING_EMF_NAMESPACE is set
+    """
+
+    def __init__(self, request_id="", command=""):
+        """
+        Constructs all the necessary attributes for the Trace object.
+
+        Parameters
+        ----------
+            request_id : str, optional
+                the request ID (default is "")
+            command : str, optional
+                the bot command (default is "")
+        """
+        self.request_id = request_id
+        self.command = command
+        self.spans = []
+        self.span_listeners = []
+        self.__depth = 0
+        self.__start = time.perf_counter()
+        self.__end = None
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        """
+        A context manager timing a block of code with a monotonic clock.
+
+        Parameters
+        ----------
+            name : str
+                the span name, e.g. "github.read_file_content"
+        """
+        depth = self.__depth
+        for listener in self.span_listeners:
+            listener("enter", name, depth)
+        self.__depth += 1
+        start = time.perf_counter()
+        error = ""
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter()
+            self.__depth -= 1
+            self.spans.append({
+                "name": name,
+                "depth": depth,
+                "start_ms": round((start - self.__start) * 1000, 2),
+                "duration_ms": round((end - start) * 1000, 2),
+                "error": error
+            })
+            for listener in self.span_listeners:
+                listener("exit", name, depth)
+
+    def finish(self):
+        self.__end = time.perf_counter()
+
+    def breakdown(self) -> dict:
+        """
+        Returns the structured timing breakdown of the request.
+
+        Returns
+        -------
+            dict
+                the total time, the spans in start order, and the time and call count per span name
+        """
+        end = self.__end or time.perf_counter()
+        totals = {}
+        counts = {}
+        for span in self.spans:
+            totals[span["name"]] = round(totals.get(span["name"], 0) + span["duration_ms"], 2)
+            counts[span["name"]] = counts.get(span["name"], 0) + 1
+        return {
+            "trace": "aws_permissions_bot",
+            "request_id": self.request_id,
+            "command": self.command,
+            "total_ms": round((end - self.__start) * 1000, 2),
+            "spans": sorted(self.spans, key=lambda span: span["start_ms"]),
+            "totals_ms": totals,
+            "counts": counts
+        }
+
+    def emit(self):
+        """
+        Logs the breakdown, and CloudWatch EMF metrics if TRACING_EMF_NAMESPACE is set.
+
+        The EMF document has one millisecond metric per span name plus "total", dimensioned by command,
+        so CloudWatch can build p50/p95 per stage without a log query.
+        """
+        breakdown = self.breakdown()
+        logger.info(json.dumps(breakdown))
+        emf_namespace = os.getenv("TRACING_EMF_NAMESPACE")
+        if not emf_namespace:
+            return
+        metrics = dict(breakdown["totals_ms"])
+        metrics["total"] = breakdown["total_ms"]
+        emf_document = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": emf_namespace,
+                        "Dimensions": [["command"]],
+                        "Metrics": [{"Name": name, "Unit": "Milliseconds"} for name in metrics]
+                    }
+                ]
+            },
+            "command": self.command or "unknown",
+            "request_id": self.request_id
+        }
+        emf_document.update(metrics)
+        # EMF must be a standalone JSON log line, the logger adds a prefix
+        print(json.dumps(emf_document))
+
+
+def current_trace():
+    """
+    Returns the trace of the running request, None outside of a request.
+    """
+    return CURRENT_TRACE.get()
+
+
+@contextlib.contextmanager
+def span(name: str):
+    """
+    Times a block of code in the running request trace, no-op outside of a request.
+    """
+    trace = CURRENT_TRACE.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name):
+        yield
+
+
+def traced(name: str):
+    """
+    Decorates a connector call so every call is timed as a span of the running request trace.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_request(handler):
+    """
+    Decorates a Lambda handler so every request gets its own trace, emitted when the request ends.
+
+    SQS batches are passed through, each job of the batch is traced by its own handler call.
+    """
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if "Records" in event:
+            return handler(event, context)
+        request_id = event.get("request_id") or getattr(context, "aws_request_id", "")
+        trace = Trace(request_id=request_id)
+        token = CURRENT_TRACE.set(trace)
+        try:
+            with trace.span("lambda_handler"):
+                return handler(event, context)
+        finally:
+            trace.finish()
+            CURRENT_TRACE.reset(token)
+            trace.emit()
+    return wrapper
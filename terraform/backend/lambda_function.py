@@ -1,86 +1,253 @@
+import LazyImport
+IMPORT_PROFILING = LazyImport.profile_imports_if_enabled()
 import argparse
 import base64
-import AWSHandler
-import OktaHandler
-import GithubHandler
-import JiraHandler
-import PagerDutyHandler
+import contextlib
+import datetime
+import Profiling
+import Resilience
 import SlackHandler
+import StatusReporter
+import Tracing
+import io
 import logging
 import os
 import json
 logger = logging.getLogger()
 logger.setLevel("INFO")
 
+LIST_RESULTS_MAX_LIMIT = 1000
+SUPPORTED_SERVICES = ("s3", "sqs")
+SECRET_ARN_VARIABLES = (
+    "SECRETS_MANAGER_OKTA_TOKEN_ARN",
+    "SECRETS_MANAGER_GITHUB_TOKEN_ARN",
+    "SECRETS_MANAGER_PD_TOKEN_ARN",
+    "SECRETS_MANAGER_JIRA_TOKEN_ARN"
+)
 
+# Connector modules (and boto3 behind them) are imported on first use by the command paths that need them
+Coalescing = LazyImport.LazyModule("Coalescing")
+AWSHandler = LazyImport.LazyModule("AWSHandler")
+OktaHandler = LazyImport.LazyModule("OktaHandler")
+GithubHandler = LazyImport.LazyModule("GithubHandler")
+JiraHandler = LazyImport.LazyModule("JiraHandler")
+JobQueue = LazyImport.LazyModule("JobQueue")
+ResourceFilter = LazyImport.LazyModule("ResourceFilter")
+FuzzyIndex = LazyImport.LazyModule("FuzzyIndex")
+InventoryIndex = LazyImport.LazyModule("InventoryIndex")
+InventorySweeper = LazyImport.LazyModule("InventorySweeper")
+PagerDutyHandler = LazyImport.LazyModule("PagerDutyHandler")
+TerraformPatch = LazyImport.LazyModule("TerraformPatch")
+BedrockRouter = LazyImport.LazyModule("BedrockRouter")
+EnvironmentGrants = LazyImport.LazyModule("EnvironmentGrants")
+Organizations = LazyImport.LazyModule("Organizations")
+GrantExpiries = LazyImport.LazyModule("GrantExpiries")
+# Set once the connector modules are imported and the AWS clients created
+PRELOAD_STATE = {"done": False}
+# The pull request opened by the job being processed, a job that fails after it must not be redelivered
+JOB_PROGRESS = {"pull_request": ""}
+
+
+def respond(response_url: str, text: str) -> dict:
+    """
+    Sends the final message to Slack and returns it as the Lambda response body.
+    """
+    # A status message still in flight lands before the final message
+    StatusReporter.stop()
+    SlackHandler.response_to_slack(response_url, text)
+    return {"statusCode": 200, "body": text}
+
+
+def process_job_batch(event, context, status_store=None) -> dict:
+    """
+    Processes a batch of queued Slack commands delivered by the SQS event source mapping.
+
+    Every job is claimed in the status table first, so a redelivered message for a job another
+    worker already owns (or finished) is skipped, unless the worker was killed by the Lambda timeout
+    (its record is still running after JOB_LEASE_SECONDS). Jobs that raise are put back to queued and
+    reported as batch item failures so SQS redelivers only them. A job that fails after its pull request was
+    opened, or on its last receive (JOB_MAX_RECEIVE_COUNT) before the dead-letter queue, is marked failed and
+    the user is told instead, a grant is not idempotent. Pass a JobQueue.InMemoryStatusStore as status_store
+    to run a JobQueue.InMemoryJobQueue event locally.
+    """
+    if status_store is None:
+        status_store = JobQueue.StatusStore(
+            table_name=os.getenv("STATUS_TABLE_NAME"),
+            lease_seconds=int(os.getenv("JOB_LEASE_SECONDS", "900"))
+        )
+    min_remaining_time_in_millis = int(os.getenv("JOB_MIN_REMAINING_TIME_MS", "60000"))
+    max_receive_count = int(os.getenv("JOB_MAX_RECEIVE_COUNT", "3"))
+    batch_item_failures = []
+    for record in event.get("Records"):
+        job = json.loads(record.get("body"))
+        request_id = job.get("request_id")
+        if context.get_remaining_time_in_millis() < min_remaining_time_in_millis:
+            logger.info("Not enough time left for job {}, returning it to the queue".format(request_id))
+            batch_item_failures.append({"itemIdentifier": record.get("messageId")})
+            continue
+        if not status_store.claim(request_id):
+            logger.info("Job {} is already handled, skipping".format(request_id))
+            continue
+        logger.info("Request ID: {}".format(request_id))
+        JOB_PROGRESS["pull_request"] = ""
+        try:
+            response = lambda_handler(
+                {"slack": job.get("slack"), "body": job.get("body"), "request_id": request_id},
+                context
+            )
+        except SystemExit:
+            # An invalid command, retrying it will not help
+            message = "AWS Permissions bot Error - Invalid command, use /aws_permissions help"
+            status_store.update(request_id, JobQueue.STATUS_FAILED, message)
+            respond(SlackHandler.parse_slack_event(job).get("response_url"), message)
+            continue
+        except Exception as e:
+            logger.error("Job {} failed: {}".format(request_id, e))
+            receive_count = int(record.get("attributes", {}).get("ApproximateReceiveCount", "1"))
+            if JOB_PROGRESS["pull_request"]:
+                # Running the job again would open another pull request
+                message = "AWS Permissions bot Error - pull request was generated {}, but the request failed ({}), " \
+                          "please share the pull request with the security team".format(JOB_PROGRESS["pull_request"], e)
+            elif receive_count >= max_receive_count:
+                # SQS moves the message to the dead-letter queue instead of the next receive
+                message = "AWS Permissions bot Error - The request failed {} times ({}), please contact the " \
+                          "security team".format(receive_count, e)
+                batch_item_failures.append({"itemIdentifier": record.get("messageId")})
+            else:
+                status_store.update(request_id, JobQueue.STATUS_QUEUED, str(e))
+                batch_item_failures.append({"itemIdentifier": record.get("messageId")})
+                continue
+            status_store.update(request_id, JobQueue.STATUS_FAILED, message)
+            try:
+                respond(SlackHandler.parse_slack_event(job).get("response_url"), message)
+            except Exception as slack_error:
+                logger.error("Job {} failure was not posted: {}".format(request_id, slack_error))
+            continue
+        message = response.get("body", "")
+        if message.startswith("AWS Permissions bot Error"):
+            status_store.update(request_id, JobQueue.STATUS_FAILED, message)
+        elif response.get("coalesced"):
+            status_store.update(request_id, JobQueue.STATUS_COALESCED, message)
+        else:
+            status_store.update(request_id, JobQueue.STATUS_COMPLETED, message)
+    return {"batchItemFailures": batch_item_failures}
+
+
+@LazyImport.log_imports_after_first_call(enabled=IMPORT_PROFILING)
+@Tracing.trace_request
+@Profiling.profile_request
+@Resilience.bounded_request
+@StatusReporter.report_status
 def lambda_handler(event, context):
+    # Jobs queued by the invocation lambda
+    if "Records" in event:
+        return process_job_batch(event, context)
+
+    # Rebuild of the inventory snapshot served to the Slack modal pickers
+    if event.get("inventory_sweep"):
+        Tracing.current_trace().command = "inventory_sweep"
+        return build_inventory_index()
+
+    # Scheduled warm-up, fills the container caches so the user requests land on warm state
+    if event.get("warm_up"):
+        Tracing.current_trace().command = "warm_up"
+        return warm_up()
+
+    # Revocation of the expired time-bound grants, one pull request per environment file
+    if event.get("expire_grants"):
+        Tracing.current_trace().command = "expire_grants"
+        return expire_grants()
+
     # Get environment variables
     domain = os.getenv("DOMAIN")
     okta_token_secret_arn = os.getenv("SECRETS_MANAGER_OKTA_TOKEN_ARN")
     okta_organization_name = os.getenv("OKTA_ORGANIZATION_NAME")
     github_token_secret_arn = os.getenv("SECRETS_MANAGER_GITHUB_TOKEN_ARN")
-    github_owner = os.getenv("GITHUB_OWNER")
-    github_terraform_environment_repository_name = os.getenv("TERRAFORM_ENVIRONMENT_REPOSITORY_NAME")
-    github_terraform_module_repository_name = os.getenv("TERRAFORM_MODULE_REPOSITORY_NAME")
-    github_terraform_environment_sso_account_path = os.getenv("TERRAFORM_ENVIRONMENT_SSO_ACCOUNT_PATH")
-    github_terraform_module_sso_path = os.getenv("TERRAFORM_MODULE_SSO_PATH")
     pager_duty_token_secret_arn = os.getenv("SECRETS_MANAGER_PD_TOKEN_ARN")
-    pager_duty_schedule_id = os.getenv("PAGER_DUTY_SCHEDULE_ID")
     jira_token_secret_arn = os.getenv("SECRETS_MANAGER_JIRA_TOKEN_ARN")
-    jira_project_key = os.getenv("JIRA_PROJECT_KEY")
-    jira_issue_type = os.getenv("JIRA_ISSUE_TYPE")
-    jira_organization_name = os.getenv("JIRA_ORGANIZATION_NAME")
+    coalescing_margin_seconds = int(os.getenv("COALESCING_MARGIN_SECONDS", "30"))
+    coalescing_wait_seconds = int(os.getenv("COALESCING_WAIT_SECONDS", "5"))
+    list_results_limit = int(os.getenv("LIST_RESULTS_LIMIT", "100"))
+    list_details_limit = int(os.getenv("LIST_DETAILS_LIMIT", "200"))
 
-    slack_payload = event.get("body")
+    slack_fields = SlackHandler.parse_slack_event(event)
     okta_group = ""
 
     # Extract Slack response URL, command, and username
-    response_url = SlackHandler.parse_slack_url(slack_payload).get("response_url")[0]
-    command = SlackHandler.parse_slack_url(slack_payload).get("text")[0]
-    user_name = SlackHandler.parse_slack_url(slack_payload).get("user_name")[0]
-
-    # Parser settings
-    parser = argparse.ArgumentParser(add_help=True, description="AWS Permissions Parser")
-    subparsers = parser.add_subparsers(dest='command', required=True)
-
-    # Grant Permissions
-    grant_parser = subparsers.add_parser("grant", help="Grant Permissions")
-    grant_parser.add_argument("-s", "--service", help="AWS Service", required=True)
-    grant_parser.add_argument("-p", "--permission", help="Permission", required=True)
-    grant_parser.add_argument("-a", "--account", help="AWS Account", required=True)
-    grant_parser.add_argument("-r", "--resource", help="Resource Name", required=True)
-    grant_parser.add_argument("-o", "--on-behalf", help="On Behalf", required=False)
-    grant_parser.add_argument("-ps", "--permission-set-name", help="Permission Set Name", required=False)
-
-    # List Resources
-    list_parser = subparsers.add_parser("list", help="List Permissions")
-    list_parser.add_argument("-s", "--service", help="AWS Service", required=True)
-    list_parser.add_argument("-a", "--account", help="AWS Account", required=True)
-
-    # Help
-    subparsers.add_parser("help", help="Help")
-    args = parser.parse_args(command.split(" "))
+    response_url = slack_fields.get("response_url")
+    command = slack_fields.get("text")
+    user_name = slack_fields.get("user_name")
+
+    with Tracing.span("parse_command"):
+        # Parser settings
+        parser = argparse.ArgumentParser(prog="/aws_permissions", add_help=True, description="AWS Permissions Parser")
+        subparsers = parser.add_subparsers(dest='command', required=True)
+
+        # Grant Permissions
+        grant_parser = subparsers.add_parser("grant", help="Grant Permissions")
+        grant_parser.add_argument("-s", "--service", help="AWS Service", required=True, action="extend", nargs="+")
+        grant_parser.add_argument("-p", "--permission", help="Permission", required=True, action="extend", nargs="+")
+        grant_parser.add_argument("-a", "--account", help="AWS Account", required=True)
+        grant_parser.add_argument("-r", "--resource", help="Resource Name", required=True, action="extend", nargs="+")
+        grant_parser.add_argument("-o", "--on-behalf", help="On Behalf", required=False)
+        grant_parser.add_argument("-ps", "--permission-set-name", help="Permission Set Name", required=False)
+        grant_parser.add_argument("-e", "--expires", help="Expiry, e.g. 12h, 7d or 2026-11-01", required=False)
+        grant_parser.set_defaults(prefix=None, match=None, limit=None, details=False)
+
+        # List Resources
+        list_parser = subparsers.add_parser("list", help="List Permissions")
+        list_parser.add_argument("-s", "--service", help="AWS Service", required=True)
+        list_parser.add_argument("-a", "--account", help="AWS Account", required=True)
+        list_parser.add_argument("--prefix", help="Resource name prefix", required=False)
+        list_parser.add_argument("--match", help="Resource name glob, e.g. *-prod-*", required=False)
+        list_parser.add_argument("--limit", help="Maximum number of resources", required=False, type=int)
+        list_parser.add_argument("--details", help="Region, encryption, owner and tags", required=False, action="store_true")
+        list_parser.set_defaults(resource=None, permission=None, on_behalf=None, permission_set_name=None, expires=None)
+
+        # Help
+        subparsers.add_parser("help", help="Help")
+        try:
+            # argparse prints the usage error and exits, the user gets it in Slack instead
+            with contextlib.redirect_stderr(io.StringIO()) as usage_error, contextlib.redirect_stdout(usage_error):
+                args = parser.parse_args(command.split(" "))
+        except SystemExit:
+            logger.error("Invalid command: {}".format(usage_error.getvalue()))
+            return respond(
+                response_url,
+                "AWS Permissions bot Error - Invalid command, use /aws_permissions help\n```{}```".format(
+                    usage_error.getvalue().strip()
+                )
+            )
+    Tracing.current_trace().command = args.command
 
     # Help command - return help message
     if args.command == "help":
         logger.info("Username: {} - asked Help".format(user_name))
-        SlackHandler.response_to_slack(
+        return respond(
             response_url,
             """```
-            /aws_permissions list -s s3|sqs -a <account>\n
-            /aws_permissions grant -s s3|sqs -p <permission> -a <account> -r <resource> -o <on-behalf> -ps <permission-set-name>\n
+            /aws_permissions list -s s3|sqs -a <account> --prefix <prefix> --match <glob> --limit <limit> --details\n
+            /aws_permissions grant -s s3|sqs -p <permission> -a <account> -r <resource> -o <on-behalf> -ps <permission-set-name> -e <expiry>\n
+            /aws_permissions grant -s s3|sqs [s3|sqs ...] -p <permission> [<permission> ...] -a <account> -r <resource> [<resource> ...]\n
+            /aws_permissions status <request-id>\n
             -s, --service: AWS Service\n
             -p, --permission: Permission\n
             -a, --account: AWS Account\n
-            -r, --resource: Resource Name\n
+            -r, --resource: Resource Name, repeat -s/-p/-r to grant several permissions in one pull request\n
             -o, --on-behalf: On Behalf\n
             -ps, --permission-set-name: Permission Set Name\n
+            -e, --expires: Remove the permission after a duration (30m, 12h, 7d, 2w) or on a UTC date (2026-11-01)\n
+            --prefix, --match, --limit: List only the resources with this name prefix, matching this glob, up to this limit\n
+            --details: List the region, encryption, owner and tags of every resource\n
             examples:\n\t
                 /aws_permissions list -s s3|sqs -a account_name\n\t
+                /aws_permissions list -s s3 -a account_name --match *-logs --limit 20\n\t
+                /aws_permissions list -s s3 -a account_name --prefix data- --details\n\t
                 /aws_permissions grant -s s3|sqs -p write -a <account_name> -r <bucket_name>\n\t
-                /aws_permissions grant -s s3|sqs -p write -a <account_name> -r <bucket_name> -o <on-behalf-user-name> -ps <permission-set-name>
+                /aws_permissions grant -s s3|sqs -p write -a <account_name> -r <bucket_name> -o <on-behalf-user-name> -ps <permission-set-name>\n\t
+                /aws_permissions grant -s s3 -p read -a <account_name> -r <bucket_name> <bucket_name> <bucket_name>\n\t
+                /aws_permissions grant -s s3 -p read -a <account_name> -r <bucket_name> -e 7d
             ```""")
-        return {"statusCode": 200}
 
     logger.info("User Name: {}".format(user_name))
     logger.info("Command: {}".format(command))
@@ -90,15 +257,18 @@ def lambda_handler(event, context):
     logger.info("On-Behalf: {}".format(args.on_behalf))
     logger.info("Permission: {}".format(args.permission))
     logger.info("Permission Set Name: {}".format(args.permission_set_name))
+    logger.info("Expires: {}".format(args.expires))
+    logger.info("Prefix: {} - Match: {} - Limit: {} - Details: {}".format(args.prefix, args.match, args.limit, args.details))
 
     aws_connector = AWSHandler.AWSConnector(args.account)
     if aws_connector.account_id is None:
         logger.error("Account not found")
-        SlackHandler.response_to_slack(
+        return respond(
             response_url,
-            "AWS Permissions bot Error - Account Not found"
+            "AWS Permissions bot Error - Account Not found{}".format(
+                did_you_mean(aws_connector.suggest_accounts(args.account))
+            )
         )
-        return {"statusCode": 200}
 
     logger.info("Account ID: {}".format(aws_connector.account_id))
 
@@ -110,11 +280,10 @@ def lambda_handler(event, context):
 
     if not(okta_token and github_token and pager_duty_token and jira_credentials):
         logger.error("Failed to read secrets, please contact the security team")
-        SlackHandler.response_to_slack(
+        return respond(
             response_url,
             "AWS Permissions bot Error - Failed to read secrets, please contact the security team"
         )
-        return {"statusCode": 200}
 
     if args.on_behalf:
         user_name = args.on_behalf
@@ -125,157 +294,1049 @@ def lambda_handler(event, context):
     okta_connector = OktaHandler.OktaConnector(token=okta_token, organization_name=okta_organization_name)
     aws_groups = okta_connector.get_user_aws_groups(email_address="{}@{}".format(user_name, domain))
 
+    # The environment files of every group, from one cached Git Trees call
+    environment_tree = None
+    if args.command == "grant" and aws_groups:
+        environment_tree = build_github_connector(github_token).read_environment_tree(
+            ttl_seconds=int(os.getenv("GITHUB_TREE_CACHE_TTL_SECONDS", "60"))
+        )
+
     # Check if user is allowed to perform queries to AWS
+    # with the environment tree, use the only group with a file for the account
     # if the user assigned to multiple groups, ask for permission set
     # if the user assigned to one group, use it
     # if the user not assigned to any group, return error
-    if aws_groups is not None:
+    if aws_groups and environment_tree is not None:
+        group_names = account_group_names(aws_groups, args.account, args.permission_set_name, environment_tree)
+        if not group_names:
+            logger.error("Account not found in the requested group, please contact the security team for more information")
+            return respond(
+                response_url,
+                "AWS Permissions bot Error - No permissions set found, please contact the security team for more information"
+            )
+        if len(group_names) > 1:
+            logger.error("Multiple permission sets found, please specify a permission set")
+            return respond(
+                response_url,
+                "AWS Permissions bot Error - Multiple permission sets found, please specify a permission set name - {}".format(
+                    ", ".join(group_names)
+                )
+            )
+        okta_group = group_names[0]
+    elif aws_groups is not None:
         if len(aws_groups) > 1 and args.permission_set_name is None:
             logger.error("Multiple permission sets found, please specify a permission set")
-            SlackHandler.response_to_slack(
+            return respond(
                 response_url,
                 "AWS Permissions bot Error - Multiple permission sets found, please specify a permission set name"
             )
-            return {"statusCode": 200}
         elif len(aws_groups) > 1 and args.permission_set_name is not None:
             for group in aws_groups:
                 if set(group.split("_")).intersection(set(args.permission_set_name.split("_"))):
                     okta_group = group
         elif len(aws_groups) == 0:
             logger.error("User not allowed to perform queries to AWS")
-            SlackHandler.response_to_slack(
+            return respond(
                 response_url,
                 "AWS Permissions bot Error - User not allowed to perform queries to AWS"
             )
-            return {"statusCode": 200}
         else:
             okta_group = aws_groups[0].replace("aws_", "")
 
     logger.info("Okta Group: {}".format(okta_group))
 
-    if args.service == "s3":
-        resources = aws_connector.list_s3_buckets()
-    elif args.service == "sqs":
-        resources = aws_connector.list_sqs_queues()
-    else:
-        logger.error("Cannot list for the requested service, please reach out to the security team for more information")
-        SlackHandler.response_to_slack(
-            response_url,
-            "AWS Permissions bot Error - Cannot list for the requested service, please reach out to the security team for more information"
+    # The grant pairs are checked before anything is listed
+    grants = []
+    if args.command == "grant":
+        grants = pair_grants(args.service, args.resource, args.permission)
+        if not grants:
+            logger.error("Services and permissions must be given once or once per resource")
+            return respond(
+                response_url,
+                "AWS Permissions bot Error - Services and permissions must be given once or once per resource"
+            )
+    expires_at = None
+    if args.expires:
+        if not os.getenv("GRANT_EXPIRIES_TABLE_NAME"):
+            logger.error("GRANT_EXPIRIES_TABLE_NAME is not set")
+            return respond(response_url, "AWS Permissions bot Error - Time-bound grants are not enabled")
+        expires_at = GrantExpiries.parse_expiry(args.expires)
+        max_expiry_days = int(os.getenv("GRANT_MAX_EXPIRY_DAYS", "90"))
+        if expires_at is None or expires_at > (
+                datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=max_expiry_days)):
+            logger.error("Invalid expiry - {}".format(args.expires))
+            return respond(
+                response_url,
+                "AWS Permissions bot Error - Invalid expiry {}, use a duration (30m, 12h, 7d, 2w) or a UTC date "
+                "(2026-11-01) within {} days".format(args.expires, max_expiry_days)
+            )
+
+    # List every requested service once, grants of the same service share the listing
+    services = [args.service] if args.command == "list" else args.service
+    # The list command is capped, the grant command validates against the full listing
+    resource_filter = None
+    if args.command == "list":
+        list_limit = min(args.limit or list_results_limit, LIST_RESULTS_MAX_LIMIT)
+        if args.details:
+            # Every resource of a detail listing costs a few API calls
+            list_limit = min(list_limit, list_details_limit)
+        resource_filter = ResourceFilter.ResourceFilter(
+            prefix=args.prefix,
+            match=args.match,
+            limit=max(1, list_limit)
         )
-        return {"statusCode": 200}
+    inventory = {}
+    with Tracing.span("inventory"):
+        for service_name in dict.fromkeys(services):
+            service_resources = snapshot_resources(args.account, service_name, resource_filter)
+            requested_resources = {resource_name for grant_service, resource_name, _ in grants if grant_service == service_name}
+            if service_resources is not None and not requested_resources.issubset(service_resources):
+                # The resource may have been created after the sweep
+                logger.info("Requested {} resources not in the inventory snapshot, listing them".format(service_name))
+                service_resources = None
+            if service_resources is None:
+                service_resources = list_resources(aws_connector, service_name, resource_filter, requested_resources)
+            if service_resources is None:
+                logger.error("Cannot list for the requested service, please reach out to the security team for more information")
+                return respond(
+                    response_url,
+                    "AWS Permissions bot Error - Cannot list for the requested service, please reach out to the security team for more information"
+                )
+            inventory[service_name] = service_resources
 
     # List command - return list of resources
     if args.command == "list":
+        resources = inventory[args.service]
         resource_string = ""
-        for resource in resources:
-            resource_string += resource + "\n"
+        if args.details and resources:
+            resource_details = aws_connector.describe_resources(
+                service_name=args.service,
+                resource_names=resources,
+                max_workers=int(os.getenv("LIST_DETAILS_CONCURRENCY", "16")),
+                ttl_seconds=int(os.getenv("LIST_DETAILS_CACHE_TTL_SECONDS", "300")),
+                owner_tag=os.getenv("LIST_DETAILS_OWNER_TAG", "owner")
+            )
+            for resource in resources:
+                resource_string += format_resource_details(resource, resource_details.get(resource)) + "\n"
+        else:
+            for resource in resources:
+                resource_string += resource + "\n"
         logger.info(resources)
-        SlackHandler.response_to_slack(response_url, "Resources:\n```{}```".format(resource_string))
-        return {"statusCode": 200}
+        if not resources:
+            return respond(response_url, "Resources:\nNo resources found")
+        if resource_filter.truncated:
+            return respond(
+                response_url,
+                "Resources (first {}, narrow the list with --prefix or --match):\n```{}```".format(
+                    len(resources),
+                    resource_string
+                )
+            )
+        return respond(response_url, "Resources:\n```{}```".format(resource_string))
 
     # Grant command - create a Jira ticket and a GitHub pull request
     if args.command == "grant":
-        if args.resource not in resources:
-            logger.error("Resource not found within the requested account")
-            SlackHandler.response_to_slack(
+        missing_resources = [
+            resource_name for service_name, resource_name, _ in grants
+            if resource_name not in inventory[service_name]
+        ]
+        if missing_resources:
+            logger.error("Resource not found within the requested account - {}".format(missing_resources))
+            resource_indexes = {}
+            missing_descriptions = []
+            for service_name, resource_name, _ in grants:
+                if resource_name in inventory[service_name]:
+                    continue
+                if service_name not in resource_indexes:
+                    resource_indexes[service_name] = FuzzyIndex.FuzzyIndex(inventory[service_name])
+                missing_descriptions.append("{}{}".format(
+                    resource_name,
+                    did_you_mean(resource_indexes[service_name].suggest(resource_name))
+                ))
+            return respond(
                 response_url,
-                "AWS Permissions bot Error - Resource not found within the requested account"
+                "AWS Permissions bot Error - Resource not found within the requested account - {}".format(
+                    ", ".join(missing_descriptions)
+                )
             )
-            return {"statusCode": 200}
-
-        # GitHub get user permissions for the requested account ID
-        github_connector = GithubHandler.GithubConnector(
-            token=github_token,
-            owner=github_owner,
-            terraform_environment_repository_name=github_terraform_environment_repository_name,
-            terraform_module_repository_name=github_terraform_module_repository_name,
-            terraform_environment_sso_account_path=github_terraform_environment_sso_account_path
+
+        StatusReporter.report("AWS Permissions bot status - Validated {} in {}, reading the Terraform files".format(
+            ", ".join(resource_name for _, resource_name, _ in grants),
+            args.account
+        ))
+
+        # Identical concurrent grants share one Bedrock call, one pull request and one Jira ticket
+        single_flight = Coalescing.get_single_flight(table_name=os.getenv("STATUS_TABLE_NAME"))
+        coalescing_key = Coalescing.grant_key(okta_group, args.account, grants, expires_at=expires_at)
+        if not single_flight.acquire(coalescing_key):
+            logger.info("Identical grant in progress, waiting for its result - {}".format(coalescing_key))
+            StatusReporter.report("AWS Permissions bot status - An identical request is in progress, waiting for its result")
+            # A short wait, a follower must not hold a concurrency slot for the whole run of the leader
+            coalesced_message = single_flight.wait(
+                coalescing_key,
+                timeout_seconds=max(0, min(
+                    coalescing_wait_seconds,
+                    context.get_remaining_time_in_millis() / 1000 - coalescing_margin_seconds
+                ))
+            )
+            if coalesced_message:
+                return respond(response_url, coalesced_message)
+            if not single_flight.acquire(coalescing_key):
+                logger.info("Identical grant still in progress - {}".format(coalescing_key))
+                response = respond(
+                    response_url,
+                    "AWS Permissions bot - An identical request is in progress, run the command again in a few "
+                    "minutes to get its pull request"
+                )
+                # Not completed, the queued job is recorded as coalesced
+                response["coalesced"] = True
+                return response
+
+        response = {}
+        try:
+            response = grant_permissions(
+                grants=grants,
+                account_name=args.account,
+                user_name=user_name,
+                okta_group=okta_group,
+                aws_connector=aws_connector,
+                github_token=github_token,
+                pager_duty_token=pager_duty_token,
+                jira_credentials=jira_credentials,
+                response_url=response_url,
+                environment_file_sha=(environment_tree or {}).get(okta_group, {}).get(args.account),
+                expires_at=expires_at
+            )
+        finally:
+            if response.get("body", "").startswith("AWS Permissions bot - "):
+                single_flight.complete(coalescing_key, response.get("body"))
+            else:
+                single_flight.abandon(coalescing_key)
+        return response
+
+
+def build_inventory_index() -> dict:
+    """
+    Sweeps every account of every organization in parallel and writes the inventory snapshot of every organization
+    to INVENTORY_BUCKET, for the SlackInteractive options handler and the resource validation of the list and grant
+    commands.
+    """
+    bucket = os.getenv("INVENTORY_BUCKET")
+    if not bucket:
+        logger.error("INVENTORY_BUCKET is not set")
+        return {"statusCode": 500, "body": "INVENTORY_BUCKET is not set"}
+    sweeper = InventorySweeper.InventorySweeper(
+        services=SUPPORTED_SERVICES,
+        max_workers=int(os.getenv("INVENTORY_SWEEP_CONCURRENCY", "16"))
+    )
+    accounts, resources = sweeper.sweep()
+    if not resources:
+        # Keep the previous snapshot rather than replacing it with an empty one
+        logger.error("Inventory sweep listed no account - {}".format(sweeper.stats))
+        return {"statusCode": 500, "body": "Inventory sweep listed no account"}
+    account_organizations = Organizations.merged_accounts(
+        ttl_seconds=int(os.getenv("AWS_ACCOUNTS_CACHE_TTL_SECONDS", "300"))
+    )
+    for organization in Organizations.get_organizations():
+        organization_accounts = {
+            account_name: account_id for account_name, account_id in accounts.items()
+            if account_organizations.get(account_name, ("",))[0] == organization.name
+        }
+        if not any(account_name in resources for account_name in organization_accounts):
+            logger.error("Inventory sweep listed no account of {}, its snapshot is kept".format(organization.name))
+            continue
+        organization_resources = {
+            account_name: resources[account_name] for account_name in organization_accounts if account_name in resources
+        }
+        organization_failed_accounts = [
+            account_name for account_name in sweeper.stats.get("failed_accounts") if account_name in organization_accounts
+        ]
+        index = InventoryIndex.InventoryIndex(InventoryIndex.InventoryIndex.build_snapshot(
+            organization_accounts,
+            organization_resources,
+            sweep=dict(sweeper.stats, failed_accounts=organization_failed_accounts)
+        ))
+        if not index.save(bucket, organization.inventory_key):
+            return {"statusCode": 500, "body": "Failed to write the inventory snapshot of {}".format(organization.name)}
+    message = "Inventory snapshot written - {} accounts, {} failed".format(
+        sweeper.stats.get("accounts"),
+        len(sweeper.stats.get("failed_accounts"))
+    )
+    logger.info(message)
+    return {"statusCode": 200, "body": message}
+
+
+def preload():
+    """
+    Imports the connector modules and creates the AWS clients, without any API call.
+
+    Runs in the init phase when INIT_PRELOAD is set, the init phase has the full CPU of the function
+    before the first invocation is billed.
+    """
+    if PRELOAD_STATE["done"]:
+        return
+    for module in (AWSHandler, OktaHandler, GithubHandler, JiraHandler, PagerDutyHandler, ResourceFilter,
+                   FuzzyIndex, InventoryIndex, TerraformPatch, Coalescing, JobQueue, BedrockRouter, Organizations,
+                   GrantExpiries):
+        module.load()
+    AWSHandler.AWSConnector.preload_clients(
+        secret_arns=[os.getenv(name) for name in SECRET_ARN_VARIABLES if os.getenv(name)]
+    )
+    BedrockRouter.BedrockRouter().preload_clients()
+    PRELOAD_STATE["done"] = True
+
+
+def warm_up() -> dict:
+    """
+    Fills the container caches ahead of the user requests - the AWS clients, the account and organizational
+    unit maps, the secrets, the environment tree, the module files and the inventory snapshot.
+
+    Sent by the warm-up schedule, a cache that is still fresh is not read again.
+    """
+    preload()
+    aws_connector = AWSHandler.AWSConnector("", resolve_ou=False)
+    account_ous = aws_connector.map_organizational_units()
+    secrets = {name: aws_connector.get_secret_from_secrets_mangers(key=os.getenv(name)) for name in SECRET_ARN_VARIABLES}
+    if not all(secrets.values()):
+        logger.error("Warm up failed to read secrets")
+        return {"statusCode": 500, "body": "Warm up failed to read secrets"}
+    github_connector = build_github_connector(secrets.get("SECRETS_MANAGER_GITHUB_TOKEN_ARN"))
+    environment_tree = github_connector.read_environment_tree(
+        ttl_seconds=int(os.getenv("GITHUB_TREE_CACHE_TTL_SECONDS", "60"))
+    )
+    module_files = github_connector.read_module_files(
+        module_path=os.getenv("TERRAFORM_MODULE_SSO_PATH"),
+        ttl_seconds=int(os.getenv("GITHUB_MODULE_CACHE_TTL_SECONDS", "300"))
+    )
+    index = InventoryIndex.load_configured_index()
+    message = "Warmed up - {} accounts, {} in organizational units, {} groups, module files {}, inventory snapshot {}".format(
+        len(aws_connector.aws_accounts),
+        len(account_ous),
+        len(environment_tree or {}),
+        "read" if module_files else "missing",
+        "loaded" if index is not None else "missing"
+    )
+    logger.info(message)
+    return {"statusCode": 200, "body": message}
+
+
+def expire_grants() -> dict:
+    """
+    Removes the time-bound grants due by now plus GRANT_EXPIRY_WINDOW_SECONDS from the environment files.
+
+    Sent by the expiry schedule. The due grants of an environment file are removed together, in one commit,
+    one pull request and one Jira ticket assigned to the security on call, so a run costs one pull request per
+    environment file touched however many grants expired. The grants are removed from their module variables
+    without Bedrock. A grant whose pull request is not merged yet, or that is not found in the file, is kept in
+    the expiry table and logged as an error for the security team, a grant whose pull request was closed without
+    merging is dropped. An environment file left over by the request deadline or a failure is revoked by the next run.
+
+    A revoked grant stays in the expiry table as revoking until its revocation pull request is merged, every run
+    deletes the grants of the merged revocations and revokes again the grants of the closed ones.
+    """
+    expiry_store = GrantExpiries.ExpiryStore(table_name=os.getenv("GRANT_EXPIRIES_TABLE_NAME"))
+    until = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        seconds=int(os.getenv("GRANT_EXPIRY_WINDOW_SECONDS", "0"))
+    )
+    revoking_grants = expiry_store.revoking()
+    due_grants = expiry_store.due(until)
+    if due_grants is None or revoking_grants is None:
+        return {"statusCode": 500, "body": "Failed to read the grant expiries"}
+    if not due_grants and not revoking_grants:
+        return {"statusCode": 200, "body": "No grant to expire"}
+    logger.info("{} grants to expire in {} environment files, {} revocations to check".format(
+        sum(len(records) for records in due_grants.values()),
+        len(due_grants),
+        len(set(record["revocation"] for records in revoking_grants.values() for record in records))
+    ))
+
+    secrets = {
+        name: AWSHandler.AWSConnector.get_secret_from_secrets_mangers(key=os.getenv(name))
+        for name in ("SECRETS_MANAGER_GITHUB_TOKEN_ARN", "SECRETS_MANAGER_PD_TOKEN_ARN", "SECRETS_MANAGER_JIRA_TOKEN_ARN")
+    }
+    if not all(secrets.values()):
+        logger.error("Grant expiry failed to read secrets")
+        return {"statusCode": 500, "body": "Grant expiry failed to read secrets"}
+    github_connector = build_github_connector(secrets.get("SECRETS_MANAGER_GITHUB_TOKEN_ARN"))
+    module_files = github_connector.read_module_files(
+        module_path=os.getenv("TERRAFORM_MODULE_SSO_PATH"),
+        ttl_seconds=int(os.getenv("GITHUB_MODULE_CACHE_TTL_SECONDS", "300"))
+    )
+    if not module_files:
+        logger.error("Module files not found")
+        return {"statusCode": 500, "body": "Module files not found"}
+
+    pull_request_states = {}
+    revoked_grants, failed_files = settle_revocations(
+        revoking_grants,
+        github_connector,
+        expiry_store,
+        pull_request_states,
+        due_grants
+    )
+    if not due_grants:
+        message = "Revoked grants of {} environment files - {} grants revoked, {} failed".format(
+            len(revoking_grants),
+            revoked_grants,
+            len(failed_files)
         )
+        logger.info(message)
+        return {"statusCode": 500 if failed_files else 200, "body": message}
+
+    # One assignee for every revocation ticket of the run
+    jira_credentials = json.loads(secrets.get("SECRETS_MANAGER_JIRA_TOKEN_ARN"))
+    jira_connector = JiraHandler.JiraConnector(
+        user=jira_credentials.get("username"),
+        token=jira_credentials.get("token"),
+        jira_organization_name=os.getenv("JIRA_ORGANIZATION_NAME")
+    )
+    security_on_call_email_address = PagerDutyHandler.PagerDutyConnector(
+        token=secrets.get("SECRETS_MANAGER_PD_TOKEN_ARN")
+    ).get_on_call_email_address(schedule_ids=os.getenv("PAGER_DUTY_SCHEDULE_ID"))
+    assignee_id = jira_connector.get_user_id_by_email_address(email_address=security_on_call_email_address)
+    if not assignee_id:
+        logger.error("Assignee ID was not found")
+        return {"statusCode": 500, "body": "Assignee ID was not found"}
+
+    pull_requests = []
+    kept_grants = 0
+    for file_name, records in sorted(due_grants.items()):
+        try:
+            revocation = revoke_file_grants(
+                file_name=file_name,
+                records=records,
+                github_connector=github_connector,
+                jira_connector=jira_connector,
+                assignee_id=assignee_id,
+                expiry_store=expiry_store,
+                module_files=module_files,
+                pull_request_states=pull_request_states
+            )
+        except Resilience.DependencyUnavailable as e:
+            logger.error("Expired grants of {} were not revoked: {}".format(file_name, e))
+            failed_files.append(file_name)
+            continue
+        kept_grants += revocation.get("kept")
+        if revocation.get("pull_request"):
+            pull_requests.append(revocation.get("pull_request"))
+        if revocation.get("failed"):
+            failed_files.append(file_name)
+    message = "Expired grants of {} environment files - {} pull requests, {} failed, {} kept for review, {} revoked".format(
+        len(due_grants),
+        len(pull_requests),
+        len(set(failed_files)),
+        kept_grants,
+        revoked_grants
+    )
+    logger.info(message)
+    return {"statusCode": 500 if failed_files else 200, "body": message}
+
+
+def settle_revocations(
+        revoking_grants: dict,
+        github_connector,
+        expiry_store,
+        pull_request_states: dict,
+        due_grants: dict
+) -> tuple:
+    """
+    Checks the revocation pull requests of the revoking grants: the grants of a merged one are deleted from the
+    expiry table, the grants of a closed one are moved back to pending and added to due_grants to be revoked
+    again, the grants of an open one wait for the next run.
+
+    Returns the number of revoked grants and the environment files that failed.
+    """
+    revoked_grants = 0
+    failed_files = []
+    for file_name, records in sorted(revoking_grants.items()):
+        try:
+            for record in records:
+                if record["revocation"] not in pull_request_states:
+                    pull_request_states[record["revocation"]] = github_connector.read_pull_request_state(
+                        record["revocation"]
+                    )
+        except Resilience.DependencyUnavailable as e:
+            logger.error("Revocations of {} were not checked: {}".format(file_name, e))
+            failed_files.append(file_name)
+            continue
+        merged_records = [record for record in records if pull_request_states.get(record["revocation"]) == "merged"]
+        closed_records = [record for record in records if pull_request_states.get(record["revocation"]) == "closed"]
+        if merged_records:
+            if expiry_store.delete(file_name, merged_records):
+                revoked_grants += len(merged_records)
+            else:
+                failed_files.append(file_name)
+        if closed_records:
+            logger.error("Revocation pull requests of {} closed without merging, revoking again - {}".format(
+                file_name,
+                ", ".join(
+                    "{} ({})".format("|".join(record["grant"]), record["revocation"]) for record in closed_records
+                )
+            ))
+            if expiry_store.mark(file_name, closed_records, GrantExpiries.STATUS_PENDING):
+                due_grants.setdefault(file_name, []).extend(
+                    dict(record, revocation="") for record in closed_records
+                )
+            elif file_name not in failed_files:
+                failed_files.append(file_name)
+        waiting_records = len(records) - len(merged_records) - len(closed_records)
+        if waiting_records:
+            logger.info("{} revoked grants of {} wait for their revocation pull request".format(
+                waiting_records,
+                file_name
+            ))
+    return revoked_grants, failed_files
+
 
-        # Read the environment file for the requested account
-        environment_file = github_connector.read_file_content(
-            repository_name=github_terraform_environment_repository_name,
-            file_path="{}/{}/{}.tf".format(github_terraform_environment_sso_account_path, okta_group, args.account)
+def settle_grant_expiries(
+        okta_group: str,
+        account_name: str,
+        granted_variables: dict,
+        existing_grants,
+        expires_at
+) -> str:
+    """
+    Updates the pending expiries of grants given again: a permanent request removes the expiry of the grants of
+    the same resource and variable, a time-bound request moves an earlier expiry to its own.
+
+    granted_variables maps the (service, resource, permission) tuples to the variable that gives them. Returns the
+    Slack message suffix, empty if no expiry changed or time-bound grants are not enabled.
+    """
+    if not os.getenv("GRANT_EXPIRIES_TABLE_NAME"):
+        return ""
+    expiry_store = GrantExpiries.ExpiryStore(table_name=os.getenv("GRANT_EXPIRIES_TABLE_NAME"))
+    pending_grants = expiry_store.pending(
+        okta_group,
+        account_name,
+        [(service_name, resource_name) for service_name, resource_name, _ in granted_variables]
+    )
+    if pending_grants is None:
+        logger.error("Grant expiries were not read")
+        return ", the expiry of the existing grants could not be checked, please contact the security team"
+    settled_records = [
+        record for grant, record in pending_grants.items()
+        if any(
+            grant[:2] == granted[:2] and variable and existing_grants.grant_variable(grant[0], grant[2]) == variable
+            for granted, variable in granted_variables.items()
         )
-        environment_file_content = environment_file[0]
-        if not environment_file_content:
-            logger.error("Account not found in the requested group, please contact the security team for more information")
-            SlackHandler.response_to_slack(
-                response_url,
-                "AWS Permissions bot Error - No permissions set found, please contact the security team for more information")
-            return {"statusCode": 200}
-
-        # Read the module files for the requested service
-        module_data_file_content = github_connector.read_file_content(
-            repository_name=github_terraform_module_repository_name,
-            file_path="{}/data.tf".format(github_terraform_module_sso_path)
-        )[0]
-        module_data_main_content = github_connector.read_file_content(
-            repository_name=github_terraform_module_repository_name,
-            file_path="{}/main.tf".format(github_terraform_module_sso_path)
-        )[0]
-        module_data_variables_content = github_connector.read_file_content(
-            repository_name=github_terraform_module_repository_name,
-            file_path="{}/variables.tf".format(github_terraform_module_sso_path)
-        )[0]
-        if not (module_data_file_content and module_data_main_content and module_data_variables_content):
-            logger.error("Module files not found, please contact the security team for more information")
-            SlackHandler.response_to_slack(
-                response_url,
-                "AWS Permissions bot Error - Module files not found, please contact the security team for more information")
-            return {"statusCode": 200}
+    ]
+    if expires_at is None:
+        if not settled_records:
+            return ""
+        if not expiry_store.delete("{}/{}".format(okta_group, account_name), settled_records):
+            return ", the expiry of the existing grants could not be removed, please contact the security team"
+        logger.info("Grant expiries removed - {}".format([record["grant"] for record in settled_records]))
+        return ", the expiry of {} was removed".format(", ".join(record["grant"][1] for record in settled_records))
+    extended_records = [record for record in settled_records if record["expires_at"] < expires_at.timestamp()]
+    for record in extended_records:
+        if not expiry_store.record(
+            okta_group,
+            account_name,
+            [record["grant"]],
+            expires_at,
+            record["user_name"],
+            record["pull_request"]
+        ):
+            return ", the expiry of the existing grants could not be extended, please contact the security team"
+    if not extended_records:
+        return ""
+    logger.info("Grant expiries extended - {}".format([record["grant"] for record in extended_records]))
+    return ", the expiry of {} was extended to {}".format(
+        ", ".join(record["grant"][1] for record in extended_records),
+        expires_at.strftime("%Y-%m-%d %H:%M UTC")
+    )
 
-        # Get Bedrock response
-        aws_bedrock_prompt = """
-            Add {} permission to the {} resource named "{}" located in "{}" organization path 
-            Terraform module:
-            {}
-            {}
-            {}
-            Terraform environment file:
-            {}
-        """.format(
-            args.permission,
-            args.service,
-            args.resource,
-            aws_connector.account_ou,
-            base64.b64decode(module_data_variables_content).decode("utf-8"),
-            base64.b64decode(module_data_file_content).decode("utf-8"),
-            base64.b64decode(module_data_main_content).decode("utf-8"),
-            base64.b64decode(environment_file_content).decode("utf-8")
+
+def revoke_file_grants(
+        file_name: str,
+        records: list,
+        github_connector,
+        jira_connector,
+        assignee_id: str,
+        expiry_store,
+        module_files: dict,
+        pull_request_states: dict
+) -> dict:
+    """
+    Revokes the due grants of one environment file ("<group>/<account>") in one pull request and one Jira ticket.
+
+    Only the grants of a merged pull request are in the file. The grants of a pull request still open (or whose
+    state cannot be read) and the grants not found in the file are kept in the expiry table and logged as errors,
+    the grants of a pull request closed without merging were never given and are dropped. Once the revocation
+    pull request is open, the revoked grants are marked revoking with it even if the Jira ticket fails, so the
+    next run does not open another pull request. pull_request_states caches the pull request states of the run.
+
+    Returns {"pull_request": the revocation pull request or "", "kept": the grants kept, "failed": bool}, raises
+    Resilience.DependencyUnavailable if GitHub is unavailable before the pull request is open.
+    """
+    group_name, _, account_name = file_name.partition("/")
+    for record in records:
+        if record["pull_request"] not in pull_request_states:
+            pull_request_states[record["pull_request"]] = github_connector.read_pull_request_state(record["pull_request"])
+    merged_records = [record for record in records if pull_request_states.get(record["pull_request"]) == "merged"]
+    closed_records = [record for record in records if pull_request_states.get(record["pull_request"]) == "closed"]
+    unmerged_records = [record for record in records if record not in merged_records and record not in closed_records]
+    if unmerged_records:
+        logger.error("Expired grants of {} not revoked, their pull request is not merged - {}".format(
+            file_name,
+            ", ".join("{} ({})".format("|".join(record["grant"]), record["pull_request"]) for record in unmerged_records)
+        ))
+    if closed_records:
+        logger.info("Expired grants of {} never merged, dropping them - {}".format(
+            file_name,
+            [record["grant"] for record in closed_records]
+        ))
+    revocation = {"pull_request": "", "kept": len(unmerged_records), "failed": False}
+    revoked_records = []
+    if merged_records:
+        environment_file_content, environment_file_sha = github_connector.read_file_content(
+            repository_name=os.getenv("TERRAFORM_ENVIRONMENT_REPOSITORY_NAME"),
+            file_path="{}/{}.tf".format(os.getenv("TERRAFORM_ENVIRONMENT_SSO_ACCOUNT_PATH"), file_name)
+        )
+        environment_file_text = decode_file_content(environment_file_content)
+        if not environment_file_text:
+            logger.error("Environment file {} not found".format(file_name))
+            revocation["kept"] += len(merged_records)
+            revocation["failed"] = True
+            return revocation
+        environment_grants = EnvironmentGrants.EnvironmentGrants(
+            environment_file_text,
+            [module_files.get("variables"), module_files.get("data"), module_files.get("main")]
+        )
+        new_environment_file_text, removed_grants, missing_grants = environment_grants.remove_grants(
+            environment_file_text,
+            [record["grant"] for record in merged_records]
         )
-        aws_bedrock_response = aws_connector.aws_bedrock(prompt=aws_bedrock_prompt)
-        # Create a GitHub pull request
-        github_pull_request_url = github_connector.create_full_request(
+        if missing_grants:
+            # Removed by hand or listed under another variable, the security team revokes them
+            logger.error("Expired grants not found in {}, please revoke them - {}".format(file_name, missing_grants))
+            revocation["kept"] += len(missing_grants)
+        if removed_grants:
+            github_pull_request_url = github_connector.create_full_request(
+                group_name=group_name,
+                account_name=account_name,
+                new_content=new_environment_file_text,
+                service_name="+".join(dict.fromkeys(service_name for service_name, _, _ in removed_grants)),
+                user_name="+".join(dict.fromkeys(
+                    record["user_name"] for record in merged_records if record["grant"] in removed_grants
+                )),
+                permission="+".join(dict.fromkeys(permission for _, _, permission in removed_grants)),
+                resource_name="{}_and_{}_more".format(removed_grants[0][1], len(removed_grants) - 1)
+                if len(removed_grants) > 1 else removed_grants[0][1],
+                grants=removed_grants,
+                file_sha=environment_file_sha,
+                revoke=True
+            )
+            if not github_pull_request_url:
+                logger.error("Revocation pull request of {} was not created".format(file_name))
+                revocation["kept"] += len(removed_grants)
+                revocation["failed"] = True
+            else:
+                revocation["pull_request"] = github_pull_request_url
+                revoked_records = [record for record in merged_records if record["grant"] in removed_grants]
+                users = {record["grant"]: record["user_name"] for record in revoked_records}
+                jira_issue_key = ""
+                try:
+                    jira_issue_key = jira_connector.create_new_issue(
+                        payload=JiraHandler.JiraConnector.build_revocation_ticket(
+                            project_key=os.getenv("JIRA_PROJECT_KEY"),
+                            issue_type=os.getenv("JIRA_ISSUE_TYPE"),
+                            assignee_id=assignee_id,
+                            account_name=account_name,
+                            grants=[grant + (users.get(grant),) for grant in removed_grants],
+                            github_pull_request_url=github_pull_request_url
+                        )
+                    )
+                except Resilience.DependencyUnavailable as e:
+                    logger.error("Request degraded, the pull request is open: {}".format(e))
+                if not jira_issue_key:
+                    # The pull request is open, revoking again would open another one
+                    logger.error("Revocation Jira task of {} was not created".format(github_pull_request_url))
+                logger.info("Expired grants of {} - pull request {} - Jira task {}".format(
+                    file_name,
+                    github_pull_request_url,
+                    jira_issue_key
+                ))
+    if revoked_records and not expiry_store.mark(
+        file_name,
+        revoked_records,
+        GrantExpiries.STATUS_REVOKING,
+        revocation_url=revocation["pull_request"]
+    ):
+        revocation["failed"] = True
+    if closed_records and not expiry_store.delete(file_name, closed_records):
+        revocation["failed"] = True
+    return revocation
+
+
+def snapshot_resources(account_name: str, service_name: str, resource_filter=None):
+    """
+    Lists the resources of a service from the inventory snapshot, filtered by a ResourceFilter.
+
+    Returns None if no snapshot is configured, it is older than INVENTORY_MAX_AGE_SECONDS, or the account
+    was not swept, the resources are then listed live.
+    """
+    account_organization = Organizations.merged_accounts(
+        ttl_seconds=int(os.getenv("AWS_ACCOUNTS_CACHE_TTL_SECONDS", "300"))
+    ).get(account_name, ("",))
+    index = InventoryIndex.load_configured_index(organization_name=account_organization[0])
+    if index is None or index.age_seconds() > int(os.getenv("INVENTORY_MAX_AGE_SECONDS", "7200")):
+        return None
+    resource_filter = resource_filter or ResourceFilter.ResourceFilter()
+    names = index.resource_names(account_name, service_name, prefix=resource_filter.api_prefix)
+    if names is None:
+        return None
+    if not resource_filter.active:
+        return names
+    if not resource_filter.empty:
+        resource_filter.add(names)
+    return resource_filter.resources
+
+
+def build_github_connector(github_token: str):
+    """
+    Returns a GitHub connector for the configured environment and module repositories.
+    """
+    return GithubHandler.GithubConnector(
+        token=github_token,
+        owner=os.getenv("GITHUB_OWNER"),
+        terraform_environment_repository_name=os.getenv("TERRAFORM_ENVIRONMENT_REPOSITORY_NAME"),
+        terraform_module_repository_name=os.getenv("TERRAFORM_MODULE_REPOSITORY_NAME"),
+        terraform_environment_sso_account_path=os.getenv("TERRAFORM_ENVIRONMENT_SSO_ACCOUNT_PATH")
+    )
+
+
+def decode_file_content(content: str) -> str:
+    """
+    Decodes the base64 content of a GitHub REST file read, empty string if the read failed.
+    """
+    if not content:
+        return ""
+    return base64.b64decode(content).decode("utf-8")
+
+
+def account_group_names(aws_groups: list, account_name: str, permission_set_name, environment_tree: dict) -> list:
+    """
+    Returns the group directories of the user with an environment file for the account.
+
+    With a permission set name, the directory named after it wins, then the directories sharing an underscore
+    separated token with it.
+    """
+    group_names = [
+        group_name for group_name in dict.fromkeys(group.replace("aws_", "") for group in aws_groups)
+        if account_name in environment_tree.get(group_name, {})
+    ]
+    if not permission_set_name or len(group_names) < 2:
+        return group_names
+    exact_names = [name for name in group_names if permission_set_name in (name, "aws_{}".format(name))]
+    if exact_names:
+        return exact_names
+    tokens = set(permission_set_name.split("_"))
+    return [name for name in group_names if tokens.intersection(name.split("_"))] or group_names
+
+
+def list_resources(aws_connector, service_name: str, resource_filter=None, required_names=()):
+    """
+    Lists the resources of a supported service, filtered by a ResourceFilter, None for an unsupported service.
+    The required names (the requested resources of a grant) are listed live if the inventory aggregator misses them.
+    """
+    if service_name == "s3":
+        return aws_connector.list_s3_buckets(resource_filter, required_names)
+    if service_name == "sqs":
+        return aws_connector.list_sqs_queues(resource_filter, required_names)
+    return None
+
+
+def format_resource_details(resource_name: str, details: dict) -> str:
+    """
+    Formats a resource of a detail listing, "<name> - region: ..., encryption: ..., owner: ..., tags: k=v, ...".
+    """
+    if not details:
+        return "{} - details unavailable".format(resource_name)
+    return "{} - region: {}, encryption: {}, owner: {}, tags: {}".format(
+        resource_name,
+        details.get("region"),
+        details.get("encryption"),
+        details.get("owner") or "-",
+        ", ".join("{}={}".format(key, value) for key, value in sorted(details.get("tags", {}).items())) or "-"
+    )
+
+
+def did_you_mean(suggestions: list) -> str:
+    """
+    Formats the suggestions for a misspelled name, empty string if there are none.
+    """
+    if not suggestions:
+        return ""
+    return " (did you mean {}?)".format(" or ".join(suggestions))
+
+
+def pair_grants(services: list, resources: list, permissions: list) -> list:
+    """
+    Pairs the requested resources with their service and permission.
+
+    A service or a permission given once applies to every resource, otherwise one must be given per
+    resource. Duplicates are dropped.
+
+    Returns
+    -------
+        list
+            a list of (service, resource, permission) tuples, empty list if the lists cannot be paired
+    """
+    if len(services) not in (1, len(resources)) or len(permissions) not in (1, len(resources)):
+        return []
+    if len(services) == 1:
+        services = services * len(resources)
+    if len(permissions) == 1:
+        permissions = permissions * len(resources)
+    return list(dict.fromkeys(zip(services, resources, permissions)))
+
+
+def grant_permissions(
+        grants: list,
+        account_name: str,
+        user_name: str,
+        okta_group: str,
+        aws_connector,
+        github_token: str,
+        pager_duty_token: str,
+        jira_credentials: str,
+        response_url: str,
+        environment_file_sha=None,
+        expires_at=None
+) -> dict:
+    """
+    Runs the grant pipeline - reads the Terraform files, asks Bedrock for the change, creates the
+    GitHub pull request and the Jira ticket, and reports the result to Slack. All the grants are
+    combined into one Bedrock call, one pull request and one Jira ticket.
+
+    environment_file_sha is the blob SHA of the environment file from the environment tree index, the
+    file is then read by SHA (cached) instead of by path if the GraphQL read is disabled or fails.
+
+    expires_at makes the grants time-bound, their expiry is recorded once the pull request and the Jira ticket
+    are created, and the expiry schedule removes them. A grant without a module variable cannot be time-bound.
+    Without expires_at, the pending expiry of a grant given again is removed.
+    """
+    domain = os.getenv("DOMAIN")
+    github_terraform_environment_repository_name = os.getenv("TERRAFORM_ENVIRONMENT_REPOSITORY_NAME")
+    github_terraform_environment_sso_account_path = os.getenv("TERRAFORM_ENVIRONMENT_SSO_ACCOUNT_PATH")
+    github_terraform_module_sso_path = os.getenv("TERRAFORM_MODULE_SSO_PATH")
+    pager_duty_schedule_id = os.getenv("PAGER_DUTY_SCHEDULE_ID")
+    jira_project_key = os.getenv("JIRA_PROJECT_KEY")
+    jira_issue_type = os.getenv("JIRA_ISSUE_TYPE")
+    jira_organization_name = os.getenv("JIRA_ORGANIZATION_NAME")
+    pull_request_aggregation_window = int(os.getenv("GITHUB_PR_AGGREGATION_WINDOW_MINUTES", "0"))
+
+    # GitHub get user permissions for the requested account ID
+    github_connector = build_github_connector(github_token)
+
+    # Aggregation mode - add the change to an open bot pull request of the same file
+    open_pull_request = {}
+    if pull_request_aggregation_window:
+        open_pull_request = github_connector.find_open_pull_request(
             group_name=okta_group,
-            account_name=args.account,
-            new_content=aws_bedrock_response,
-            service_name=args.service,
-            user_name=user_name,
-            permission=args.permission,
-            resource_name=args.resource
+            account_name=account_name,
+            window_minutes=pull_request_aggregation_window
         )
-        if github_pull_request_url:
-            logger.info("GitHub Pull Request - {} - created successfully".format(github_pull_request_url))
+        if open_pull_request:
+            logger.info("Adding to open pull request {}".format(open_pull_request.get("html_url")))
+
+    # Read the environment file for the requested account, from the open pull request branch head if any,
+    # and the module files, decoded
+    environment_file_path = "{}/{}/{}.tf".format(github_terraform_environment_sso_account_path, okta_group, account_name)
+    grant_files = {}
+    if os.getenv("GITHUB_GRAPHQL_READS", "true").lower() == "true":
+        # One GraphQL request for every file and the main branch head the new branch starts from
+        grant_files = github_connector.read_grant_files(
+            environment_file_path=environment_file_path,
+            module_path=github_terraform_module_sso_path,
+            ref=open_pull_request.get("branch")
+        )
+    base_sha = grant_files.get("head_sha")
+    if grant_files:
+        environment_file_sha = grant_files.get("environment_sha")
+        environment_file_text = grant_files.get("environment")
+        module_data_file_text = grant_files.get("data")
+        module_data_main_text = grant_files.get("main")
+        module_data_variables_text = grant_files.get("variables")
+    else:
+        if environment_file_sha and not open_pull_request:
+            environment_file_content = github_connector.read_blob_content(
+                repository_name=github_terraform_environment_repository_name,
+                blob_sha=environment_file_sha
+            )
         else:
-            logger.error("Github pull request was not created")
-            SlackHandler.response_to_slack(
+            environment_file_sha = None
+            environment_file_content = github_connector.read_file_content(
+                repository_name=github_terraform_environment_repository_name,
+                file_path=environment_file_path,
+                ref=open_pull_request.get("branch")
+            )[0]
+        environment_file_text = decode_file_content(environment_file_content)
+        module_files = github_connector.read_module_files(
+            module_path=github_terraform_module_sso_path,
+            ttl_seconds=int(os.getenv("GITHUB_MODULE_CACHE_TTL_SECONDS", "300"))
+        )
+        module_data_file_text = module_files.get("data")
+        module_data_main_text = module_files.get("main")
+        module_data_variables_text = module_files.get("variables")
+    if not environment_file_text:
+        logger.error("Account not found in the requested group, please contact the security team for more information")
+        return respond(
+            response_url,
+            "AWS Permissions bot Error - No permissions set found, please contact the security team for more information")
+    if not (module_data_file_text and module_data_main_text and module_data_variables_text):
+        logger.error("Module files not found, please contact the security team for more information")
+        return respond(
+            response_url,
+            "AWS Permissions bot Error - Module files not found, please contact the security team for more information")
+
+    # Skip the grants the environment file already has, directly or through a broader variable
+    existing_grants = EnvironmentGrants.EnvironmentGrants(
+        environment_file_text,
+        [module_data_variables_text, module_data_file_text, module_data_main_text]
+    )
+    if expires_at:
+        # The expiry schedule removes a grant from its module variable, a grant without one cannot expire
+        unresolved_grants = [
+            "{} {}".format(service_name, permission)
+            for service_name, _, permission in grants
+            if not existing_grants.grant_variable(service_name, permission)
+        ]
+        if unresolved_grants:
+            logger.error("No module variable for the time-bound grants - {}".format(unresolved_grants))
+            return respond(
                 response_url,
-                "AWS Permissions bot Error - Github pull request was not created, please contact the security team"
+                "AWS Permissions bot Error - {} cannot be time-bound, the SSO module has no variable the expiry can "
+                "remove it from, request it without --expires".format(", ".join(dict.fromkeys(unresolved_grants)))
             )
-            return {"statusCode": 200}
+    covered_grants = {}
+    for service_name, resource_name, permission in grants:
+        covering_variable = existing_grants.covering_variable(service_name, resource_name, permission)
+        if covering_variable:
+            covered_grants[(service_name, resource_name, permission)] = covering_variable
+    covered_expiry_message = ""
+    if covered_grants:
+        logger.info("Grants already in the environment file - {}".format(
+            ", ".join("{} ({})".format(grant[1], variable) for grant, variable in covered_grants.items())
+        ))
+        grants = [grant for grant in grants if grant not in covered_grants]
+        # A grant already given until an expiry becomes permanent, or gets the later expiry, as requested
+        covered_expiry_message = settle_grant_expiries(
+            okta_group,
+            account_name,
+            covered_grants,
+            existing_grants,
+            expires_at
+        )
+    if not grants:
+        return respond(
+            response_url,
+            "AWS Permissions bot - {} already granted in {}{}{}, no pull request was created".format(
+                ", ".join(
+                    "{} {} ({})".format(permission, resource_name, variable)
+                    for (_, resource_name, permission), variable in covered_grants.items()
+                ),
+                account_name,
+                " (open pull request {})".format(open_pull_request.get("html_url")) if open_pull_request else "",
+                covered_expiry_message
+            )
+        )
+
+    # Get Bedrock response
+    StatusReporter.report("AWS Permissions bot status - Generating the Terraform change")
+    with Tracing.span("build_prompt"):
+        service_names = ", ".join(dict.fromkeys(service_name for service_name, _, _ in grants))
+        resource_names = ", ".join(resource_name for _, resource_name, _ in grants)
+        permissions = ", ".join(dict.fromkeys(permission for _, _, permission in grants))
+        aws_bedrock_prompt = """
+        {}
+        Terraform module:
+        {}
+        {}
+        {}
+        Terraform environment file:
+        {}
+    """.format(
+            "\n".join(
+                'Add {} permission to the {} resource named "{}" located in "{}" organization path '.format(
+                    permission,
+                    service_name,
+                    resource_name,
+                    aws_connector.account_ou
+                )
+                for service_name, resource_name, permission in grants
+            ),
+            module_data_variables_text,
+            module_data_file_text,
+            module_data_main_text,
+            environment_file_text
+        )
+    aws_bedrock_tier = "complex" if len(grants) > 1 else None
+    aws_bedrock_response = ""
+    if os.getenv("BEDROCK_OUTPUT_MODE", "patch") == "patch":
+        # The model returns a unified diff of the environment file, applied here to the file that was read
+        terraform_patch = TerraformPatch.TerraformPatch(aws_connector.aws_bedrock(
+            prompt=aws_bedrock_prompt,
+            tier=aws_bedrock_tier,
+            output="patch"
+        ))
+        aws_bedrock_response = terraform_patch.apply(environment_file_text)
+        if not aws_bedrock_response:
+            logger.info("Bedrock patch does not apply ({}), regenerating the environment file".format(
+                terraform_patch.error
+            ))
+    if not aws_bedrock_response:
+        aws_bedrock_response = aws_connector.aws_bedrock(
+            prompt=aws_bedrock_prompt,
+            tier=aws_bedrock_tier
+        )
+    # Create a GitHub pull request
+    if len(grants) > 1:
+        branch_resource_name = "{}_and_{}_more".format(grants[0][1], len(grants) - 1)
+    else:
+        branch_resource_name = grants[0][1]
+    github_pull_request_url = github_connector.create_full_request(
+        group_name=okta_group,
+        account_name=account_name,
+        new_content=aws_bedrock_response,
+        service_name="+".join(dict.fromkeys(service_name for service_name, _, _ in grants)),
+        user_name=user_name,
+        permission="+".join(dict.fromkeys(permission for _, _, permission in grants)),
+        resource_name=branch_resource_name,
+        grants=grants,
+        pull_request=open_pull_request,
+        rolling=bool(pull_request_aggregation_window),
+        file_sha=environment_file_sha,
+        base_sha=base_sha,
+        expires_at=expires_at
+    )
+    if github_pull_request_url:
+        logger.info("GitHub Pull Request - {} - created successfully".format(github_pull_request_url))
+        JOB_PROGRESS["pull_request"] = github_pull_request_url
+        StatusReporter.report("AWS Permissions bot status - Pull request {} opened, creating the Jira ticket".format(
+            github_pull_request_url
+        ))
+    else:
+        logger.error("Github pull request was not created")
+        return respond(
+            response_url,
+            "AWS Permissions bot Error - Github pull request was not created, please contact the security team"
+        )
+    # The pull request is open, an unavailable PagerDuty or Jira must not make the user retry and open another one
+    jira_issue_key = ""
+    unavailable_dependency = None
+    try:
         pagerduty_connector = PagerDutyHandler.PagerDutyConnector(token=pager_duty_token)
         security_on_call_email_address = pagerduty_connector.get_on_call_email_address(
             schedule_ids=pager_duty_schedule_id
         )
         if not security_on_call_email_address:
             logger.error("PagerDuty security on call was not found")
-            SlackHandler.response_to_slack(
+            return respond(
                 response_url,
                 "AWS Permissions bot Error - Security on call email address was not found, please contact the security team"
             )
-            return {"statusCode": 200}
 
         # Jira create a new issue
         jira_connector = JiraHandler.JiraConnector(
@@ -289,10 +1350,9 @@ def lambda_handler(event, context):
             logger.info("Assignee ID: {}".format(assignee_id))
         else:
             logger.error("Assignee ID was not found")
-            SlackHandler.response_to_slack(
+            return respond(
                 response_url,
                 "AWS Permissions bot Error - Assignee ID was not found, please contact the security team")
-            return {"statusCode": 200}
         requester_id = jira_connector.get_user_id_by_email_address(
             email_address="{}@{}".format(user_name, domain)
         )
@@ -301,10 +1361,9 @@ def lambda_handler(event, context):
             logger.info("Requester ID: {}".format(requester_id))
         else:
             logger.error("Requester ID was not found")
-            SlackHandler.response_to_slack(
+            return respond(
                 response_url,
                 "AWS Permissions bot Error - Requester ID was not found, please contact the security team")
-            return {"statusCode": 200}
 
         # Create a Jira ticket
         jira_payload = JiraHandler.JiraConnector.build_jira_ticket(
@@ -312,23 +1371,61 @@ def lambda_handler(event, context):
             issue_type=jira_issue_type,
             assignee_id=assignee_id,
             assignee_mention=requester_id,
-            service_name=args.service,
-            resource_name=args.resource,
-            permission_level=args.permission,
-            account_name=args.account,
+            service_name=service_names,
+            resource_name=resource_names,
+            permission_level=permissions,
+            account_name=account_name,
             github_pull_request_url=github_pull_request_url
         )
         jira_issue_key = jira_connector.create_new_issue(payload=jira_payload)
-        if jira_issue_key:
-            logger.info("Jira task - {} - created successfully".format(jira_issue_key))
-            SlackHandler.response_to_slack(
-                response_url,
-                "AWS Permissions bot - Jira ticket {} was created, pull request was generated {}".format(jira_issue_key, github_pull_request_url))
-            return {"statusCode": 200}
+    except Resilience.DependencyUnavailable as e:
+        logger.error("Request degraded, the pull request is open: {}".format(e))
+        unavailable_dependency = e
+    if not jira_issue_key and unavailable_dependency is None:
+        logger.error("Jira task was not created")
+        return respond(
+            response_url,
+            "AWS Permissions bot Error - Jira task was not created, please contact the security team"
+        )
+    if jira_issue_key:
+        logger.info("Jira task - {} - created successfully".format(jira_issue_key))
+    expiry_message = ""
+    if expires_at:
+        expiry_store = GrantExpiries.ExpiryStore(table_name=os.getenv("GRANT_EXPIRIES_TABLE_NAME"))
+        if expiry_store.record(okta_group, account_name, grants, expires_at, user_name, github_pull_request_url):
+            expiry_message = ", the permissions expire on {}".format(expires_at.strftime("%Y-%m-%d %H:%M UTC"))
         else:
-            logger.error("Jira task was not created")
-            SlackHandler.response_to_slack(
-                response_url,
-                "AWS Permissions bot Error - Jira task was not created, please contact the security team"
-            )
-            return {"statusCode": 200}
+            logger.error("Grant expiry was not recorded")
+            expiry_message = ", the expiry could not be recorded, please contact the security team"
+    else:
+        # A time-bound grant of the same resources, not merged yet, must not revoke this permanent one
+        expiry_message = settle_grant_expiries(
+            okta_group,
+            account_name,
+            {grant: existing_grants.grant_variable(grant[0], grant[2]) for grant in grants},
+            existing_grants,
+            None
+        )
+    if unavailable_dependency is not None:
+        # The final message gets the margin kept for it, like a request stopped by an unavailable provider
+        Resilience.CURRENT_DEADLINE.set(None)
+        return respond(
+            response_url,
+            "AWS Permissions bot - pull request was generated {}, the Jira ticket was not created ({}), "
+            "please share the pull request with the security team{}".format(
+                github_pull_request_url,
+                unavailable_dependency,
+                expiry_message
+            ))
+    return respond(
+        response_url,
+        "AWS Permissions bot - Jira ticket {} was created, pull request was generated {}{}".format(
+            jira_issue_key,
+            github_pull_request_url,
+            expiry_message
+        ))
+
+
+# The cheap part of the warm-up (imports and clients, no API call) runs in the init phase
+if os.getenv("INIT_PRELOAD", "false").lower() == "true":
+    preload()
@@ -31,74 +31,135 @@ resource "aws_iam_role" "backend_func_role" {
     name = "${var.backend_lambda_name}-role"
     policy = jsonencode({
       Version = "2012-10-17",
-      Statement = [
-        {
-          Sid    = "AllowListSecrets",
-          Effect = "Allow",
-          Action = [
-            "secretsmanager:GetRandomPassword",
-            "secretsmanager:ListSecrets",
-            "secretsmanager:BatchGetSecretValue"
-          ],
-          Resource = ["*"]
-        },
-        {
-          Sid    = "AllowReadSecrets",
-          Effect = "Allow",
-          Action = [
-            "secretsmanager:GetResourcePolicy",
-            "secretsmanager:GetSecretValue",
-            "secretsmanager:DescribeSecret",
-            "secretsmanager:ListSecretVersionIds"
-          ],
-          Resource = var.secrets_arn_list
-        },
-        {
-          Sid      = "AllowAssumeRole",
-          Effect   = "Allow",
-          Action   = ["sts:AssumeRole"],
-          Resource = ["arn:aws:iam::*:role/${var.security_scanner_role_name}"]
-        },
-        {
-          Sid    = "AllowBedrockRead",
-          Effect = "Allow",
-          Action = [
-            "bedrock:ApplyGuardrail",
-            "bedrock:DetectGeneratedContent",
-            "bedrock:GetAgent",
-            "bedrock:GetAgentActionGroup",
-            "bedrock:GetAgentAlias",
-            "bedrock:GetAgentKnowledgeBase",
-            "bedrock:GetAgentVersion",
-            "bedrock:GetDataSource",
-            "bedrock:GetEvaluationJob",
-            "bedrock:GetGuardrail",
-            "bedrock:GetIngestionJob",
-            "bedrock:GetKnowledgeBase",
-            "bedrock:GetModelEvaluationJob",
-            "bedrock:GetModelInvocationJob",
-            "bedrock:GetUseCaseForModelAccess",
-            "bedrock:InvokeAgent",
-            "bedrock:InvokeModel",
-            "bedrock:InvokeModelWithResponseStream",
-            "bedrock:ListAgentActionGroups",
-            "bedrock:ListAgentAliases",
-            "bedrock:ListAgentKnowledgeBases",
-            "bedrock:ListAgents",
-            "bedrock:ListAgentVersions",
-            "bedrock:ListDataSources",
-            "bedrock:ListEvaluationJobs",
-            "bedrock:ListFoundationModelAgreementOffers",
-            "bedrock:ListGuardrails",
-            "bedrock:ListIngestionJobs",
-            "bedrock:ListKnowledgeBases",
-            "bedrock:ListModelEvaluationJobs",
-            "bedrock:ListModelInvocationJobs",
-            "bedrock:Retrieve"
-          ],
-          Resource = ["*"]
-        }
-      ]
+      Statement = concat(
+        [
+          {
+            Sid    = "AllowListSecrets",
+            Effect = "Allow",
+            Action = [
+              "secretsmanager:GetRandomPassword",
+              "secretsmanager:ListSecrets",
+              "secretsmanager:BatchGetSecretValue"
+            ],
+            Resource = ["*"]
+          },
+          {
+            Sid    = "AllowReadSecrets",
+            Effect = "Allow",
+            Action = [
+              "secretsmanager:GetResourcePolicy",
+              "secretsmanager:GetSecretValue",
+              "secretsmanager:DescribeSecret",
+              "secretsmanager:ListSecretVersionIds"
+            ],
+            Resource = var.secrets_arn_list
+          },
+          {
+            Sid    = "AllowConsumeJobs",
+            Effect = "Allow",
+            Action = [
+              "sqs:ReceiveMessage",
+              "sqs:DeleteMessage",
+              "sqs:GetQueueAttributes"
+            ],
+            Resource = [aws_sqs_queue.jobs_queue.arn]
+          },
+          {
+            Sid    = "AllowJobsStatus",
+            Effect = "Allow",
+            Action = [
+              "dynamodb:GetItem",
+              "dynamodb:PutItem",
+              "dynamodb:UpdateItem",
+              "dynamodb:DeleteItem"
+            ],
+            Resource = [aws_dynamodb_table.jobs_status_table.arn]
+          },
+          {
+            Sid    = "AllowGrantExpiries",
+            Effect = "Allow",
+            Action = [
+              "dynamodb:BatchWriteItem",
+              "dynamodb:Query"
+            ],
+            Resource = [
+              aws_dynamodb_table.grant_expiries_table.arn,
+              "${aws_dynamodb_table.grant_expiries_table.arn}/index/due"
+            ]
+          },
+          {
+            Sid      = "AllowReadWriteInventory",
+            Effect   = "Allow",
+            Action   = ["s3:GetObject", "s3:PutObject"],
+            Resource = ["${aws_s3_bucket.inventory_bucket.arn}/*"]
+          },
+          {
+            Sid      = "AllowAssumeRole",
+            Effect   = "Allow",
+            Action   = ["sts:AssumeRole"],
+            Resource = concat(
+              ["arn:aws:iam::*:role/${var.security_scanner_role_name}"],
+              [for organization in var.organizations : "arn:aws:iam::*:role/${organization.scanning_role_name}"],
+              compact([for organization in var.organizations : organization.management_role_arn])
+            )
+          },
+          {
+            Sid    = "AllowBedrockRead",
+            Effect = "Allow",
+            Action = [
+              "bedrock:ApplyGuardrail",
+              "bedrock:DetectGeneratedContent",
+              "bedrock:GetAgent",
+              "bedrock:GetAgentActionGroup",
+              "bedrock:GetAgentAlias",
+              "bedrock:GetAgentKnowledgeBase",
+              "bedrock:GetAgentVersion",
+              "bedrock:GetDataSource",
+              "bedrock:GetEvaluationJob",
+              "bedrock:GetGuardrail",
+              "bedrock:GetIngestionJob",
+              "bedrock:GetKnowledgeBase",
+              "bedrock:GetModelEvaluationJob",
+              "bedrock:GetModelInvocationJob",
+              "bedrock:GetUseCaseForModelAccess",
+              "bedrock:InvokeAgent",
+              "bedrock:InvokeModel",
+              "bedrock:InvokeModelWithResponseStream",
+              "bedrock:ListAgentActionGroups",
+              "bedrock:ListAgentAliases",
+              "bedrock:ListAgentKnowledgeBases",
+              "bedrock:ListAgents",
+              "bedrock:ListAgentVersions",
+              "bedrock:ListDataSources",
+              "bedrock:ListEvaluationJobs",
+              "bedrock:ListFoundationModelAgreementOffers",
+              "bedrock:ListGuardrails",
+              "bedrock:ListIngestionJobs",
+              "bedrock:ListKnowledgeBases",
+              "bedrock:ListModelEvaluationJobs",
+              "bedrock:ListModelInvocationJobs",
+              "bedrock:Retrieve"
+            ],
+            Resource = ["*"]
+          }
+        ],
+        var.inventory_backend == "resource_explorer" ? [
+          {
+            Sid      = "AllowResourceExplorerInventory",
+            Effect   = "Allow",
+            Action   = ["resource-explorer-2:ListResources"],
+            Resource = [var.resource_explorer_view_arn]
+          }
+        ] : [],
+        var.inventory_backend == "config" ? [
+          {
+            Sid      = "AllowConfigAggregatorInventory",
+            Effect   = "Allow",
+            Action   = ["config:SelectAggregateResourceConfig"],
+            Resource = ["*"]
+          }
+        ] : []
+      )
     })
   }
   tags = var.tags
@@ -140,6 +201,63 @@ resource "aws_lambda_function" "backend_function" {
       JIRA_PROJECT_KEY                       = "your-jira-project-key"
       JIRA_ISSUE_TYPE                        = "your-jira-issue-type"
       JIRA_ORGANIZATION_NAME                 = "your-jira-organization-name"
+      STATUS_TABLE_NAME                      = aws_dynamodb_table.jobs_status_table.name
+      JOB_LEASE_SECONDS                      = 180 # the function timeout
+      JOB_MAX_RECEIVE_COUNT                  = 3   # the maxReceiveCount of the jobs queue
+      GITHUB_PR_AGGREGATION_WINDOW_MINUTES   = var.pull_request_aggregation_window
+      GITHUB_TREE_CACHE_TTL_SECONDS          = 60
+      GITHUB_GRAPHQL_READS                   = "true"
+      BEDROCK_OUTPUT_MODE                    = "patch"
+      INIT_PRELOAD                           = "true"
+      SECRETS_CACHE_TTL_SECONDS              = 300
+      GITHUB_MODULE_CACHE_TTL_SECONDS        = 300
+      HTTP_TIMEOUT_SECONDS                   = 10
+      DEADLINE_MARGIN_MS                     = 5000
+      CIRCUIT_BREAKER_FAILURES               = 3
+      CIRCUIT_BREAKER_RESET_SECONDS          = 30
+      SLACK_STATUS_UPDATES                   = "true"
+      SLACK_STATUS_MIN_INTERVAL_SECONDS      = 2
+      PROFILING                              = var.profiling
+      PROFILING_OUTPUT                       = var.profiling == "" ? "" : "s3://${aws_s3_bucket.inventory_bucket.id}/profiles"
+      TRACING_EMF_NAMESPACE                  = "AWSPermissionsBot"
+      INVENTORY_BUCKET                       = aws_s3_bucket.inventory_bucket.id
+      INVENTORY_KEY                          = "inventory/snapshot.json.gz"
+      INVENTORY_MAX_AGE_SECONDS              = var.inventory_max_age
+      INVENTORY_SWEEP_CONCURRENCY            = 16
+      LIST_DETAILS_LIMIT                     = 200
+      LIST_DETAILS_CONCURRENCY               = 16
+      GRANT_EXPIRIES_TABLE_NAME              = aws_dynamodb_table.grant_expiries_table.name
+      GRANT_EXPIRY_WINDOW_SECONDS            = var.grant_expiry_window
+      GRANT_MAX_EXPIRY_DAYS                  = var.grant_max_expiry_days
+      AWS_INVENTORY_BACKEND                  = var.inventory_backend
+      RESOURCE_EXPLORER_VIEW_ARN             = var.resource_explorer_view_arn
+      CONFIG_AGGREGATOR_NAME                 = var.config_aggregator_name
+      AWS_ORGANIZATIONS                      = length(var.organizations) == 0 ? "" : jsonencode(var.organizations)
     }
   }
-}
\ No newline at end of file
+}
+
+# Warm-up on a schedule, fills the container caches (accounts, organizational units, secrets, GitHub files)
+resource "aws_cloudwatch_event_rule" "backend_warm_up" {
+  count               = var.warm_up_schedule == "" ? 0 : 1
+  name                = "${var.backend_lambda_name}-warm-up"
+  description         = "Warm-up of ${var.backend_lambda_name}"
+  schedule_expression = var.warm_up_schedule
+  tags                = var.tags
+}
+
+resource "aws_cloudwatch_event_target" "backend_warm_up" {
+  count = var.warm_up_schedule == "" ? 0 : 1
+  rule  = aws_cloudwatch_event_rule.backend_warm_up[0].name
+  arn   = aws_lambda_function.backend_function.arn
+  input = jsonencode({ warm_up = true })
+}
+
+resource "aws_lambda_permission" "backend_warm_up_permission" {
+  count         = var.warm_up_schedule == "" ? 0 : 1
+  statement_id  = "AllowEventBridgeWarmUpInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.backend_function.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.backend_warm_up[0].arn
+}
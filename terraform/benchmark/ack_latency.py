@@ -0,0 +1,245 @@
+"""
+Acknowledgment latency benchmark of the invocation lambda.
+
+Slack drops a slash command that is not acknowledged within 3 seconds. Every cold sample is a fresh Python
+process that imports the invocation lambda (the init phase) and handles one command, the warm samples reuse
+one process. The real botocore clients are used, a before-send hook answers every AWS call locally after
+the injected latency, so client creation, serialization and signing are measured.
+
+Usage:
+    python ack_latency.py --cold-samples 10 --warm-samples 200 --aws-latency-ms 20
+    python ack_latency.py --legacy
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.parse
+
+BENCHMARK_PATH = os.path.dirname(os.path.abspath(__file__))
+INVOCATION_PATH = os.path.join(BENCHMARK_PATH, "..", "invocation", "lambda_function.py")
+SLACK_ACK_DEADLINE_MS = 3000
+
+BENCHMARK_ENVIRONMENT = {
+    "AWS_ACCESS_KEY_ID": "AKIABENCHMARK",
+    "AWS_SECRET_ACCESS_KEY": "benchmark",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "LAMBDA_NAME": "aws-permissions-bot-backend",
+    "STATUS_TABLE_NAME": "aws-permissions-bot-jobs-status",
+    "DEDUP_WINDOW_SECONDS": "300"
+}
+QUEUE_URL = "https://sqs.us-east-1.amazonaws.com/123456789012/aws-permissions-bot-jobs"
+
+
+def api_gateway_event(index: int) -> dict:
+    """
+    Returns an API Gateway proxy event of a Slack slash command, with the headers and fields Slack sends.
+    """
+    body = urllib.parse.urlencode({
+        "token": "gIkuvaNzQIHg97ATvDxqgjtO",
+        "team_id": "T0001",
+        "team_domain": "example",
+        "enterprise_id": "E0001",
+        "enterprise_name": "Example",
+        "channel_id": "C2147483705",
+        "channel_name": "aws-permissions",
+        "user_id": "U2147483697",
+        "user_name": "jane.doe",
+        "command": "/aws_permissions",
+        "text": "grant -s s3 -p read -a account-{} -r bucket-{}".format(index % 50, index),
+        "api_app_id": "A123456",
+        "is_enterprise_install": "false",
+        "response_url": "https://hooks.slack.com/commands/T0001/{}/benchmark".format(index),
+        "trigger_id": "13345224609.738474920.8088930838d88f008e0"
+    })
+    headers = {
+        "Accept": "application/json,*/*",
+        "Accept-Encoding": "gzip,deflate",
+        "Content-Type": "application/x-www-form-urlencoded",
+        "Host": "abcdef1234.execute-api.us-east-1.amazonaws.com",
+        "User-Agent": "Slackbot 1.0 (+https://api.slack.com/robots)",
+        "X-Amzn-Trace-Id": "Root=1-5e1b4151-5ac6c58f5b5daa6532e4f2a1",
+        "X-Forwarded-For": "3.3.3.3",
+        "X-Forwarded-Port": "443",
+        "X-Forwarded-Proto": "https",
+        "X-Slack-Request-Timestamp": str(int(time.time())),
+        "X-Slack-Signature": "v0=a2114d57b48eac39b9ad189dd8316235a7b4a8d21a10bd27519666489c69b503"
+    }
+    return {
+        "resource": "/",
+        "path": "/",
+        "httpMethod": "POST",
+        "headers": headers,
+        "multiValueHeaders": {name: [value] for name, value in headers.items()},
+        "queryStringParameters": None,
+        "requestContext": {
+            "accountId": "123456789012",
+            "apiId": "abcdef1234",
+            "httpMethod": "POST",
+            "identity": {"sourceIp": "3.3.3.3", "userAgent": headers["User-Agent"]},
+            "path": "/prod/",
+            "protocol": "HTTP/1.1",
+            "requestId": "c6af9ac6-7b61-11e6-9a41-93e8deadbeef",
+            "requestTimeEpoch": int(time.time() * 1000),
+            "resourcePath": "/",
+            "stage": "prod"
+        },
+        "body": body,
+        "isBase64Encoded": False
+    }
+
+
+class LocalBody:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+def install_local_aws(latency_ms: float, forwarded_bytes: list):
+    """
+    Answers every AWS call of the default boto3 session locally, after latency_ms.
+    """
+    import boto3
+    import botocore.awsrequest
+    boto3.setup_default_session()
+    responses = {
+        "Invoke": (202, b""),
+        "SendMessage": (200, json.dumps({"MessageId": "benchmark", "MD5OfMessageBody": "benchmark"}).encode()),
+        "PutItem": (200, b"{}"),
+        "GetItem": (200, b"{}")
+    }
+
+    def before_send(request, **kwargs):
+        operation_name = request.context.get("operation_name") or kwargs.get("event_name", "").split(".")[-1]
+        status_code, body = responses.get(operation_name, (200, b"{}"))
+        if operation_name in ("Invoke", "SendMessage"):
+            forwarded_bytes.append(len(request.body or b""))
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        return botocore.awsrequest.AWSResponse(request.url, status_code, {}, LocalBody(body))
+    boto3.DEFAULT_SESSION._session.register("before-send", before_send)
+
+
+def load_invocation_lambda():
+    spec = importlib.util.spec_from_file_location("invocation_lambda_function", INVOCATION_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def child(samples: int, aws_latency_ms: float):
+    forwarded_bytes = []
+    start = time.perf_counter()
+    install_local_aws(aws_latency_ms, forwarded_bytes)
+    setup_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    invocation_lambda = load_invocation_lambda()
+    init_ms = (time.perf_counter() - start) * 1000
+    ack_ms = []
+    bodies = []
+    event_bytes = []
+    for index in range(samples):
+        event = api_gateway_event(index)
+        event_bytes.append(len(json.dumps(event)))
+        start = time.perf_counter()
+        response = invocation_lambda.lambda_handler(event, None)
+        ack_ms.append((time.perf_counter() - start) * 1000)
+        bodies.append(response.get("body", ""))
+    print(json.dumps({
+        "setup_ms": setup_ms,
+        "init_ms": init_ms,
+        "ack_ms": ack_ms,
+        "event_bytes": statistics.mean(event_bytes),
+        "forwarded_bytes": statistics.mean(forwarded_bytes) if forwarded_bytes else 0,
+        "acknowledged": sum(1 for body in bodies if "working on it" in body)
+    }))
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_child(options, samples: int) -> dict:
+    environment = dict(os.environ)
+    environment.update(BENCHMARK_ENVIRONMENT)
+    environment.pop("TRACING_EMF_NAMESPACE", None)
+    if options.legacy:
+        environment.pop("QUEUE_URL", None)
+    else:
+        environment["QUEUE_URL"] = QUEUE_URL
+    output = subprocess.run(
+        [
+            sys.executable, os.path.abspath(__file__),
+            "--child", str(samples),
+            "--aws-latency-ms", str(options.aws_latency_ms)
+        ],
+        env=environment,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def print_distribution(name: str, values: list):
+    print("{:<12} {:>8} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>12.1f}%".format(
+        name,
+        len(values),
+        percentile(values, 0.5),
+        percentile(values, 0.95),
+        percentile(values, 0.99),
+        max(values),
+        100 * sum(1 for value in values if value < SLACK_ACK_DEADLINE_MS) / len(values)
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AWS Permissions bot invocation lambda ack benchmark")
+    parser.add_argument("--cold-samples", type=int, default=10, help="Fresh processes, one command each")
+    parser.add_argument("--warm-samples", type=int, default=100, help="Commands handled by one process")
+    parser.add_argument("--aws-latency-ms", type=float, default=0.0, help="AWS API latency")
+    parser.add_argument("--legacy", action="store_true", help="Invoke the backend directly instead of queueing")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.child:
+        child(options.child, options.aws_latency_ms)
+        return
+
+    cold = [run_child(options, 1) for _ in range(options.cold_samples)]
+    warm = run_child(options, options.warm_samples)
+    report = {
+        "options": vars(options),
+        "init_ms": [sample["init_ms"] for sample in cold],
+        "cold_ack_ms": [sample["init_ms"] + sample["ack_ms"][0] for sample in cold],
+        "warm_ack_ms": warm["ack_ms"][1:] or warm["ack_ms"],
+        "event_bytes": warm["event_bytes"],
+        "forwarded_bytes": warm["forwarded_bytes"],
+        "acknowledged": warm["acknowledged"] + sum(sample["acknowledged"] for sample in cold)
+    }
+    if options.json:
+        print(json.dumps(report, indent=2))
+        return
+    print("{:<12} {:>8} {:>10} {:>10} {:>10} {:>10} {:>13}".format(
+        "ack", "samples", "p50 ms", "p95 ms", "p99 ms", "max ms", "under 3s"
+    ))
+    print_distribution("init", report["init_ms"])
+    print_distribution("cold", report["cold_ack_ms"])
+    print_distribution("warm", report["warm_ack_ms"])
+    print("\nevent bytes: {:.0f} - forwarded bytes: {:.0f}".format(report["event_bytes"], report["forwarded_bytes"]))
+    print("working on it responses: {}/{}".format(
+        report["acknowledged"],
+        options.cold_samples + options.warm_samples
+    ))
+
+
+if __name__ == "__main__":
+    main()
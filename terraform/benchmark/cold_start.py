@@ -0,0 +1,140 @@
+"""
+Cold start benchmark of the backend lambda.
+
+Every sample is a fresh Python process that imports lambda_function (the init phase) and handles one
+command (the first invocation), against the local stand-ins of fake_services.
+
+Usage:
+    python cold_start.py --samples 10 --commands help list
+    python cold_start.py --samples 1 --commands help --import-profile
+    python cold_start.py --samples 5 --commands grant --rest-latency-ms 50 --aws-latency-ms 20 --init-preload --warm-up
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCHMARK_PATH = os.path.dirname(os.path.abspath(__file__))
+BACKEND_PATH = os.path.join(BENCHMARK_PATH, "..", "backend")
+
+
+def child(options):
+    command = options.child
+    if options.import_profile:
+        logging.basicConfig(stream=sys.stderr, level=logging.INFO, format="%(message)s")
+    aws = None
+    if options.init_preload:
+        # The AWS stand-in must be in place before the init phase creates the clients
+        sys.path.insert(0, BENCHMARK_PATH)
+        import fake_services
+        os.environ["INIT_PRELOAD"] = "true"
+    start = time.perf_counter()
+    if options.init_preload:
+        aws = fake_services.FakeAws(latency_ms=options.aws_latency_ms)
+        aws.install()
+    sys.path.insert(0, BACKEND_PATH)
+    sys.path.insert(0, BENCHMARK_PATH)
+    import lambda_function
+    init_ms = (time.perf_counter() - start) * 1000
+
+    import fake_services
+    import run_benchmark
+    os.environ.update(run_benchmark.BENCHMARK_ENVIRONMENT)
+    fake_services.install_local_redirect(options.port)
+    warm_up_ms = 0.0
+    if options.warm_up:
+        aws = aws or fake_services.FakeAws(latency_ms=options.aws_latency_ms)
+        aws.install()
+        start = time.perf_counter()
+        lambda_function.lambda_handler({"warm_up": True}, run_benchmark.FakeContext("warm-up"))
+        warm_up_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    if command != "help" and aws is None:
+        fake_services.FakeAws(latency_ms=options.aws_latency_ms).install()
+    lambda_function.lambda_handler(
+        run_benchmark.slack_event(run_benchmark.build_command(command, 0, 50, 100)),
+        run_benchmark.FakeContext("cold-start")
+    )
+    invoke_ms = (time.perf_counter() - start) * 1000
+    print(json.dumps({
+        "init_ms": init_ms,
+        "warm_up_ms": warm_up_ms,
+        "invoke_ms": invoke_ms,
+        "boto3_loaded": "boto3" in sys.modules
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AWS Permissions bot cold start benchmark")
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--commands", nargs="+", default=["help", "list"], choices=["help", "list", "grant"])
+    parser.add_argument("--import-profile", action="store_true", help="Log the per-module init cost of every sample")
+    parser.add_argument("--rest-latency-ms", type=float, default=0.0, help="Okta/GitHub/PagerDuty/Jira/Slack latency")
+    parser.add_argument("--aws-latency-ms", type=float, default=0.0, help="AWS API latency")
+    parser.add_argument("--init-preload", action="store_true", help="Set INIT_PRELOAD, imports and clients in init")
+    parser.add_argument("--warm-up", action="store_true",
+                        help="Send the warm-up event before the measured invocation")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.child:
+        child(options)
+        return
+
+    sys.path.insert(0, BENCHMARK_PATH)
+    import fake_services
+    rest_apis = fake_services.FakeRestApis(latency_ms=options.rest_latency_ms)
+    port = rest_apis.start()
+    environment = dict(os.environ)
+    environment.pop("STATUS_TABLE_NAME", None)
+    if options.import_profile:
+        environment["IMPORT_PROFILE"] = "1"
+    print("{:<8} {:>12} {:>12} {:>12} {:>12} {:>12} {:>8}".format(
+        "command", "init p50", "init p95", "warm-up p50", "invoke p50", "total p50", "boto3"
+    ))
+    try:
+        for command in options.commands:
+            samples = []
+            for _ in range(options.samples):
+                child_arguments = [
+                    sys.executable, os.path.abspath(__file__), "--child", command, "--port", str(port),
+                    "--aws-latency-ms", str(options.aws_latency_ms)
+                ]
+                for flag in ("import_profile", "init_preload", "warm_up"):
+                    if getattr(options, flag):
+                        child_arguments.append("--{}".format(flag.replace("_", "-")))
+                output = subprocess.run(
+                    child_arguments,
+                    env=environment,
+                    capture_output=True,
+                    text=True,
+                    check=True
+                )
+                if options.import_profile:
+                    sys.stderr.writelines(
+                        line + "\n" for line in output.stderr.splitlines() if '"import_profile"' in line
+                    )
+                samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+            init = sorted(sample["init_ms"] for sample in samples)
+            invoke = sorted(sample["invoke_ms"] for sample in samples)
+            total = sorted(sample["init_ms"] + sample["invoke_ms"] for sample in samples)
+            print("{:<8} {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f} {:>8}".format(
+                command,
+                statistics.median(init),
+                init[min(len(init) - 1, int(round(0.95 * (len(init) - 1))))],
+                statistics.median(sample["warm_up_ms"] for sample in samples),
+                statistics.median(invoke),
+                statistics.median(total),
+                "yes" if samples[-1]["boto3_loaded"] else "no"
+            ))
+    finally:
+        rest_apis.stop()
+
+
+if __name__ == "__main__":
+    main()
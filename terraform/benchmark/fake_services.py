@@ -0,0 +1,675 @@
+"""
+Local stand-ins for the services the backend lambda talks to, with injected latency and call counters.
+
+FakeRestApis serves Okta, GitHub, PagerDuty, Jira and Slack from one local HTTP server, and
+LocalRedirectHandler sends every https request of urllib to it (the hostname becomes the first
+path segment). FakeAws replaces boto3.client and boto3.Session with in-memory AWS clients for
+Organizations, STS, S3, SQS, Resource Explorer, Config, Secrets Manager and Bedrock.
+"""
+import base64
+import collections
+import difflib
+import hashlib
+import http.server
+import io
+import json
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+
+def build_environment_file(group_name: str, account_name: str, grants: int) -> str:
+    """
+    Builds a Terraform environment file with the given number of existing grants.
+    """
+    buckets = ",\n    ".join('"{}-existing-bucket-{}"'.format(account_name, index) for index in range(grants))
+    return """module "{}_{}" {{
+  source = "../../modules/sso"
+
+  permission_set_name = "{}"
+  s3_read_buckets = [
+    {}
+  ]
+  s3_write_buckets = []
+  sqs_read_queues  = []
+  sqs_write_queues = []
+}}
+""".format(group_name, account_name, group_name, buckets)
+
+
+MODULE_FILES = {
+    "data.tf": 'data "aws_iam_policy_document" "s3_read" {\n  statement {\n    actions = ["s3:GetObject", "s3:ListBucket"]\n    resources = var.s3_read_buckets\n  }\n}\n',
+    "main.tf": 'resource "aws_ssoadmin_permission_set" "this" {\n  name = var.permission_set_name\n}\n',
+    "variables.tf": 'variable "permission_set_name" {}\nvariable "s3_read_buckets" { default = [] }\nvariable "s3_write_buckets" { default = [] }\nvariable "sqs_read_queues" { default = [] }\nvariable "sqs_write_queues" { default = [] }\n'
+}
+
+
+class FakeRestApis:
+    """
+    A local HTTP server answering the Okta, GitHub, PagerDuty, Jira and Slack REST calls of the bot
+
+    ...
+
+    Attributes
+    ----------
+    latency_ms : float
+        the latency injected before every response
+    okta_groups : int
+        the number of non-AWS Okta groups of the user (the org size)
+    environment_grants : int
+        the number of existing grants in every environment file
+    accounts : int
+        the number of accounts with an environment file in every group directory
+    environment_groups : int
+        the number of group directories of the environment repository
+    calls : collections.Counter
+        the number of calls per "host METHOD route"
+    """
+
+    def __init__(
+            self,
+            latency_ms=0.0,
+            okta_groups=20,
+            environment_grants=20,
+            group_name="developers",
+            accounts=50,
+            environment_groups=20
+    ):
+        self.latency_ms = latency_ms
+        self.okta_groups = okta_groups
+        self.environment_grants = environment_grants
+        self.group_name = group_name
+        self.accounts = accounts
+        self.environment_groups = environment_groups
+        self.tree = None
+        self.blobs = {}
+        self.calls = collections.Counter()
+        self.lock = threading.Lock()
+        self.server = None
+        self.pull_requests = 0
+        self.issues = 0
+        # The numbers of the pull requests that are not merged yet, or closed without merging, the others are merged
+        self.open_pull_requests = set()
+        self.closed_pull_requests = set()
+
+    def start(self) -> int:
+        apis = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def __respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, payload = apis.route(self.command, self.path, body, self.headers)
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                if isinstance(payload, dict) and payload.get("sha"):
+                    self.send_header("ETag", '"{}"'.format(payload.get("sha")))
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = __respond
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address[1]
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+
+    def count(self, route: str):
+        with self.lock:
+            self.calls[route] += 1
+
+    def route(self, method: str, path: str, body: bytes, headers=None):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        host, _, rest = path.lstrip("/").partition("/")
+        parsed = urllib.parse.urlsplit("/" + rest)
+        route_path = re.sub(r"/+", "/", parsed.path)
+        query = urllib.parse.parse_qs(parsed.query)
+        if host.endswith(".okta.com"):
+            return self.okta(method, route_path)
+        if host == "api.github.com":
+            return self.github(method, route_path, query, body, headers or {})
+        if host == "api.pagerduty.com":
+            return self.pagerduty(method, route_path)
+        if host.endswith(".atlassian.net"):
+            return self.jira(method, route_path)
+        if host == "hooks.slack.com":
+            self.count("slack {} response_url".format(method))
+            return 200, b"ok"
+        self.count("unknown {} {}".format(method, host))
+        return 404, {"message": "not found"}
+
+    def okta(self, method: str, path: str):
+        if path.endswith("/groups"):
+            self.count("okta GET /users/{id}/groups")
+            groups = [{"profile": {"name": "everyone_{}".format(index)}} for index in range(self.okta_groups)]
+            groups.append({"profile": {"name": "aws_{}".format(self.group_name)}})
+            return 200, groups
+        self.count("okta GET /users/{login}")
+        return 200, {"id": "00u{}".format(hashlib.sha1(path.encode('utf-8')).hexdigest()[:10])}
+
+    def environment_file(self, file_path: str) -> str:
+        file_name = file_path.split("/")[-1]
+        if file_name in MODULE_FILES:
+            return MODULE_FILES[file_name]
+        group_name, account_name = file_path.split("/")[-2], file_name[:-len(".tf")]
+        return build_environment_file(group_name, account_name, self.environment_grants)
+
+    def environment_tree(self) -> dict:
+        """
+        The recursive tree of the environment repository, every group directory has a file per account.
+        """
+        if self.tree is None:
+            self.tree = self.build_environment_tree()
+            self.blobs = {entry.get("sha"): entry.get("path") for entry in self.tree.get("tree")}
+        return self.tree
+
+    def build_environment_tree(self) -> dict:
+        group_names = [self.group_name] + ["team_{}".format(index) for index in range(self.environment_groups - 1)]
+        entries = [{"path": "README.md", "type": "blob", "sha": "f" * 40}]
+        for group_name in group_names:
+            for index in range(self.accounts):
+                file_path = "terraform-environments/sso-account/{}/account-{}.tf".format(group_name, index)
+                entries.append({
+                    "path": file_path,
+                    "type": "blob",
+                    "sha": hashlib.sha1(self.environment_file(file_path).encode('utf-8')).hexdigest()
+                })
+        return {"sha": hashlib.sha1(json.dumps(entries).encode('utf-8')).hexdigest(), "tree": entries, "truncated": False}
+
+    def github(self, method: str, path: str, query: dict, body: bytes, headers: dict):
+        if re.match(r"^/repos/[^/]+/[^/]+/git/trees/.+$", path):
+            self.count("github GET git/trees")
+            tree = self.environment_tree()
+            if headers.get("If-None-Match") == '"{}"'.format(tree.get("sha")):
+                return 304, b""
+            return 200, tree
+        if path == "/graphql" and method == "POST":
+            # The grant files query of GithubConnector.read_grant_files
+            self.count("github POST graphql")
+            variables = json.loads(body).get("variables")
+
+            def blob(expression: str):
+                content = self.environment_file(expression.partition(":")[2])
+                return {"oid": hashlib.sha1(content.encode('utf-8')).hexdigest(), "text": content}
+            return 200, {"data": {
+                "environment": {
+                    "head": {"target": {"oid": "0" * 40}},
+                    "file": blob(variables.get("environmentFile"))
+                },
+                "module": {
+                    "data": blob(variables.get("dataFile")),
+                    "main": blob(variables.get("mainFile")),
+                    "variables": blob(variables.get("variablesFile"))
+                }
+            }}
+        blob_match = re.match(r"^/repos/[^/]+/[^/]+/git/blobs/([0-9a-f]+)$", path)
+        if blob_match:
+            self.count("github GET git/blobs")
+            self.environment_tree()
+            if blob_match.group(1) not in self.blobs:
+                return 404, {"message": "Not Found"}
+            content = self.environment_file(self.blobs[blob_match.group(1)])
+            return 200, {"content": base64.b64encode(content.encode('utf-8')).decode('utf-8'), "encoding": "base64"}
+        match = re.match(r"^/repos/[^/]+/[^/]+/contents/(.+)$", path)
+        if match and method == "GET":
+            self.count("github GET contents")
+            content = self.environment_file(match.group(1))
+            return 200, {
+                "content": base64.b64encode(content.encode('utf-8')).decode('utf-8'),
+                "sha": hashlib.sha1(content.encode('utf-8')).hexdigest()
+            }
+        if match and method == "PUT":
+            self.count("github PUT contents")
+            return 200, {"content": {}}
+        if re.match(r"^/repos/[^/]+/[^/]+/git/refs/heads/.+$", path):
+            self.count("github GET git/refs/heads")
+            return 200, {"object": {"sha": "0" * 40}}
+        if re.match(r"^/repos/[^/]+/[^/]+/git/refs$", path):
+            self.count("github POST git/refs")
+            return 201, {"ref": json.loads(body).get("ref")}
+        if re.match(r"^/repos/[^/]+/[^/]+/pulls$", path) and method == "GET":
+            self.count("github GET pulls")
+            return 200, []
+        if re.match(r"^/repos/[^/]+/[^/]+/pulls$", path) and method == "POST":
+            self.count("github POST pulls")
+            with self.lock:
+                self.pull_requests += 1
+                number = self.pull_requests
+            return 201, {"number": number, "html_url": "https://github.com/owner/environment/pull/{}".format(number)}
+        pull_match = re.match(r"^/repos/[^/]+/[^/]+/pulls/(\d+)$", path)
+        if pull_match:
+            self.count("github {} pulls/{{number}}".format(method))
+            if method == "GET":
+                # Merged unless listed as still open or closed
+                number = int(pull_match.group(1))
+                if number in self.open_pull_requests:
+                    return 200, {"number": number, "state": "open", "merged": False, "merged_at": None}
+                if number in self.closed_pull_requests:
+                    return 200, {"number": number, "state": "closed", "merged": False, "merged_at": None}
+                return 200, {"number": number, "state": "closed", "merged": True, "merged_at": "2026-01-01T00:00:00Z"}
+            return 200, {}
+        self.count("github {} {}".format(method, path))
+        return 404, {"message": "Not Found"}
+
+    def pagerduty(self, method: str, path: str):
+        if path == "/oncalls":
+            self.count("pagerduty GET /oncalls")
+            return 200, {"oncalls": [{"user": {"id": "PONCALL"}}]}
+        self.count("pagerduty GET /users/{id}")
+        return 200, {"user": {"email": "on-call@example.com"}}
+
+    def jira(self, method: str, path: str):
+        if path.endswith("/user/search"):
+            self.count("jira GET /user/search")
+            return 200, [{"accountId": "jira-account-id"}]
+        if path.endswith("/issue"):
+            self.count("jira POST /issue")
+            with self.lock:
+                self.issues += 1
+                number = self.issues
+            return 201, {"key": "SEC-{}".format(number)}
+        self.count("jira {} {}".format(method, path))
+        return 404, {}
+
+
+class LocalRedirectHandler(urllib.request.BaseHandler):
+    """
+    A urllib handler sending every https request to the local FakeRestApis server.
+    """
+    handler_order = 100
+
+    def __init__(self, port: int):
+        self.port = port
+        self.opener = urllib.request.build_opener()
+
+    def https_open(self, request):
+        parsed = urllib.parse.urlsplit(request.full_url)
+        local_url = "http://127.0.0.1:{}/{}{}".format(
+            self.port,
+            parsed.hostname,
+            parsed.path + ("?{}".format(parsed.query) if parsed.query else "")
+        )
+        local_request = urllib.request.Request(
+            local_url,
+            data=request.data,
+            headers=dict(request.header_items()),
+            method=request.get_method()
+        )
+        return self.opener.open(local_request, timeout=request.timeout)
+
+
+def install_local_redirect(port: int):
+    urllib.request.install_opener(urllib.request.build_opener(LocalRedirectHandler(port)))
+
+
+class FakePaginator:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return iter(self.pages(**kwargs))
+
+
+class FakeAwsClient:
+    """
+    An in-memory AWS client for one service, every operation is counted and delayed.
+    """
+
+    def __init__(self, aws, service_name: str):
+        self.aws = aws
+        self.service_name = service_name
+
+    def __getattr__(self, operation_name):
+        implementation = getattr(self.aws, "{}_{}".format(self.service_name.replace("-", "_"), operation_name), None)
+        if implementation is None:
+            raise AttributeError(operation_name)
+
+        def call(*args, **kwargs):
+            self.aws.count("{} {}".format(self.service_name, operation_name))
+            if self.aws.latency_ms:
+                time.sleep(self.aws.latency_ms / 1000)
+            return implementation(*args, **kwargs)
+        return call
+
+    def get_paginator(self, operation_name: str):
+        implementation = getattr(self.aws, "{}_{}".format(self.service_name, operation_name))
+
+        def pages(**kwargs):
+            self.aws.count("{} {}".format(self.service_name, operation_name))
+            if self.aws.latency_ms:
+                time.sleep(self.aws.latency_ms / 1000)
+            return implementation(**kwargs)
+        return FakePaginator(pages)
+
+
+class FakeSession:
+    def __init__(self, aws):
+        self.aws = aws
+
+    def client(self, service_name=None, *args, **kwargs):
+        return self.aws.client(service_name or kwargs.get("service_name"))
+
+
+class FakeAws:
+    """
+    In-memory AWS with an organization, per-account inventories, secrets and Bedrock
+
+    ...
+
+    Attributes
+    ----------
+    accounts : int
+        the number of active accounts in the organization
+    organizational_units : int
+        the number of organizational units, accounts are spread across them
+    buckets : int
+        the number of S3 buckets per account
+    queues : int
+        the number of SQS queues per account
+    latency_ms : float
+        the latency injected before every AWS call
+    bedrock_latency_ms : float
+        the extra latency of a Bedrock converse call
+    bedrock_ms_per_output_token : float
+        the generation time of every output token of a Bedrock converse call
+    calls : collections.Counter
+        the number of calls per "service operation"
+    """
+
+    def __init__(
+            self,
+            accounts=50,
+            organizational_units=10,
+            buckets=100,
+            queues=100,
+            latency_ms=0.0,
+            bedrock_latency_ms=0.0,
+            bedrock_ms_per_output_token=0.0
+    ):
+        self.accounts = accounts
+        self.organizational_units = organizational_units
+        self.buckets = buckets
+        self.queues = queues
+        self.latency_ms = latency_ms
+        self.bedrock_latency_ms = bedrock_latency_ms
+        self.bedrock_ms_per_output_token = bedrock_ms_per_output_token
+        self.calls = collections.Counter()
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.items = {}
+        self.original_client = None
+        self.original_session = None
+
+    def install(self):
+        # boto3 is imported here so a cold start benchmark of a command that needs no AWS does not load it
+        import boto3
+        self.original_client, self.original_session = boto3.client, boto3.Session
+        boto3.client = lambda service_name=None, *args, **kwargs: self.client(service_name or kwargs.get("service_name"))
+        boto3.Session = lambda *args, **kwargs: FakeSession(self)
+
+    def uninstall(self):
+        import boto3
+        boto3.client, boto3.Session = self.original_client, self.original_session
+
+    def client(self, service_name: str):
+        return FakeAwsClient(self, service_name)
+
+    def count(self, operation: str):
+        with self.lock:
+            self.calls[operation] += 1
+
+    @staticmethod
+    def account_name(index: int) -> str:
+        return "account-{}".format(index)
+
+    @staticmethod
+    def account_id(index: int) -> str:
+        return "{:012d}".format(100000000000 + index)
+
+    # Organizations
+    def organizations_list_roots(self, **kwargs):
+        return {"Roots": [{"Id": "r-root"}]}
+
+    def organizations_list_accounts(self, MaxResults=20, NextToken=None, **kwargs):
+        start = int(NextToken or 0)
+        accounts = [
+            {"Id": self.account_id(index), "Name": self.account_name(index), "Status": "ACTIVE"}
+            for index in range(start, min(start + MaxResults, self.accounts))
+        ]
+        response = {"Accounts": accounts}
+        if start + MaxResults < self.accounts:
+            response["NextToken"] = str(start + MaxResults)
+        return response
+
+    def organizations_list_organizational_units_for_parent(self, ParentId, **kwargs):
+        if ParentId != "r-root":
+            return [{"OrganizationalUnits": []}]
+        return [{"OrganizationalUnits": [
+            {"Id": "ou-{}".format(index), "Name": "ou-name-{}".format(index)}
+            for index in range(self.organizational_units)
+        ]}]
+
+    def organizations_list_accounts_for_parent(self, ParentId, **kwargs):
+        ou_index = int(ParentId.split("-")[-1])
+        return [{"Accounts": [
+            {"Id": self.account_id(index), "Name": self.account_name(index), "Status": "ACTIVE"}
+            for index in range(self.accounts) if index % self.organizational_units == ou_index
+        ]}]
+
+    # STS
+    def sts_assume_role(self, RoleArn, RoleSessionName, **kwargs):
+        return {"Credentials": {"AccessKeyId": "AKIA", "SecretAccessKey": "secret", "SessionToken": "token"}}
+
+    # S3 and SQS, every account has the same inventory shape
+    def s3_list_buckets(self, Prefix="", MaxBuckets=None, ContinuationToken=None, **kwargs):
+        names = [name for name in ("bucket-{}".format(index) for index in range(self.buckets)) if name.startswith(Prefix)]
+        start = int(ContinuationToken or 0)
+        end = min(start + MaxBuckets, len(names)) if MaxBuckets else len(names)
+        response = {"Buckets": [{"Name": name} for name in names[start:end]]}
+        if end < len(names):
+            response["ContinuationToken"] = str(end)
+        return response
+
+    def sqs_list_queues(self, MaxResults=1000, NextToken=None, QueueNamePrefix="", **kwargs):
+        names = [name for name in ("queue-{}".format(index) for index in range(self.queues)) if name.startswith(QueueNamePrefix)]
+        start = int(NextToken or 0)
+        end = min(start + MaxResults, len(names))
+        response = {"QueueUrls": [
+            "https://sqs.us-west-2.amazonaws.com/123456789012/{}".format(name)
+            for name in names[start:end]
+        ]}
+        if end < len(names):
+            response["NextToken"] = str(end)
+        return response
+
+    # Resource details, the odd buckets have no tags and no default encryption
+    def s3_get_bucket_location(self, Bucket, **kwargs):
+        return {"LocationConstraint": "us-west-2"}
+
+    def s3_get_bucket_tagging(self, Bucket, **kwargs):
+        from botocore.exceptions import ClientError
+        if int(Bucket.split("-")[-1]) % 2:
+            raise ClientError({"Error": {"Code": "NoSuchTagSet", "Message": "The TagSet does not exist"}}, "GetBucketTagging")
+        return {"TagSet": [{"Key": "Owner", "Value": "team-a"}, {"Key": "env", "Value": "prod"}]}
+
+    def s3_get_bucket_encryption(self, Bucket, **kwargs):
+        from botocore.exceptions import ClientError
+        if int(Bucket.split("-")[-1]) % 2:
+            raise ClientError(
+                {"Error": {"Code": "ServerSideEncryptionConfigurationNotFoundError", "Message": "Not found"}},
+                "GetBucketEncryption"
+            )
+        return {"ServerSideEncryptionConfiguration": {"Rules": [
+            {"ApplyServerSideEncryptionByDefault": {"SSEAlgorithm": "aws:kms"}}
+        ]}}
+
+    def sqs_get_queue_url(self, QueueName, QueueOwnerAWSAccountId=None, **kwargs):
+        return {"QueueUrl": "https://sqs.us-west-2.amazonaws.com/{}/{}".format(QueueOwnerAWSAccountId, QueueName)}
+
+    def sqs_get_queue_attributes(self, QueueUrl, AttributeNames=None, **kwargs):
+        return {"Attributes": {"SqsManagedSseEnabled": "true"}}
+
+    def sqs_list_queue_tags(self, QueueUrl, **kwargs):
+        return {"Tags": {"owner": "team-b"}}
+
+    # Resource Explorer and Config aggregators, every resource of every account
+    def aggregated_resources(self, service_name: str, account_id=None):
+        account_ids = [account_id] if account_id else [self.account_id(index) for index in range(self.accounts)]
+        count = self.buckets if service_name == "s3" else self.queues
+        prefix = "bucket" if service_name == "s3" else "queue"
+        return [
+            (owner_id, "{}-{}".format(prefix, index))
+            for owner_id in account_ids for index in range(count)
+        ]
+
+    def resource_explorer_2_list_resources(self, ViewArn, Filters, MaxResults=1000, NextToken=None, **kwargs):
+        terms = dict(term.split(":", 1) for term in Filters.get("FilterString").split())
+        service_name = terms.get("resourcetype").split(":")[0]
+        resources = self.aggregated_resources(service_name, terms.get("accountid"))
+        start = int(NextToken or 0)
+        end = min(start + MaxResults, len(resources))
+        response = {"Resources": [
+            {
+                "Arn": "arn:aws:s3:::{}".format(name) if service_name == "s3"
+                else "arn:aws:sqs:us-west-2:{}:{}".format(owner_id, name),
+                "OwningAccountId": owner_id,
+                "ResourceType": terms.get("resourcetype")
+            }
+            for owner_id, name in resources[start:end]
+        ]}
+        if end < len(resources):
+            response["NextToken"] = str(end)
+        return response
+
+    def config_select_aggregate_resource_config(
+            self, Expression, ConfigurationAggregatorName, MaxResults=100, NextToken=None, **kwargs
+    ):
+        service_name = "s3" if "AWS::S3::Bucket" in Expression else "sqs"
+        account_id = re.search(r"accountId = '(\d+)'", Expression)
+        resources = self.aggregated_resources(service_name, account_id.group(1) if account_id else None)
+        start = int(NextToken or 0)
+        end = min(start + MaxResults, len(resources))
+        response = {"Results": [
+            json.dumps({"accountId": owner_id, "resourceName": name, "configurationItemStatus": "OK"})
+            for owner_id, name in resources[start:end]
+        ]}
+        if end < len(resources):
+            response["NextToken"] = str(end)
+        return response
+
+    # S3 objects (the inventory snapshot)
+    def s3_put_object(self, Bucket, Key, Body, **kwargs):
+        body = Body if isinstance(Body, bytes) else Body.encode('utf-8')
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        self.objects[(Bucket, Key)] = (body, etag)
+        return {"ETag": etag}
+
+    def s3_get_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+        from botocore.exceptions import ClientError
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "Not Found"}}, "GetObject")
+        body, etag = self.objects[(Bucket, Key)]
+        if IfNoneMatch == etag:
+            raise ClientError({"Error": {"Code": "304", "Message": "Not Modified"}}, "GetObject")
+        return {"Body": io.BytesIO(body), "ETag": etag, "ContentLength": len(body)}
+
+    # DynamoDB (the grant expiry table), items keyed by table and (hash key, range key)
+    def dynamodb_batch_write_item(self, RequestItems, **kwargs):
+        with self.lock:
+            for table_name, requests in RequestItems.items():
+                table = self.items.setdefault(table_name, {})
+                for request in requests:
+                    if "PutRequest" in request:
+                        item = request["PutRequest"]["Item"]
+                        table[(item["file"]["S"], item["grant"]["S"])] = item
+                    else:
+                        key = request["DeleteRequest"]["Key"]
+                        table.pop((key["file"]["S"], key["grant"]["S"]), None)
+        return {"UnprocessedItems": {}}
+
+    def dynamodb_query(self, TableName, ExpressionAttributeValues, Limit=100, ExclusiveStartKey=None, **kwargs):
+        """
+        A query of the "due" index, the items of a status (:status) expiring until :until if set, by expiry, or
+        of the grants of an environment file (:file) with a grant key prefix (:prefix).
+        """
+        with self.lock:
+            if ":file" in ExpressionAttributeValues:
+                items = sorted(
+                    (item for (file_name, grant), item in self.items.get(TableName, {}).items()
+                     if file_name == ExpressionAttributeValues[":file"]["S"]
+                     and grant.startswith(ExpressionAttributeValues[":prefix"]["S"])),
+                    key=lambda item: item["grant"]["S"]
+                )
+            else:
+                until = float(ExpressionAttributeValues.get(":until", {"N": "inf"})["N"])
+                items = sorted(
+                    (item for item in self.items.get(TableName, {}).values()
+                     if item.get("status", {}).get("S") == ExpressionAttributeValues[":status"]["S"]
+                     and int(item["expires_at"]["N"]) <= until),
+                    key=lambda item: (int(item["expires_at"]["N"]), item["file"]["S"], item["grant"]["S"])
+                )
+        start = int(ExclusiveStartKey["position"]["N"]) if ExclusiveStartKey else 0
+        response = {"Items": items[start:start + Limit]}
+        if start + Limit < len(items):
+            response["LastEvaluatedKey"] = {"position": {"N": str(start + Limit)}}
+        return response
+
+    # Secrets Manager
+    def secretsmanager_get_secret_value(self, SecretId, **kwargs):
+        if "jira" in SecretId:
+            return {"SecretString": json.dumps({"username": "bot@example.com", "token": "token"})}
+        return {"SecretString": "token-{}".format(SecretId)}
+
+    # Bedrock
+    @staticmethod
+    def grant_environment_file(prompt: str, environment_file: str) -> str:
+        """
+        Adds the requested resources of the prompt to the variables of the environment file.
+        """
+        lines = environment_file.splitlines()
+        for permission, service_name, resource_name in re.findall(
+                r'Add (\w+) permission to the (\w+) resource named "([^"]+)"', prompt):
+            variable = "{}_{}_{}".format(service_name, permission, "buckets" if service_name == "s3" else "queues")
+            for position, line in enumerate(lines):
+                if re.match(r"\s*{}\s*= \[\]$".format(variable), line):
+                    lines[position] = line[:-2] + '["{}"]'.format(resource_name)
+                    break
+                if re.match(r"\s*{}\s*= \[$".format(variable), line):
+                    lines.insert(position + 1, '    "{}",'.format(resource_name))
+                    break
+        return "\n".join(lines) + "\n"
+
+    def bedrock_runtime_converse(self, modelId, messages, system=None, **kwargs):
+        prompt = messages[-1]['content'][0]['text']
+        environment_file = prompt.split("Terraform environment file:")[-1].strip() + "\n"
+        new_environment_file = self.grant_environment_file(prompt, environment_file)
+        if "UNIFIED DIFF" in (system or [{}])[0].get("text", ""):
+            text = "\n".join(difflib.unified_diff(
+                environment_file.splitlines(),
+                new_environment_file.splitlines(),
+                "a/environment.tf",
+                "b/environment.tf",
+                lineterm=""
+            ))
+        else:
+            text = new_environment_file
+        output_tokens = len(text) // 4
+        latency_ms = self.bedrock_latency_ms + self.bedrock_ms_per_output_token * output_tokens
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        return {
+            "output": {"message": {"content": [{"text": text}]}},
+            "usage": {"inputTokens": len(prompt) // 4, "outputTokens": output_tokens},
+            "metrics": {"latencyMs": int(latency_ms)}
+        }
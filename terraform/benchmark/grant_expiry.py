@@ -0,0 +1,128 @@
+"""
+Benchmark of the scheduled grant expiry.
+
+Records time-bound grants of the existing buckets of the environment files of fake_services in the in-memory
+expiry table, already due, spread over a number of environment files (the first --unmerged ones from a pull request
+that is still open), then drives the backend lambda with the
+{"expire_grants": true} event and reports the pull requests, Jira tickets and API calls of the revocation. A second
+run then finds the revocation pull requests merged and deletes their grants.
+
+Usage:
+    python grant_expiry.py --grants 500 --files 10 --rest-latency-ms 50
+    python grant_expiry.py --grants 100 --files 100 --json
+    python grant_expiry.py --grants 100 --files 10 --unmerged 20
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+BENCHMARK_PATH = os.path.dirname(os.path.abspath(__file__))
+BACKEND_PATH = os.path.join(BENCHMARK_PATH, "..", "backend")
+sys.path.insert(0, BACKEND_PATH)
+
+import fake_services  # noqa: E402
+from run_benchmark import BENCHMARK_ENVIRONMENT, FakeContext  # noqa: E402
+
+EXPIRY_TABLE_NAME = "aws-permissions-bot-grant-expiries"
+OPEN_PULL_REQUEST_NUMBER = 1000000
+
+
+def lambda_handler_event(lambda_function) -> dict:
+    return lambda_function.lambda_handler({"expire_grants": True}, FakeContext("expire-grants"))
+
+
+def run(options) -> dict:
+    os.environ.update(BENCHMARK_ENVIRONMENT, GRANT_EXPIRIES_TABLE_NAME=EXPIRY_TABLE_NAME)
+    os.environ.pop("TRACING_EMF_NAMESPACE", None)
+    grants_per_file = -(-options.grants // options.files)
+    rest_apis = fake_services.FakeRestApis(
+        latency_ms=options.rest_latency_ms,
+        environment_grants=grants_per_file,
+        accounts=options.files
+    )
+    fake_services.install_local_redirect(rest_apis.start())
+    aws = fake_services.FakeAws(accounts=options.files)
+    aws.install()
+    rest_apis.open_pull_requests.add(OPEN_PULL_REQUEST_NUMBER)
+
+    import GrantExpiries
+    import lambda_function
+    import Tracing
+    Tracing.Trace.emit = lambda trace: None
+
+    try:
+        expiry_store = GrantExpiries.ExpiryStore(table_name=EXPIRY_TABLE_NAME)
+        expired_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=1)
+        for index in range(options.grants):
+            account_name = fake_services.FakeAws.account_name(index % options.files)
+            expiry_store.record(
+                rest_apis.group_name,
+                account_name,
+                [("s3", "{}-existing-bucket-{}".format(account_name, index // options.files), "read")],
+                expired_at,
+                "user-{}".format(index),
+                "https://github.com/owner/environment/pull/{}".format(
+                    OPEN_PULL_REQUEST_NUMBER if index < options.unmerged else 0
+                )
+            )
+        rest_apis.calls.clear()
+        aws.calls.clear()
+        start = time.perf_counter()
+        response = lambda_handler_event(lambda_function)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        statuses = [item["status"]["S"] for item in aws.items.get(EXPIRY_TABLE_NAME, {}).values()]
+        report = {
+            "options": vars(options),
+            "response": response,
+            "duration_ms": round(elapsed_ms, 2),
+            "pull_requests": rest_apis.calls.get("github POST pulls", 0),
+            "jira_tickets": rest_apis.calls.get("jira POST /issue", 0),
+            "rest_calls": sum(rest_apis.calls.values()),
+            "aws_calls": sum(aws.calls.values()),
+            "pending_grants": statuses.count(GrantExpiries.STATUS_PENDING),
+            "revoking_grants": statuses.count(GrantExpiries.STATUS_REVOKING)
+        }
+        report["next_response"] = lambda_handler_event(lambda_function)
+        report["grants_after_next_run"] = len(aws.items.get(EXPIRY_TABLE_NAME, {}))
+        return report
+    finally:
+        aws.uninstall()
+        rest_apis.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AWS Permissions bot grant expiry benchmark")
+    parser.add_argument("--grants", type=int, default=200, help="Due time-bound grants")
+    parser.add_argument("--files", type=int, default=10, help="Environment files the grants are spread over")
+    parser.add_argument("--unmerged", type=int, default=0, help="Due grants whose pull request is still open")
+    parser.add_argument("--rest-latency-ms", type=float, default=20.0, help="GitHub/PagerDuty/Jira latency")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    options = parser.parse_args()
+
+    report = run(options)
+    if options.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(report["response"].get("body"))
+    print("{} grants in {} files: {} pull requests, {} Jira tickets, {} REST calls, {} AWS calls, {}ms".format(
+        options.grants,
+        options.files,
+        report["pull_requests"],
+        report["jira_tickets"],
+        report["rest_calls"],
+        report["aws_calls"],
+        report["duration_ms"]
+    ))
+    print("after the run: {} pending grants, {} revoking grants".format(
+        report["pending_grants"],
+        report["revoking_grants"]
+    ))
+    print(report["next_response"].get("body"))
+    print("grants after the next run: {}".format(report["grants_after_next_run"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark of the scheduled inventory sweep.
+
+Drives the backend lambda with the {"inventory_sweep": true} event against the in-memory AWS of fake_services,
+for several sweep concurrencies, then reports the snapshot size and how long a cold container takes to load it
+compared to the version 1 layout (a JSON list per listing).
+
+Usage:
+    python inventory_sweep.py --accounts 200 --buckets 1000 --queues 200 --aws-latency-ms 20
+    python inventory_sweep.py --concurrency 1 8 32 --json
+    python inventory_sweep.py --inventory-backend resource_explorer --concurrency 1
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+BENCHMARK_PATH = os.path.dirname(os.path.abspath(__file__))
+BACKEND_PATH = os.path.join(BENCHMARK_PATH, "..", "backend")
+sys.path.insert(0, BACKEND_PATH)
+
+import fake_services  # noqa: E402
+from run_benchmark import INVENTORY_BACKENDS  # noqa: E402
+
+
+def load_ms(data: bytes, loader, samples=5) -> float:
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        loader(data)
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(min(timings), 2)
+
+
+def run(options) -> dict:
+    aws = fake_services.FakeAws(
+        accounts=options.accounts,
+        buckets=options.buckets,
+        queues=options.queues,
+        latency_ms=options.aws_latency_ms
+    )
+    aws.install()
+    os.environ.update({"INVENTORY_BUCKET": "inventory", "INVENTORY_KEY": "inventory/snapshot.json.gz"})
+    os.environ.pop("TRACING_EMF_NAMESPACE", None)
+    os.environ.update(INVENTORY_BACKENDS[options.inventory_backend], AWS_INVENTORY_BACKEND=options.inventory_backend)
+
+    import Organizations
+    import InventoryIndex
+    import lambda_function
+    import Tracing
+    Tracing.Trace.emit = lambda trace: None
+
+    report = {"options": vars(options), "sweeps": []}
+    try:
+        for concurrency in options.concurrency:
+            os.environ["INVENTORY_SWEEP_CONCURRENCY"] = str(concurrency)
+            Organizations.ORGANIZATIONS_CACHE.update({"config": None, "organizations": []})
+            aws.calls.clear()
+            start = time.perf_counter()
+            response = lambda_function.lambda_handler({"inventory_sweep": True}, None)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if response.get("statusCode") != 200:
+                raise RuntimeError(response)
+            report["sweeps"].append({
+                "concurrency": concurrency,
+                "duration_ms": round(elapsed_ms, 2),
+                "aws_calls": sum(aws.calls.values())
+            })
+
+        data, _ = aws.objects[("inventory", "inventory/snapshot.json.gz")]
+        index = InventoryIndex.InventoryIndex.from_bytes(data)
+        # The same inventory in the version 1 layout
+        version_1 = dict(index.snapshot, version=1, resources={
+            account_name: {
+                service_name: index.resource_names(account_name, service_name) for service_name in services
+            }
+            for account_name, services in index.snapshot.get("resources").items()
+        })
+        version_1_data = gzip.compress(json.dumps(version_1, separators=(",", ":")).encode('utf-8'), compresslevel=6)
+        report["snapshot"] = {
+            "bytes": len(data),
+            "load_ms": load_ms(data, InventoryIndex.InventoryIndex.from_bytes),
+            "version_1_bytes": len(version_1_data),
+            "version_1_load_ms": load_ms(version_1_data, InventoryIndex.InventoryIndex.from_bytes),
+            "sweep": index.snapshot.get("sweep")
+        }
+    finally:
+        aws.uninstall()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AWS Permissions bot inventory sweep benchmark")
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--buckets", type=int, default=1000, help="S3 buckets per account")
+    parser.add_argument("--queues", type=int, default=200, help="SQS queues per account")
+    parser.add_argument("--aws-latency-ms", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--inventory-backend", choices=sorted(INVENTORY_BACKENDS), default="assume_role",
+                        help="AWS_INVENTORY_BACKEND listing the account resources")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    options = parser.parse_args()
+
+    report = run(options)
+    if options.json:
+        print(json.dumps(report, indent=2))
+        return
+    print("{:>12} {:>12} {:>10}".format("concurrency", "sweep ms", "AWS calls"))
+    for sweep in report["sweeps"]:
+        print("{:>12} {:>12} {:>10}".format(sweep["concurrency"], sweep["duration_ms"], sweep["aws_calls"]))
+    snapshot = report["snapshot"]
+    print("\nsnapshot: {:.1f} KB gzip, cold load {}ms (version 1 layout: {:.1f} KB, {}ms)".format(
+        snapshot["bytes"] / 1024,
+        snapshot["load_ms"],
+        snapshot["version_1_bytes"] / 1024,
+        snapshot["version_1_load_ms"]
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Latency benchmark of the Slack external select options handler.
+
+Writes a synthetic inventory snapshot to the in-memory S3 of fake_services, then drives
+SlackInteractive.lambda_handler with block_suggestion payloads as a user types account and resource names.
+Slack drops an options request that is not answered within 3 seconds.
+
+Usage:
+    python options_latency.py --accounts 20 --resources 10000 --queries 200
+    python options_latency.py --resources 50000 --json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import urllib.parse
+
+BENCHMARK_PATH = os.path.dirname(os.path.abspath(__file__))
+BACKEND_PATH = os.path.join(BENCHMARK_PATH, "..", "backend")
+sys.path.insert(0, BACKEND_PATH)
+
+import fake_services  # noqa: E402
+
+TEAMS = ["payments", "search", "identity", "data", "platform", "mobile", "ads", "billing", "growth", "infra"]
+ENVIRONMENTS = ["prod", "staging", "dev", "sandbox"]
+PURPOSES = ["logs", "artifacts", "exports", "backups", "assets", "events", "reports", "uploads"]
+
+
+class FakeContext:
+    aws_request_id = "options-benchmark"
+
+
+def resource_names(count: int, seed: int) -> list:
+    generator = random.Random(seed)
+    return [
+        "{}-{}-{}-{}".format(
+            generator.choice(TEAMS),
+            generator.choice(ENVIRONMENTS),
+            generator.choice(PURPOSES),
+            index
+        )
+        for index in range(count)
+    ]
+
+
+def suggestion_event(action_id: str, value: str, account_name="", service_name="s3") -> dict:
+    view = {
+        "id": "V0001",
+        "callback_id": "aws_permissions_grant",
+        "state": {
+            "values": {
+                "account": {"account": {"type": "external_select", "selected_option": {"value": account_name}}},
+                "service": {"service": {"type": "static_select", "selected_option": {"value": service_name}}}
+            }
+        }
+    }
+    payload = {"type": "block_suggestion", "action_id": action_id, "block_id": action_id, "value": value, "view": view}
+    return {"body": urllib.parse.urlencode({"payload": json.dumps(payload)})}
+
+
+def typed_queries(names: list, count: int, seed: int) -> dict:
+    """
+    Returns the queries by kind: the keystrokes of a name, an infix, and a typo that only the fuzzy index matches.
+    """
+    generator = random.Random(seed)
+    queries = {"prefix": [], "infix": [], "typo": []}
+    for _ in range(count):
+        name = generator.choice(names)
+        queries["prefix"].append(name[:generator.randint(1, len(name))])
+        infix_start = generator.randint(1, max(1, len(name) - 4))
+        queries["infix"].append(name[infix_start:infix_start + 4])
+        position = generator.randint(0, len(name) - 2)
+        queries["typo"].append(name[:position] + name[position + 1] + name[position] + name[position + 2:] + "x")
+    return queries
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summary(values: list) -> dict:
+    return {
+        "samples": len(values),
+        "p50": round(percentile(values, 0.5), 2),
+        "p95": round(percentile(values, 0.95), 2),
+        "p99": round(percentile(values, 0.99), 2),
+        "max": round(max(values), 2),
+        "mean": round(statistics.mean(values), 2)
+    }
+
+
+def run(options) -> dict:
+    aws = fake_services.FakeAws(latency_ms=options.aws_latency_ms)
+    aws.install()
+    os.environ.update({"INVENTORY_BUCKET": "inventory", "INVENTORY_KEY": "inventory/snapshot.json.gz"})
+    os.environ.pop("TRACING_EMF_NAMESPACE", None)
+
+    import InventoryIndex
+    import SlackInteractive
+    import Tracing
+    Tracing.Trace.emit = lambda trace: None
+
+    accounts = {fake_services.FakeAws.account_name(index): fake_services.FakeAws.account_id(index)
+                for index in range(options.accounts)}
+    resources = {
+        account_name: {
+            "s3": resource_names(options.resources, seed=index),
+            "sqs": resource_names(options.resources // 10, seed=index + 100000)
+        }
+        for index, account_name in enumerate(accounts)
+    }
+    index = InventoryIndex.InventoryIndex(InventoryIndex.InventoryIndex.build_snapshot(accounts, resources))
+    start = time.perf_counter()
+    snapshot_bytes = index.to_bytes()
+    compress_ms = (time.perf_counter() - start) * 1000
+    index.save("inventory", "inventory/snapshot.json.gz")
+
+    def call(event) -> float:
+        start = time.perf_counter()
+        response = SlackInteractive.lambda_handler(event, FakeContext())
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if response.get("statusCode") != 200:
+            raise RuntimeError(response)
+        return elapsed_ms
+
+    report = {"options": vars(options), "snapshot_bytes": len(snapshot_bytes), "compress_ms": round(compress_ms, 2)}
+    try:
+        # The first request of a container downloads and parses the snapshot
+        InventoryIndex.INVENTORY_INDEX_CACHE.clear()
+        report["cold_load_ms"] = round(call(suggestion_event("account", "")), 2)
+
+        account_queries = typed_queries(list(accounts), options.queries, seed=1)
+        report["accounts_ms"] = {
+            kind: summary([call(suggestion_event("account", query)) for query in queries])
+            for kind, queries in account_queries.items()
+        }
+        account_name = next(iter(accounts))
+        resource_queries = typed_queries(resources[account_name]["s3"], options.queries, seed=2)
+        report["resources_ms"] = {
+            kind: summary([call(suggestion_event("resources", query, account_name)) for query in queries])
+            for kind, queries in resource_queries.items()
+        }
+    finally:
+        aws.uninstall()
+    report["s3_calls"] = dict(aws.calls)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AWS Permissions bot options handler benchmark")
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--resources", type=int, default=10000, help="S3 buckets per account, a tenth as many queues")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per kind")
+    parser.add_argument("--aws-latency-ms", type=float, default=0.0, help="S3 latency of the snapshot download")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    options = parser.parse_args()
+
+    report = run(options)
+    if options.json:
+        print(json.dumps(report, indent=2))
+        return
+    print("snapshot: {:.1f} KB gzip ({:.0f}ms to compress) - cold load: {}ms".format(
+        report["snapshot_bytes"] / 1024,
+        report["compress_ms"],
+        report["cold_load_ms"]
+    ))
+    print("\n{:<22} {:>8} {:>8} {:>8} {:>8}".format("query", "p50 ms", "p95 ms", "p99 ms", "max ms"))
+    for picker in ("accounts_ms", "resources_ms"):
+        for kind, timings in report[picker].items():
+            print("{:<22} {:>8} {:>8} {:>8} {:>8}".format(
+                "{} {}".format(picker.split("_")[0], kind),
+                timings["p50"],
+                timings["p95"],
+                timings["p99"],
+                timings["max"]
+            ))
+    print("\nAWS calls: {}".format(report["s3_calls"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Offline benchmark of the backend lambda.
+
+Drives lambda_handler with synthetic Slack payloads against the local stand-ins of fake_services,
+and reports the per-stage timings collected by Tracing and the API calls per request.
+
+Usage:
+    python run_benchmark.py --requests 20 --command grant --rest-latency-ms 50 --aws-latency-ms 20 \
+        --bedrock-latency-ms 2000 --accounts 200 --buckets 1000 --okta-groups 50
+    python run_benchmark.py --command list --buckets 20000 --list-options "--prefix bucket-1 --limit 20"
+    python run_benchmark.py --command grant --inventory-snapshot
+    python run_benchmark.py --command grant --accounts 500 --inventory-backend resource_explorer
+    python run_benchmark.py --command grant --bedrock-ms-per-output-token 15 --bedrock-output-mode file
+    python run_benchmark.py --json > before.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.parse
+
+BACKEND_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND_PATH)
+
+import fake_services  # noqa: E402
+
+BENCHMARK_ENVIRONMENT = {
+    "DOMAIN": "example.com",
+    "SECRETS_MANAGER_OKTA_TOKEN_ARN": "okta-token",
+    "OKTA_ORGANIZATION_NAME": "example",
+    "SECRETS_MANAGER_GITHUB_TOKEN_ARN": "github-token",
+    "GITHUB_OWNER": "owner",
+    "TERRAFORM_ENVIRONMENT_REPOSITORY_NAME": "environment",
+    "TERRAFORM_MODULE_REPOSITORY_NAME": "modules",
+    "TERRAFORM_ENVIRONMENT_SSO_ACCOUNT_PATH": "terraform-environments/sso-account",
+    "TERRAFORM_MODULE_SSO_PATH": "terraform-modules/sso",
+    "SECRETS_MANAGER_PD_TOKEN_ARN": "pagerduty-token",
+    "PAGER_DUTY_SCHEDULE_ID": "PSCHEDULE",
+    "SECRETS_MANAGER_JIRA_TOKEN_ARN": "jira-token",
+    "JIRA_PROJECT_KEY": "SEC",
+    "JIRA_ISSUE_TYPE": "10001",
+    "JIRA_ORGANIZATION_NAME": "example"
+}
+
+# The environment of each AWS_INVENTORY_BACKEND
+INVENTORY_BACKENDS = {
+    "assume_role": {},
+    "resource_explorer": {
+        "RESOURCE_EXPLORER_VIEW_ARN": "arn:aws:resource-explorer-2:us-west-2:123456789012:view/organization/benchmark"
+    },
+    "config": {"CONFIG_AGGREGATOR_NAME": "organization"}
+}
+
+
+class FakeContext:
+    def __init__(self, request_id: str, timeout_ms=180000):
+        self.aws_request_id = request_id
+        self.__deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int((self.__deadline - time.monotonic()) * 1000)
+
+
+def slack_event(command: str, user_name="jane.doe") -> dict:
+    return {
+        "body": urllib.parse.urlencode({
+            "response_url": "https://hooks.slack.com/commands/T000/1/benchmark",
+            "text": command,
+            "user_name": user_name
+        })
+    }
+
+
+def build_command(command: str, index: int, accounts: int, buckets: int, list_options="") -> str:
+    account_name = fake_services.FakeAws.account_name(index % accounts)
+    if command == "help":
+        return "help"
+    if command == "list":
+        return "list -s s3 -a {} {}".format(account_name, list_options).strip()
+    # Distinct resources so the grants are not coalesced
+    return "grant -s s3 -p read -a {} -r bucket-{}".format(account_name, index % buckets)
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run(options) -> dict:
+    os.environ.update(BENCHMARK_ENVIRONMENT)
+    os.environ.pop("STATUS_TABLE_NAME", None)
+    os.environ.pop("TRACING_EMF_NAMESPACE", None)
+    os.environ.pop("INVENTORY_BUCKET", None)
+    os.environ.update(INVENTORY_BACKENDS[options.inventory_backend], AWS_INVENTORY_BACKEND=options.inventory_backend)
+    os.environ["BEDROCK_OUTPUT_MODE"] = options.bedrock_output_mode
+
+    rest_apis = fake_services.FakeRestApis(
+        latency_ms=options.rest_latency_ms,
+        okta_groups=options.okta_groups,
+        environment_grants=options.environment_grants,
+        accounts=options.accounts
+    )
+    fake_services.install_local_redirect(rest_apis.start())
+    aws = fake_services.FakeAws(
+        accounts=options.accounts,
+        organizational_units=options.organizational_units,
+        buckets=options.buckets,
+        queues=options.queues,
+        latency_ms=options.aws_latency_ms,
+        bedrock_latency_ms=options.bedrock_latency_ms,
+        bedrock_ms_per_output_token=options.bedrock_ms_per_output_token
+    )
+    aws.install()
+
+    import BedrockRouter
+    import Tracing
+    import lambda_function
+    BedrockRouter.MODEL_STATS.clear()
+
+    breakdowns = []
+    original_emit = Tracing.Trace.emit
+
+    def collect(trace):
+        breakdowns.append(trace.breakdown())
+    Tracing.Trace.emit = collect
+
+    responses = []
+    try:
+        if options.inventory_snapshot:
+            # Requests validate resources against a fresh snapshot, the sweep itself is not measured
+            os.environ["INVENTORY_BUCKET"] = "inventory"
+            lambda_function.lambda_handler({"inventory_sweep": True}, FakeContext("benchmark-sweep"))
+            breakdowns.clear()
+            aws.calls.clear()
+        for index in range(options.requests):
+            command = build_command(options.command, index, options.accounts, options.buckets, options.list_options)
+            response = lambda_function.lambda_handler(
+                slack_event(command),
+                FakeContext("benchmark-{}".format(index))
+            )
+            responses.append(response.get("body", ""))
+    finally:
+        Tracing.Trace.emit = original_emit
+        aws.uninstall()
+        rest_apis.stop()
+
+    stages = {}
+    for breakdown in breakdowns:
+        for name, duration_ms in breakdown["totals_ms"].items():
+            stages.setdefault(name, []).append(duration_ms)
+    bedrock_stats = BedrockRouter.BedrockRouter.stats().values()
+    api_calls = dict(rest_apis.calls)
+    api_calls.update(aws.calls)
+    return {
+        "options": vars(options),
+        "errors": sum(1 for body in responses if body.startswith("AWS Permissions bot Error")),
+        "stages_ms": {
+            name: {
+                "p50": round(percentile(durations, 0.5), 2),
+                "p95": round(percentile(durations, 0.95), 2),
+                "mean": round(statistics.mean(durations), 2),
+                "calls_per_request": round(len(durations) / max(1, len(breakdowns)), 2)
+            }
+            for name, durations in sorted(stages.items())
+        },
+        "api_calls_per_request": {
+            name: round(count / options.requests, 2) for name, count in sorted(api_calls.items())
+        },
+        "api_calls_total": sum(api_calls.values()),
+        "bedrock_tokens_per_request": {
+            name: round(sum(stats[name] for stats in bedrock_stats) / options.requests, 1)
+            for name in ("input_tokens", "output_tokens")
+        }
+    }
+
+
+def print_report(report: dict):
+    print("requests: {} - errors: {}".format(report["options"]["requests"], report["errors"]))
+    print("\n{:<60} {:>10} {:>10} {:>10}".format("stage", "p50 ms", "p95 ms", "mean ms"))
+    for name, timings in report["stages_ms"].items():
+        print("{:<60} {:>10} {:>10} {:>10}".format(name, timings["p50"], timings["p95"], timings["mean"]))
+    print("\n{:<60} {:>10}".format("api call", "per req"))
+    for name, count in report["api_calls_per_request"].items():
+        print("{:<60} {:>10}".format(name, count))
+    print("\ntotal api calls: {}".format(report["api_calls_total"]))
+    print("bedrock tokens per request: {input_tokens} input, {output_tokens} output".format(
+        **report["bedrock_tokens_per_request"]
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AWS Permissions bot offline benchmark")
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--command", choices=["grant", "list", "help"], default="grant")
+    parser.add_argument("--rest-latency-ms", type=float, default=0.0, help="Okta/GitHub/PagerDuty/Jira/Slack latency")
+    parser.add_argument("--aws-latency-ms", type=float, default=0.0, help="AWS API latency")
+    parser.add_argument("--bedrock-latency-ms", type=float, default=0.0, help="Extra Bedrock generation latency")
+    parser.add_argument("--bedrock-ms-per-output-token", type=float, default=0.0,
+                        help="Bedrock generation time per output token")
+    parser.add_argument("--bedrock-output-mode", choices=["patch", "file"], default="patch",
+                        help="BEDROCK_OUTPUT_MODE, a unified diff or the whole environment file")
+    parser.add_argument("--accounts", type=int, default=50, help="Accounts in the organization")
+    parser.add_argument("--organizational-units", type=int, default=10)
+    parser.add_argument("--buckets", type=int, default=100, help="S3 buckets per account")
+    parser.add_argument("--queues", type=int, default=100, help="SQS queues per account")
+    parser.add_argument("--okta-groups", type=int, default=20, help="Okta groups per user")
+    parser.add_argument("--environment-grants", type=int, default=20, help="Existing grants per environment file")
+    parser.add_argument("--list-options", default="", help="Extra list options, e.g. \"--prefix bucket-1 --limit 20\"")
+    parser.add_argument("--inventory-backend", choices=sorted(INVENTORY_BACKENDS), default="assume_role",
+                        help="AWS_INVENTORY_BACKEND listing the account resources")
+    parser.add_argument("--inventory-snapshot", action="store_true", help="Sweep the inventory snapshot first")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    options = parser.parse_args()
+
+    report = run(options)
+    if options.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
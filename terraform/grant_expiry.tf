@@ -0,0 +1,61 @@
+# Expiry per time-bound grant (grant --expires), the sparse "due" index holds the pending ones by expiry
+resource "aws_dynamodb_table" "grant_expiries_table" {
+  name         = "${var.backend_lambda_name}-grant-expiries"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "file"
+  range_key    = "grant"
+
+  attribute {
+    name = "file"
+    type = "S"
+  }
+
+  attribute {
+    name = "grant"
+    type = "S"
+  }
+
+  attribute {
+    name = "status"
+    type = "S"
+  }
+
+  attribute {
+    name = "expires_at"
+    type = "N"
+  }
+
+  global_secondary_index {
+    name            = "due"
+    hash_key        = "status"
+    range_key       = "expires_at"
+    projection_type = "ALL"
+  }
+
+  tags = var.tags
+}
+
+# Revoke the expired grants on a schedule, one pull request and one Jira ticket per environment file
+resource "aws_cloudwatch_event_rule" "grant_expiry" {
+  count               = var.grant_expiry_schedule == "" ? 0 : 1
+  name                = "${var.backend_lambda_name}-grant-expiry"
+  description         = "Grant expiry of ${var.backend_lambda_name}"
+  schedule_expression = var.grant_expiry_schedule
+  tags                = var.tags
+}
+
+resource "aws_cloudwatch_event_target" "grant_expiry" {
+  count = var.grant_expiry_schedule == "" ? 0 : 1
+  rule  = aws_cloudwatch_event_rule.grant_expiry[0].name
+  arn   = aws_lambda_function.backend_function.arn
+  input = jsonencode({ expire_grants = true })
+}
+
+resource "aws_lambda_permission" "grant_expiry_permission" {
+  count         = var.grant_expiry_schedule == "" ? 0 : 1
+  statement_id  = "AllowEventBridgeGrantExpiryInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.backend_function.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.grant_expiry[0].arn
+}
@@ -0,0 +1,174 @@
+# Inventory snapshot of the organization accounts and resources, served to the Slack modal pickers
+resource "aws_s3_bucket" "inventory_bucket" {
+  bucket_prefix = "${var.backend_lambda_name}-inventory-"
+  tags          = var.tags
+}
+
+resource "aws_s3_bucket_public_access_block" "inventory_bucket" {
+  bucket                  = aws_s3_bucket.inventory_bucket.id
+  block_public_acls       = true
+  block_public_policy     = true
+  ignore_public_acls      = true
+  restrict_public_buckets = true
+}
+
+resource "aws_s3_bucket_server_side_encryption_configuration" "inventory_bucket" {
+  bucket = aws_s3_bucket.inventory_bucket.id
+  rule {
+    apply_server_side_encryption_by_default {
+      sse_algorithm = "AES256"
+    }
+  }
+}
+
+# Every sweep writes a new version of the snapshot, a bad sweep can be rolled back to the previous one
+resource "aws_s3_bucket_versioning" "inventory_bucket" {
+  bucket = aws_s3_bucket.inventory_bucket.id
+  versioning_configuration {
+    status = "Enabled"
+  }
+}
+
+resource "aws_s3_bucket_lifecycle_configuration" "inventory_bucket" {
+  depends_on = [aws_s3_bucket_versioning.inventory_bucket]
+  bucket     = aws_s3_bucket.inventory_bucket.id
+  rule {
+    id     = "expire-previous-snapshots"
+    status = "Enabled"
+    filter {}
+    noncurrent_version_expiration {
+      noncurrent_days = 7
+    }
+  }
+  rule {
+    id     = "expire-profiles"
+    status = "Enabled"
+    filter {
+      prefix = "profiles/"
+    }
+    expiration {
+      days = 7
+    }
+  }
+}
+
+# Sweep every account into the snapshot on a schedule, requests then validate resources without listing them
+resource "aws_cloudwatch_event_rule" "inventory_sweep" {
+  name                = "${var.backend_lambda_name}-inventory-sweep"
+  description         = "Inventory sweep of ${var.backend_lambda_name}"
+  schedule_expression = var.inventory_sweep_schedule
+  tags                = var.tags
+}
+
+resource "aws_cloudwatch_event_target" "inventory_sweep" {
+  rule  = aws_cloudwatch_event_rule.inventory_sweep.name
+  arn   = aws_lambda_function.backend_function.arn
+  input = jsonencode({ inventory_sweep = true })
+}
+
+resource "aws_lambda_permission" "inventory_sweep_permission" {
+  statement_id  = "AllowEventBridgeInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.backend_function.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.inventory_sweep.arn
+}
+
+# Create log group for lambda logs
+resource "aws_cloudwatch_log_group" "interactive_func_log_group" {
+  name              = "/aws/lambda/${var.interactive_lambda_name}"
+  retention_in_days = var.lambda_logs_retention
+}
+
+# Create Lambda role
+resource "aws_iam_role" "interactive_func_role" {
+  name = "${var.interactive_lambda_name}-role"
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Sid    = "LambdaTrustedPolicy"
+        Effect = "Allow"
+        Principal = {
+          Service = "lambda.amazonaws.com"
+        },
+        Action = "sts:AssumeRole"
+      },
+    ]
+  })
+
+  managed_policy_arns = [
+    "arn:aws:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole"
+  ]
+
+  inline_policy {
+    name = "${var.interactive_lambda_name}-role"
+    policy = jsonencode({
+      Version = "2012-10-17",
+      Statement = [
+        {
+          Sid      = "AllowReadInventory",
+          Effect   = "Allow",
+          Action   = ["s3:GetObject"],
+          Resource = ["${aws_s3_bucket.inventory_bucket.arn}/*"]
+        },
+        {
+          Sid      = "AllowInvokeLambda",
+          Effect   = "Allow",
+          Action   = ["lambda:InvokeFunction"],
+          Resource = [aws_lambda_function.backend_function.arn]
+        },
+        {
+          Sid      = "AllowSendJobs",
+          Effect   = "Allow",
+          Action   = ["sqs:SendMessage"],
+          Resource = [aws_sqs_queue.jobs_queue.arn]
+        },
+        {
+          Sid      = "AllowJobsStatus",
+          Effect   = "Allow",
+          Action   = ["dynamodb:PutItem", "dynamodb:DeleteItem"],
+          Resource = [aws_dynamodb_table.jobs_status_table.arn]
+        }
+      ]
+    })
+  }
+  tags = var.tags
+}
+
+# Create function, deployed from the backend package with its own handler so option requests never wait
+# behind grant requests
+resource "aws_lambda_function" "interactive_function" {
+  depends_on       = [aws_cloudwatch_log_group.interactive_func_log_group]
+  function_name    = var.interactive_lambda_name
+  description      = "Slack interactivity and options Lambda function for ${var.backend_lambda_name}"
+  filename         = "${path.module}/backend.zip"
+  handler          = "SlackInteractive.lambda_handler"
+  role             = aws_iam_role.interactive_func_role.arn
+  runtime          = "python3.12"
+  timeout          = 10
+  memory_size      = 1024
+  architectures    = ["x86_64"]
+  source_code_hash = data.archive_file.lambda.output_base64sha256
+  tags             = var.tags
+  environment {
+    variables = {
+      LAMBDA_NAME                 = var.backend_lambda_name
+      QUEUE_URL                   = aws_sqs_queue.jobs_queue.url
+      STATUS_TABLE_NAME           = aws_dynamodb_table.jobs_status_table.name
+      INVENTORY_BUCKET            = aws_s3_bucket.inventory_bucket.id
+      INVENTORY_KEY               = "inventory/snapshot.json.gz"
+      INVENTORY_INDEX_TTL_SECONDS = 60
+      TRACING_EMF_NAMESPACE       = "AWSPermissionsBot"
+      AWS_ORGANIZATIONS           = length(var.organizations) == 0 ? "" : jsonencode(var.organizations)
+    }
+  }
+}
+
+resource "aws_lambda_permission" "api_gateway_interactive_permission" {
+  statement_id  = "AllowAPIGatewayInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.interactive_function.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_api_gateway_rest_api.api.execution_arn}/*/*"
+}
@@ -1,16 +1,338 @@
+import time
+INIT_START = time.perf_counter()
 import boto3
+import botocore.config
+from botocore.exceptions import BotoCoreError, ClientError
+import datetime
+import functools
+import hashlib
 import json
 import os
+import urllib.parse
+import urllib.request
+import logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
 
+# The only Slack fields the backend uses, the rest of the API Gateway event is not forwarded
+SLACK_FIELDS = ("response_url", "text", "user_name")
 
+# Slack drops the command after 3 seconds, fail fast instead of retrying into the deadline
+CLIENT_CONFIG = botocore.config.Config(
+    connect_timeout=1,
+    read_timeout=2,
+    retries={"mode": "standard", "max_attempts": 2}
+)
+
+# Created during init so warm invocations reuse the clients and their connections
+QUEUE_URL = os.getenv('QUEUE_URL')
+if QUEUE_URL:
+    SQS_CLIENT = boto3.client('sqs', config=CLIENT_CONFIG)
+    DYNAMODB_CLIENT = boto3.client('dynamodb', config=CLIENT_CONFIG)
+    LAMBDA_CLIENT = None
+else:
+    SQS_CLIENT = None
+    DYNAMODB_CLIENT = None
+    LAMBDA_CLIENT = boto3.client('lambda', config=CLIENT_CONFIG)
+
+# The bot token is only needed to open the grant modal
+SLACK_BOT_TOKEN_SECRET_ARN = os.getenv('SLACK_BOT_TOKEN_SECRET_ARN')
+SECRETS_CLIENT = boto3.client('secretsmanager', config=CLIENT_CONFIG) if SLACK_BOT_TOKEN_SECRET_ARN else None
+SLACK_BOT_TOKEN = {}
+
+# Must match the block IDs read by the backend SlackInteractive handler
+GRANT_MODAL_CALLBACK_ID = "aws_permissions_grant"
+MODAL_COMMANDS = ("", "request")
+
+INIT_MS = (time.perf_counter() - INIT_START) * 1000
+COLD_START = True
+
+
+def measure_ack(handler):
+    """
+    Logs the time to acknowledge the Slack command, with CloudWatch EMF metrics if TRACING_EMF_NAMESPACE is set.
+    """
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        global COLD_START
+        start = time.perf_counter()
+        cold_start = COLD_START
+        COLD_START = False
+        try:
+            return handler(event, context)
+        finally:
+            ack = {
+                "ack_ms": round((time.perf_counter() - start) * 1000, 2),
+                "cold_start": cold_start,
+                "init_ms": round(INIT_MS, 2) if cold_start else 0
+            }
+            logger.info(json.dumps(ack))
+            emf_namespace = os.getenv("TRACING_EMF_NAMESPACE")
+            if emf_namespace:
+                emf_document = {
+                    "_aws": {
+                        "Timestamp": int(time.time() * 1000),
+                        "CloudWatchMetrics": [
+                            {
+                                "Namespace": emf_namespace,
+                                "Dimensions": [["cold_start"]],
+                                "Metrics": [
+                                    {"Name": "ack_ms", "Unit": "Milliseconds"},
+                                    {"Name": "init_ms", "Unit": "Milliseconds"}
+                                ]
+                            }
+                        ]
+                    },
+                    "cold_start": str(cold_start).lower()
+                }
+                emf_document.update(ack)
+                print(json.dumps(emf_document))
+    return wrapper
+
+
+def parse_slack_fields(body: str, fields=SLACK_FIELDS) -> dict:
+    """
+    Returns the Slack fields the backend uses from the slash command body.
+    """
+    slack_payload = urllib.parse.parse_qs(body or "")
+    return {field: slack_payload.get(field, [""])[0] for field in fields}
+
+
+def grant_modal(private_metadata: str) -> dict:
+    """
+    Returns the grant modal, the account and resource options are served by the SlackInteractive handler.
+    """
+    def plain_text(text: str) -> dict:
+        return {"type": "plain_text", "text": text}
+
+    return {
+        "type": "modal",
+        "callback_id": GRANT_MODAL_CALLBACK_ID,
+        "private_metadata": private_metadata,
+        "title": plain_text("AWS Permissions"),
+        "submit": plain_text("Request"),
+        "close": plain_text("Cancel"),
+        "blocks": [
+            {
+                "type": "input",
+                "block_id": "account",
+                "label": plain_text("Account"),
+                "element": {
+                    "type": "external_select",
+                    "action_id": "account",
+                    "placeholder": plain_text("Type an account name"),
+                    "min_query_length": 0
+                }
+            },
+            {
+                "type": "input",
+                "block_id": "service",
+                "label": plain_text("Service"),
+                "element": {
+                    "type": "static_select",
+                    "action_id": "service",
+                    "initial_option": {"text": plain_text("s3"), "value": "s3"},
+                    "options": [
+                        {"text": plain_text("s3"), "value": "s3"},
+                        {"text": plain_text("sqs"), "value": "sqs"}
+                    ]
+                }
+            },
+            {
+                "type": "input",
+                "block_id": "resources",
+                "label": plain_text("Resources"),
+                "element": {
+                    "type": "multi_external_select",
+                    "action_id": "resources",
+                    "placeholder": plain_text("Type a resource name"),
+                    "min_query_length": 0
+                }
+            },
+            {
+                "type": "input",
+                "block_id": "permission",
+                "label": plain_text("Permission"),
+                "element": {
+                    "type": "plain_text_input",
+                    "action_id": "permission",
+                    "placeholder": plain_text("read, write...")
+                }
+            },
+            {
+                "type": "input",
+                "block_id": "permission_set_name",
+                "label": plain_text("Permission Set Name"),
+                "optional": True,
+                "element": {"type": "plain_text_input", "action_id": "permission_set_name"}
+            }
+        ]
+    }
+
+
+def open_grant_modal(trigger_id: str, slack_fields: dict) -> bool:
+    """
+    Opens the grant modal, the trigger ID of the slash command is only valid for 3 seconds.
+    """
+    try:
+        if not SLACK_BOT_TOKEN:
+            SLACK_BOT_TOKEN["token"] = SECRETS_CLIENT.get_secret_value(
+                SecretId=SLACK_BOT_TOKEN_SECRET_ARN
+            ).get("SecretString")
+    except ClientError as e:
+        logger.error("open_grant_modal: {}".format(e))
+        return False
+    private_metadata = json.dumps({
+        "response_url": slack_fields.get("response_url"),
+        "user_name": slack_fields.get("user_name")
+    })
+    request = urllib.request.Request(
+        url="https://slack.com/api/views.open",
+        data=json.dumps({"trigger_id": trigger_id, "view": grant_modal(private_metadata)}).encode('utf-8'),
+        headers={
+            "Content-Type": "application/json; charset=utf-8",
+            "Authorization": "Bearer {}".format(SLACK_BOT_TOKEN["token"])
+        },
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=2) as response:
+            result = json.loads(response.read())
+    except Exception as e:
+        logger.error("open_grant_modal: {}".format(e))
+        return False
+    if not result.get("ok"):
+        logger.error("open_grant_modal: {}".format(result.get("error")))
+        return False
+    return True
+
+
+def get_request_id(user_name: str, command: str, dedup_window_seconds: int) -> str:
+    """
+    Identical commands from the same user within the dedup window share a request ID.
+    """
+    window = int(time.time() // dedup_window_seconds)
+    return hashlib.sha256("{}|{}|{}".format(user_name, command.strip(), window).encode('utf-8')).hexdigest()[:12]
+
+
+def get_status(status_table_name: str, request_id: str) -> str:
+    item = DYNAMODB_CLIENT.get_item(
+        TableName=status_table_name,
+        Key={"request_id": {"S": request_id}},
+        ConsistentRead=True
+    ).get("Item")
+    # The coalescing records (grant#...) share the table but are not requests
+    if not item or "status" not in item:
+        return "AWS Permissions bot - request {} was not found".format(request_id)
+    status = "AWS Permissions bot - request {} is {} (updated at {})".format(
+        request_id,
+        item.get("status").get("S"),
+        item.get("updated_at", {}).get("S", "unknown")
+    )
+    if item.get("message", {}).get("S"):
+        status += "\n{}".format(item.get("message").get("S"))
+    return status
+
+
+@measure_ack
 def lambda_handler(event, context):
-    client = boto3.client('lambda')
     lambda_name = os.getenv('LAMBDA_NAME')
-    client.invoke(
-        FunctionName=lambda_name,
-        InvocationType='Event',
-        Payload=json.dumps(event)
-    )
+    status_table_name = os.getenv('STATUS_TABLE_NAME')
+    dedup_window_seconds = int(os.getenv('DEDUP_WINDOW_SECONDS', '300'))
+
+    slack_fields = parse_slack_fields(event.get("body"))
+    user_name = slack_fields.get("user_name")
+    command = slack_fields.get("text")
+
+    # No arguments - open the grant modal
+    if SLACK_BOT_TOKEN_SECRET_ARN and command.strip() in MODAL_COMMANDS:
+        trigger_id = parse_slack_fields(event.get("body"), fields=("trigger_id",)).get("trigger_id")
+        if open_grant_modal(trigger_id, slack_fields):
+            return {
+                'statusCode': 200,
+                'body': ""
+            }
+        return {
+            'statusCode': 200,
+            'body': "AWS Permissions bot Error - Failed to open the request form, use /aws_permissions help"
+        }
+
+    # Status command - answered synchronously from the status table, the backend has no status command
+    command_parts = command.split()
+    if command_parts and command_parts[0] == "status":
+        if not QUEUE_URL or not status_table_name:
+            return {
+                'statusCode': 200,
+                'body': "AWS Permissions bot - status tracking is not enabled, the result of a request is posted here"
+            }
+        if len(command_parts) != 2:
+            return {
+                'statusCode': 200,
+                'body': "AWS Permissions bot Error - Invalid command, use /aws_permissions status <request-id>"
+            }
+        return {
+            'statusCode': 200,
+            'body': get_status(status_table_name, command_parts[1])
+        }
+
+    # No queue configured - hand the request directly to the backend
+    if not QUEUE_URL:
+        LAMBDA_CLIENT.invoke(
+            FunctionName=lambda_name,
+            InvocationType='Event',
+            Payload=json.dumps({"slack": slack_fields})
+        )
+        return {
+            'statusCode': 200,
+            'body': "AWS Permissions bot - working on it, the result will be posted here"
+        }
+
+    request_id = get_request_id(user_name, command, dedup_window_seconds)
+    expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=7)
+    try:
+        # Only a queued or running request is a duplicate, a finished one can be run again
+        DYNAMODB_CLIENT.put_item(
+            TableName=status_table_name,
+            Item={
+                "request_id": {"S": request_id},
+                "status": {"S": "queued"},
+                "user_name": {"S": user_name},
+                "command": {"S": command},
+                "message": {"S": ""},
+                "updated_at": {"S": datetime.datetime.now(datetime.timezone.utc).isoformat()},
+                "expires_at": {"N": str(int(expires_at.timestamp()))}
+            },
+            ConditionExpression="attribute_not_exists(request_id) OR NOT #status IN (:queued, :running)",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={":queued": {"S": "queued"}, ":running": {"S": "running"}}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return {
+            'statusCode': 200,
+            'body': "AWS Permissions bot - the same request is already in progress, "
+                    "check it with /aws_permissions status {}".format(request_id)
+        }
+
+    try:
+        SQS_CLIENT.send_message(
+            QueueUrl=QUEUE_URL,
+            MessageBody=json.dumps({"request_id": request_id, "slack": slack_fields})
+        )
+    except (BotoCoreError, ClientError) as e:
+        logger.error("lambda_handler: {}".format(e))
+        # The request was never queued, a retry must not be taken for a duplicate
+        try:
+            DYNAMODB_CLIENT.delete_item(TableName=status_table_name, Key={"request_id": {"S": request_id}})
+        except (BotoCoreError, ClientError) as delete_error:
+            logger.error("lambda_handler: {}".format(delete_error))
+        return {
+            'statusCode': 200,
+            'body': "AWS Permissions bot Error - Failed to queue the request, please try again"
+        }
     return {
-        'statusCode': 200
+        'statusCode': 200,
+        'body': "AWS Permissions bot - working on it, request {} was queued, "
+                "check it with /aws_permissions status {}".format(request_id, request_id)
     }
@@ -29,18 +29,44 @@ resource "aws_iam_role" "invocation_func_role" {
     name = "${var.invocation_lambda_name}-role"
     policy = jsonencode({
       Version = "2012-10-17",
-      Statement = [
-        {
-          Sid    = "AllowInvokeLambda",
-          Effect = "Allow",
-          Action = [
-            "lambda:InvokeFunction"
-          ],
-          Resource = [
-            aws_lambda_function.backend_function.arn
-          ]
-        }
-      ]
+      Statement = concat(
+        [
+          {
+            Sid    = "AllowInvokeLambda",
+            Effect = "Allow",
+            Action = [
+              "lambda:InvokeFunction"
+            ],
+            Resource = [
+              aws_lambda_function.backend_function.arn
+            ]
+          },
+          {
+            Sid      = "AllowSendJobs",
+            Effect   = "Allow",
+            Action   = ["sqs:SendMessage"],
+            Resource = [aws_sqs_queue.jobs_queue.arn]
+          },
+          {
+            Sid    = "AllowJobsStatus",
+            Effect = "Allow",
+            Action = [
+              "dynamodb:GetItem",
+              "dynamodb:PutItem",
+              "dynamodb:DeleteItem"
+            ],
+            Resource = [aws_dynamodb_table.jobs_status_table.arn]
+          }
+        ],
+        var.slack_bot_token_secret_arn == "" ? [] : [
+          {
+            Sid      = "AllowReadSlackBotToken",
+            Effect   = "Allow",
+            Action   = ["secretsmanager:GetSecretValue"],
+            Resource = [var.slack_bot_token_secret_arn]
+          }
+        ]
+      )
     })
   }
   tags = var.tags
@@ -63,11 +89,16 @@ resource "aws_lambda_function" "invocation_function" {
   runtime          = "python3.12"
   timeout          = 180
   architectures    = ["x86_64"]
-  source_code_hash = data.archive_file.lambda.output_base64sha256
+  source_code_hash = data.archive_file.invocation_lambda.output_base64sha256
   tags             = var.tags
   environment {
     variables = {
-      LAMBDA_NAME = var.backend_lambda_name
+      LAMBDA_NAME                = var.backend_lambda_name
+      QUEUE_URL                  = aws_sqs_queue.jobs_queue.url
+      STATUS_TABLE_NAME          = aws_dynamodb_table.jobs_status_table.name
+      DEDUP_WINDOW_SECONDS       = var.jobs_dedup_window
+      TRACING_EMF_NAMESPACE      = "AWSPermissionsBot"
+      SLACK_BOT_TOKEN_SECRET_ARN = var.slack_bot_token_secret_arn
     }
   }
 }
@@ -0,0 +1,49 @@
+# Jobs queue between the invocation lambda and the backend lambda
+resource "aws_sqs_queue" "jobs_dead_letter_queue" {
+  name                      = "${var.backend_lambda_name}-jobs-dlq"
+  message_retention_seconds = 1209600
+  tags                      = var.tags
+}
+
+resource "aws_sqs_queue" "jobs_queue" {
+  name                       = "${var.backend_lambda_name}-jobs"
+  visibility_timeout_seconds = 6 * aws_lambda_function.backend_function.timeout
+  message_retention_seconds  = 3600
+  sqs_managed_sse_enabled    = true
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.jobs_dead_letter_queue.arn
+    maxReceiveCount     = 3
+  })
+  tags = var.tags
+}
+
+# Status record per request ID
+resource "aws_dynamodb_table" "jobs_status_table" {
+  name         = "${var.backend_lambda_name}-jobs-status"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "request_id"
+
+  attribute {
+    name = "request_id"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = var.tags
+}
+
+resource "aws_lambda_event_source_mapping" "jobs_queue_mapping" {
+  event_source_arn                   = aws_sqs_queue.jobs_queue.arn
+  function_name                      = aws_lambda_function.backend_function.arn
+  batch_size                         = var.jobs_batch_size
+  maximum_batching_window_in_seconds = var.jobs_batching_window
+  function_response_types            = ["ReportBatchItemFailures"]
+
+  scaling_config {
+    maximum_concurrency = var.jobs_maximum_concurrency
+  }
+}
@@ -0,0 +1,241 @@
+"""
+Tests of the org-wide inventory aggregators, against botocore Stubber responses.
+
+Usage:
+    python -m unittest discover -s terraform/tests
+"""
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import boto3  # noqa: E402
+from botocore.stub import ANY, Stubber  # noqa: E402
+import AggregatorInventory  # noqa: E402
+import AWSHandler  # noqa: E402
+import ResourceFilter  # noqa: E402
+
+AGGREGATOR_NAME = "organization"
+ACCOUNT_ID = "111111111111"
+OTHER_ACCOUNT_ID = "222222222222"
+
+
+def config_page(resources: list, next_token=None) -> dict:
+    """
+    Returns a SelectAggregateResourceConfig response of (account ID, resource name, status) tuples.
+    """
+    response = {
+        "Results": [
+            json.dumps({"accountId": account_id, "resourceName": name, "configurationItemStatus": status})
+            for account_id, name, status in resources
+        ],
+        "QueryInfo": {"SelectFields": [{"Name": "accountId"}, {"Name": "resourceName"}]}
+    }
+    if next_token:
+        response["NextToken"] = next_token
+    return response
+
+
+def config_request(next_token=None) -> dict:
+    request = {"Expression": ANY, "ConfigurationAggregatorName": AGGREGATOR_NAME, "MaxResults": 100}
+    if next_token:
+        request["NextToken"] = next_token
+    return request
+
+
+class ConfigAggregatorInventoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory = AggregatorInventory.ConfigAggregatorInventory(AGGREGATOR_NAME)
+        self.stubber = Stubber(self.inventory.client)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+
+    def test_pages_are_read_until_the_last_one(self):
+        self.stubber.add_response(
+            "select_aggregate_resource_config",
+            config_page([(ACCOUNT_ID, "alpha", "OK"), (ACCOUNT_ID, "beta", "ResourceDeleted")], next_token="page-2"),
+            config_request()
+        )
+        self.stubber.add_response(
+            "select_aggregate_resource_config",
+            config_page([(ACCOUNT_ID, "gamma", "ResourceDiscovered")]),
+            config_request(next_token="page-2")
+        )
+        self.assertEqual(self.inventory.list_s3_buckets(ACCOUNT_ID), ["alpha", "gamma"])
+        self.stubber.assert_no_pending_responses()
+
+    def test_the_account_is_in_the_query(self):
+        self.stubber.add_response(
+            "select_aggregate_resource_config",
+            config_page([]),
+            {
+                "Expression": "SELECT accountId, resourceName, configurationItemStatus "
+                              "WHERE resourceType = 'AWS::S3::Bucket' AND accountId = '{}'".format(ACCOUNT_ID),
+                "ConfigurationAggregatorName": AGGREGATOR_NAME,
+                "MaxResults": 100
+            }
+        )
+        self.inventory.list_s3_buckets(ACCOUNT_ID)
+        self.stubber.assert_no_pending_responses()
+
+    def test_the_listing_stops_at_the_filter_limit(self):
+        self.stubber.add_response(
+            "select_aggregate_resource_config",
+            config_page([(ACCOUNT_ID, name, "OK") for name in ("a", "b", "c")], next_token="page-2"),
+            config_request()
+        )
+        resource_filter = ResourceFilter.ResourceFilter(limit=2)
+        self.assertEqual(self.inventory.list_sqs_queues(ACCOUNT_ID, resource_filter), ["a", "b"])
+        self.assertTrue(resource_filter.truncated)
+        # The second page is never requested
+        self.stubber.assert_no_pending_responses()
+
+    def test_resources_by_account(self):
+        self.stubber.add_response(
+            "select_aggregate_resource_config",
+            config_page([(ACCOUNT_ID, "bucket-1", "OK"), (OTHER_ACCOUNT_ID, "bucket-2", "OK")], next_token="page-2"),
+            config_request()
+        )
+        self.stubber.add_response(
+            "select_aggregate_resource_config",
+            config_page([(ACCOUNT_ID, "bucket-3", "OK")]),
+            config_request(next_token="page-2")
+        )
+        self.stubber.add_response(
+            "select_aggregate_resource_config",
+            config_page([(OTHER_ACCOUNT_ID, "queue-1", "OK")]),
+            config_request()
+        )
+        self.assertEqual(self.inventory.resources_by_account(("s3", "sqs")), {
+            ACCOUNT_ID: {"s3": ["bucket-1", "bucket-3"], "sqs": []},
+            OTHER_ACCOUNT_ID: {"s3": ["bucket-2"], "sqs": ["queue-1"]}
+        })
+
+    def test_an_empty_aggregator(self):
+        self.stubber.add_response("select_aggregate_resource_config", config_page([]), config_request())
+        self.stubber.add_response("select_aggregate_resource_config", config_page([]), config_request())
+        self.assertEqual(self.inventory.list_s3_buckets(ACCOUNT_ID), [])
+        self.assertEqual(self.inventory.resources_by_account(("s3",)), {})
+
+    def test_a_failed_aggregator(self):
+        self.stubber.add_client_error(
+            "select_aggregate_resource_config",
+            service_error_code="NoSuchConfigurationAggregatorException",
+            expected_params=config_request()
+        )
+        self.stubber.add_client_error(
+            "select_aggregate_resource_config",
+            service_error_code="ThrottlingException",
+            expected_params=config_request()
+        )
+        self.assertEqual(self.inventory.list_s3_buckets(ACCOUNT_ID), [])
+        self.assertIsNone(self.inventory.resources_by_account(("s3",)))
+
+    def test_a_failure_after_the_first_page(self):
+        self.stubber.add_response(
+            "select_aggregate_resource_config",
+            config_page([(ACCOUNT_ID, "alpha", "OK")], next_token="page-2"),
+            config_request()
+        )
+        self.stubber.add_client_error(
+            "select_aggregate_resource_config",
+            service_error_code="InvalidNextTokenException",
+            expected_params=config_request(next_token="page-2")
+        )
+        # A partial listing is not an inventory
+        self.assertIsNone(self.inventory.resources_by_account(("s3",)))
+
+
+class ResourceExplorerInventoryTest(unittest.TestCase):
+
+    def test_pages_are_read_until_the_last_one(self):
+        view_arn = "arn:aws:resource-explorer-2:us-east-1:{}:view/organization/1".format(ACCOUNT_ID)
+        inventory = AggregatorInventory.ResourceExplorerInventory(view_arn, region="us-east-1")
+        stubber = Stubber(inventory.client)
+        request = {
+            "ViewArn": view_arn,
+            "Filters": {"FilterString": "resourcetype:sqs:queue accountid:{} region:us-east-1".format(ACCOUNT_ID)},
+            "MaxResults": 1000
+        }
+        stubber.add_response(
+            "list_resources",
+            {
+                "Resources": [{"Arn": "arn:aws:sqs:us-east-1:{}:jobs".format(ACCOUNT_ID), "OwningAccountId": ACCOUNT_ID}],
+                "NextToken": "page-2"
+            },
+            request
+        )
+        stubber.add_response(
+            "list_resources",
+            {"Resources": [{"Arn": "arn:aws:sqs:us-east-1:{}:dead-letters".format(ACCOUNT_ID), "OwningAccountId": ACCOUNT_ID}]},
+            dict(request, NextToken="page-2")
+        )
+        with stubber:
+            self.assertEqual(inventory.list_sqs_queues(ACCOUNT_ID), ["jobs", "dead-letters"])
+        stubber.assert_no_pending_responses()
+
+
+class AggregatorInventoryTest(unittest.TestCase):
+
+    def test_pages_is_abstract(self):
+        with self.assertRaises(TypeError):
+            AggregatorInventory.AggregatorInventory()
+
+
+class AggregatorLiveFallbackTest(unittest.TestCase):
+    """
+    A requested resource the eventually consistent aggregator does not list yet is listed live.
+    """
+
+    def setUp(self):
+        self.inventory = AggregatorInventory.ConfigAggregatorInventory(AGGREGATOR_NAME)
+        self.aggregator_stubber = Stubber(self.inventory.client)
+        self.aggregator_stubber.activate()
+        self.addCleanup(self.aggregator_stubber.deactivate)
+        self.aggregator_stubber.add_response(
+            "select_aggregate_resource_config",
+            config_page([(ACCOUNT_ID, "old-bucket", "OK")]),
+            config_request()
+        )
+        self.s3_client = boto3.client("s3")
+        self.s3_stubber = Stubber(self.s3_client)
+        self.s3_stubber.activate()
+        self.addCleanup(self.s3_stubber.deactivate)
+        # The connector of an account, without reading the organization
+        self.connector = AWSHandler.AWSConnector.__new__(AWSHandler.AWSConnector)
+        self.connector.account_id = ACCOUNT_ID
+        self.connector.organization = None
+        self.connector._AWSConnector__assumed_role = {
+            "Credentials": {"AccessKeyId": "key", "SecretAccessKey": "secret", "SessionToken": "token"}
+        }
+        patcher = mock.patch.object(AggregatorInventory, "get_aggregator_inventory", return_value=self.inventory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_a_missing_resource_is_listed_live(self):
+        self.s3_stubber.add_response(
+            "list_buckets",
+            {"Buckets": [{"Name": "old-bucket"}, {"Name": "new-bucket"}]},
+            {}
+        )
+        with mock.patch.object(AWSHandler.boto3, "client", return_value=self.s3_client):
+            buckets = self.connector.list_s3_buckets(required_names={"new-bucket"})
+        self.assertEqual(buckets, ["old-bucket", "new-bucket"])
+        self.s3_stubber.assert_no_pending_responses()
+
+    def test_an_indexed_resource_is_not_listed_live(self):
+        with mock.patch.object(AWSHandler.boto3, "client", return_value=self.s3_client):
+            buckets = self.connector.list_s3_buckets(required_names={"old-bucket"})
+        self.assertEqual(buckets, ["old-bucket"])
+        self.aggregator_stubber.assert_no_pending_responses()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Tests of the request form options, served from the inventory snapshots of every organization.
+
+Usage:
+    python -m unittest discover -s terraform/tests
+"""
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import InventoryIndex  # noqa: E402
+import SlackInteractive  # noqa: E402
+
+ORGANIZATIONS = [
+    {"name": "main"},
+    {"name": "acquired", "inventory_key": "inventory/acquired/snapshot.json.gz"}
+]
+SNAPSHOTS = {
+    "inventory/snapshot.json.gz": InventoryIndex.InventoryIndex.build_snapshot(
+        {"main-production": "111111111111"},
+        {"main-production": {"s3": ["main-bucket"]}}
+    ),
+    "inventory/acquired/snapshot.json.gz": InventoryIndex.InventoryIndex.build_snapshot(
+        {"acquired-production": "222222222222"},
+        {"acquired-production": {"s3": ["acquired-bucket"]}}
+    )
+}
+
+
+def load_snapshot(bucket, key, ttl_seconds=60):
+    return InventoryIndex.InventoryIndex(SNAPSHOTS[key]) if key in SNAPSHOTS else None
+
+
+def option_values(response: dict) -> list:
+    return [option["value"] for option in json.loads(response["body"])["options"]]
+
+
+class LoadOptionsTest(unittest.TestCase):
+
+    def setUp(self):
+        environment = mock.patch.dict(os.environ, {
+            "INVENTORY_BUCKET": "inventory",
+            "INVENTORY_KEY": "inventory/snapshot.json.gz",
+            "AWS_ORGANIZATIONS": json.dumps(ORGANIZATIONS)
+        })
+        environment.start()
+        self.addCleanup(environment.stop)
+        load = mock.patch.object(InventoryIndex.InventoryIndex, "load", side_effect=load_snapshot)
+        load.start()
+        self.addCleanup(load.stop)
+
+    def test_accounts_of_every_organization_are_offered(self):
+        response = SlackInteractive.load_options({"action_id": "account", "value": ""})
+        self.assertEqual(option_values(response), ["acquired-production", "main-production"])
+
+    def test_resources_of_another_organization_are_offered(self):
+        response = SlackInteractive.load_options({
+            "action_id": "resources",
+            "value": "acq",
+            "view": {"state": {"values": {
+                "account": {"account": {"selected_option": {"value": "acquired-production"}}},
+                "service": {"service": {"selected_option": {"value": "s3"}}}
+            }}}
+        })
+        self.assertEqual(option_values(response), ["acquired-bucket"])
+
+    def test_only_the_default_organization_without_the_configuration(self):
+        with mock.patch.dict(os.environ, {"AWS_ORGANIZATIONS": ""}):
+            response = SlackInteractive.load_options({"action_id": "account", "value": ""})
+        self.assertEqual(option_values(response), ["main-production"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Tests of the unified diffs applied to the environment files.
+
+Usage:
+    python -m unittest discover -s terraform/tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import TerraformPatch  # noqa: E402
+
+ENVIRONMENT_FILE = """module "sso" {
+  source = "../modules/sso"
+
+  s3_read_buckets = [
+    "logs",
+  ]
+}
+"""
+
+
+class TerraformPatchTest(unittest.TestCase):
+
+    def test_fenced_diff_with_file_headers_is_applied(self):
+        patch = TerraformPatch.TerraformPatch(
+            "```diff\n"
+            "diff --git a/production.tf b/production.tf\n"
+            "--- a/production.tf\n"
+            "+++ b/production.tf\n"
+            "@@ -4,3 +4,4 @@\n"
+            "   s3_read_buckets = [\n"
+            "     \"logs\",\n"
+            "+    \"data\",\n"
+            "   ]\n"
+            "```\n"
+        )
+        self.assertEqual(
+            patch.apply(ENVIRONMENT_FILE),
+            ENVIRONMENT_FILE.replace('    "logs",\n', '    "logs",\n    "data",\n')
+        )
+
+    def test_hunk_lines_looking_like_file_headers_are_kept(self):
+        text = ENVIRONMENT_FILE.replace('  source = "../modules/sso"\n', '  source = "../modules/sso"\n-- old\n')
+        patch = TerraformPatch.TerraformPatch(
+            "--- a/production.tf\n"
+            "+++ b/production.tf\n"
+            "@@ -2,2 +2,2 @@\n"
+            "   source = \"../modules/sso\"\n"
+            "--- old\n"
+            "+++ new\n"
+        )
+        self.assertEqual(patch.hunks, [{"start": 2, "old": ['  source = "../modules/sso"', "-- old"],
+                                        "new": ['  source = "../modules/sso"', "++ new"]}])
+        self.assertEqual(patch.apply(text), text.replace("-- old\n", "++ new\n"))
+
+    def test_hunk_found_away_from_its_stated_line(self):
+        patch = TerraformPatch.TerraformPatch(
+            "@@ -40,2 +40,3 @@\n"
+            "     \"logs\",\n"
+            "+    \"data\",\n"
+            "   ]\n"
+        )
+        self.assertIn('    "data",\n', patch.apply(ENVIRONMENT_FILE))
+
+    def test_mismatched_context_is_not_applied(self):
+        patch = TerraformPatch.TerraformPatch(
+            "@@ -5,2 +5,3 @@\n"
+            "     \"metrics\",\n"
+            "+    \"data\",\n"
+            "   ]\n"
+        )
+        self.assertEqual(patch.apply(ENVIRONMENT_FILE), "")
+        self.assertEqual(patch.error, "hunk at line 5 does not apply")
+
+    def test_unbalanced_result_is_not_applied(self):
+        patch = TerraformPatch.TerraformPatch(
+            "@@ -6,2 +6,1 @@\n"
+            "   ]\n"
+            "-}\n"
+            "+\n"
+        )
+        self.assertEqual(patch.apply(ENVIRONMENT_FILE), "")
+        self.assertEqual(patch.error, "the patched file has unbalanced braces")
+
+    def test_diff_without_hunk_is_an_error(self):
+        patch = TerraformPatch.TerraformPatch("The file already grants the bucket.")
+        self.assertEqual(patch.apply(ENVIRONMENT_FILE), "")
+        self.assertEqual(patch.error, "no hunk found")
+
+
+if __name__ == "__main__":
+    unittest.main()
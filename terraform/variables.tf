@@ -16,6 +16,12 @@ variable "invocation_lambda_name" {
   default     = "aws-permissions-bot-invocation"
 }
 
+variable "interactive_lambda_name" {
+  type        = string
+  description = "The name of the Lambda function serving the Slack modal options and submissions"
+  default     = "aws-permissions-bot-interactive"
+}
+
 variable "secrets_arn_list" {
   type        = list(string)
   description = "A list of ARNs (Amazon Resource Names) of the AWS Secrets Manager secrets that the Lambda function will use to access sensitive data."
@@ -95,4 +101,128 @@ variable "security_scanner_role_name" {
   type        = string
   description = "The name of the IAM role that the security scanner Lambda function will assume to list account resources."
   default     = "SecurityAuditRole"
-}
\ No newline at end of file
+}
+variable "jobs_batch_size" {
+  type        = number
+  default     = 3
+  description = "The maximum number of queued requests the backend Lambda function processes per invocation."
+}
+
+variable "jobs_batching_window" {
+  type        = number
+  default     = 1
+  description = "The maximum number of seconds to gather queued requests into one batch before invoking the backend Lambda function."
+}
+
+variable "jobs_maximum_concurrency" {
+  type        = number
+  default     = 5
+  description = "The maximum number of concurrent backend Lambda functions processing queued requests, caps the load on GitHub, Okta and Bedrock. Minimum 2."
+
+  validation {
+    condition     = var.jobs_maximum_concurrency >= 2 && var.jobs_maximum_concurrency <= 1000
+    error_message = "The jobs_maximum_concurrency must be between 2 and 1000."
+  }
+}
+
+variable "jobs_dedup_window" {
+  type        = number
+  default     = 300
+  description = "The number of seconds in which an identical request from the same user is treated as a duplicate."
+}
+
+variable "pull_request_aggregation_window" {
+  type        = number
+  default     = 0
+  description = "The number of minutes in which new grants for the same group and account are added to the open bot pull request instead of opening a new one. 0 opens a pull request per grant."
+}
+
+variable "slack_bot_token_secret_arn" {
+  type        = string
+  default     = ""
+  description = "The ARN of the Secrets Manager secret holding the Slack bot token, used to open the request modal. Empty disables the modal."
+}
+
+variable "profiling" {
+  type        = string
+  default     = ""
+  description = "Profiles the stages of every backend request: cpu (cProfile), memory (tracemalloc) or cpu,memory. The summary is logged and the full profiles are written under profiles/ in the inventory bucket. Empty disables the profiling."
+
+  validation {
+    condition     = contains(["", "cpu", "memory", "cpu,memory"], var.profiling)
+    error_message = "The profiling must be empty, cpu, memory or cpu,memory."
+  }
+}
+
+variable "warm_up_schedule" {
+  type        = string
+  default     = "rate(5 minutes)"
+  description = "The EventBridge schedule expression of the backend Lambda warm-up that fills the account, organizational unit, secret and GitHub caches. Empty disables the warm-up."
+}
+
+variable "inventory_sweep_schedule" {
+  type        = string
+  default     = "rate(1 hour)"
+  description = "The EventBridge schedule expression of the inventory sweep that lists the resources of every account into the snapshot."
+}
+
+variable "grant_expiry_schedule" {
+  type        = string
+  default     = "rate(1 hour)"
+  description = "The EventBridge schedule expression of the revocation of the expired time-bound grants. Empty disables it."
+}
+
+variable "grant_expiry_window" {
+  type        = number
+  default     = 0
+  description = "The number of seconds ahead of their expiry the grants are revoked, so the grants expiring before the next run share its pull requests."
+}
+
+variable "grant_max_expiry_days" {
+  type        = number
+  default     = 90
+  description = "The longest expiry of a time-bound grant, in days."
+}
+
+variable "inventory_max_age" {
+  type        = number
+  default     = 7200
+  description = "The number of seconds the inventory snapshot is used to validate resources, older snapshots are ignored and resources are listed live."
+}
+
+variable "inventory_backend" {
+  type        = string
+  default     = "assume_role"
+  description = "How the account resources are listed: assume_role assumes the security scanning role into each account, resource_explorer and config query one org-wide aggregator from the bot account."
+
+  validation {
+    condition     = contains(["assume_role", "resource_explorer", "config"], var.inventory_backend)
+    error_message = "The inventory_backend must be assume_role, resource_explorer or config."
+  }
+}
+
+variable "resource_explorer_view_arn" {
+  type        = string
+  default     = ""
+  description = "The ARN of the org-wide Resource Explorer view, used when inventory_backend is resource_explorer."
+}
+
+variable "config_aggregator_name" {
+  type        = string
+  default     = ""
+  description = "The name of the organization Config aggregator, used when inventory_backend is config."
+}
+
+variable "organizations" {
+  type = list(object({
+    name                       = string
+    management_role_arn        = optional(string, "")
+    scanning_role_name         = optional(string, "security-scanning")
+    inventory_key              = optional(string)
+    inventory_backend          = optional(string, "")
+    resource_explorer_view_arn = optional(string, "")
+    config_aggregator_name     = optional(string, "")
+  }))
+  default     = []
+  description = "The AWS Organizations served by the bot, each read through its management role (the Lambda credentials if empty) with its own account cache and inventory snapshot. An account name in several organizations resolves to the first one. Empty serves the organization of the Lambda account only."
+}